@@ -11,24 +11,33 @@ GitHub: https://github.com/DanielEduardoLopez
 
 # Run this app with 'python 3_Dashboard.py' and
 # visit http://127.0.0.1:8050/ in your web browser.
+# For production, serve it with several workers through 'wsgi.py', e.g. 'gunicorn -c gunicorn.conf.py'.
 
 # Import required libraries
+import time
 import numpy as np
 import pandas as pd
+import flask
 import dash
 from dash import html
 from dash import dcc
-from dash.dependencies import Input, Output
+from dash import Patch
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from dash.exceptions import PreventUpdate
-import plotly.express as px
 import plotly.graph_objects as go
-
-# Read the Job data into a Pandas dataframe
-df = pd.read_csv("https://raw.githubusercontent.com/DanielEduardoLopez/DataJobsMX-Nov2023/main/Dataset_processed.csv")\
-     .rename(columns = {'Avg Salary': 'Salary'}).drop(columns=['Original Job Title', 'Min Salary',	'Max Salary'])
-
-max_salary = df['Salary'].max()
-min_salary = df['Salary'].min()
+from plotly.colors import sequential
+
+from array_store import load_shared
+from snapshot_manager import Snapshot, SnapshotManager
+from figure_cache import FigureCache, filter_key
+from filter_engine import normalize_selection
+from option_index import OPTIONS_LIMIT, OptionIndex, normalize_text
+from cube import SALARY_STEP, align_salary_range
+from box_stats import SalaryBoxes
+from metrics import CONTENT_TYPE, SIZE_BUCKETS, Registry, cache_collector
+from serialization import prepare, use_orjson
+from response_cache import ResponseCache
+from geodata import load_states, resolution_for_size
 
 # Images
 
@@ -44,25 +53,113 @@ category_order = ['ML Engineer',
                   'BI Analyst',
                   'Data Analyst']
 
+def build_snapshot(df, version):
+    """
+    Returns the dataset version of the dashboard for a loaded dataset: a dictionary-encoded copy
+    of the data (categorical codes, float32 salaries and integer row ids), inverted and sorted
+    salary indexes answering the dropdown and salary filters, and the pre-aggregated
+    (Job x Location x Company x Salary bucket) cube for the demand and salary figures; all of
+    them memory-mapped from a store shared by the worker processes.
+    """
+    return Snapshot(version, *load_shared(df, version, category_orders={'Job': category_order}, step=SALARY_STEP))
+
+# Read the Job data from the local snapshot (falls back to 'Dataset_processed.csv'). New snapshots
+# are loaded in the background and swapped in while serving; every request uses the snapshot
+# current when it started (see snapshot_manager.py)
+snapshots = SnapshotManager(build_snapshot)
+dataset_version = snapshots.current.version
+
+# Callback responses encoded with orjson when installed; figure updates are prepared for it
+# (label arrays as lists, numeric arrays contiguous or as typed arrays, see serialization.py)
+use_orjson()
+
+# Trace data of the figures per filter state, dropped when the dataset version changes
+figure_cache = FigureCache(maxsize=2048, ttl=3600, version=dataset_version)
+
+# Filtered rows and cube cells of the latest filter states, shared by the figure callbacks
+selection_cache = FigureCache(maxsize=32, ttl=60, version=dataset_version)
+
+# Serialized and compressed callback and layout responses, served with ETags
+response_cache = ResponseCache(maxsize=1024, ttl=3600, version=dataset_version,
+                               request_version=lambda: snapshots.snapshot().version)
+
+# Cached values belong to a dataset version: their keys start with the version they were
+# computed from, and the caches are emptied when a new version is swapped in
+@snapshots.subscribe
+def invalidate_caches(snapshot):
+    for cache in (figure_cache, selection_cache, response_cache):
+        cache.set_version(snapshot.version)
+
+# Sampled timings, payload sizes and cache statistics exposed on /metrics (off unless
+# DATAJOBS_METRICS_SAMPLE_RATE is set, see metrics.py)
+metrics = Registry()
+filter_seconds = metrics.histogram('dashboard_filter_seconds',
+                                   'Time selecting the rows or cube cells of a filter state.', ['source'])
+figure_seconds = metrics.histogram('dashboard_figure_update_seconds',
+                                   'Time computing the data of a figure for a filter state.', ['figure'])
+callback_seconds = metrics.histogram('dashboard_callback_seconds',
+                                     'Time handling a callback request, serialization included.', ['output'])
+serialization_seconds = metrics.histogram('dashboard_serialization_seconds',
+                                          'Time serializing a callback response.', ['output'])
+response_bytes = metrics.histogram('dashboard_response_bytes',
+                                   'Size of the callback responses.', ['output'], buckets=SIZE_BUCKETS)
+metrics.register_collector(cache_collector({'figure': figure_cache,
+                                             'selection': selection_cache,
+                                             'response': response_cache}))
+
+# Salary bounds, aligned to the salary slider steps
+def salary_bounds(snapshot):
+    """
+    Returns the (min, max) salaries of a dataset version, aligned to the salary slider steps.
+    """
+    salary = snapshot.data.salary
+    return (float(np.floor(np.nanmin(salary) / SALARY_STEP) * SALARY_STEP),
+            float(np.ceil(np.nanmax(salary) / SALARY_STEP) * SALARY_STEP))
+
 # Color settings
 light_bg_color= '#ececec'#'#f0f0f0' # platinum
 shadow_color='#adadad'
-dash_theme=px.colors.sequential.Blues#px.colors.sequential.PuBu
-dash_theme_r=px.colors.sequential.Blues_r#px.colors.sequential.PuBu_r
+dash_theme=sequential.Blues#sequential.PuBu
+dash_theme_r=sequential.Blues_r#sequential.PuBu_r
 dark_bg_color= dash_theme_r[0]
 
 # Plot heights
 
 top_plot_height = '350px'
 bottom_plot_height = '395px'
+map_height = 340
+
+# Map polygons resolution (bundled GeoJSON, see geodata.py)
+map_resolution = resolution_for_size(map_height)
+
+# Salary boxplot: every salary as a point up to this many rows; above it, box statistics
+# computed on the server, and per Data Job category its outliers (at most 'boxplot_max_outliers')
+# and at most 'boxplot_max_points' of its other salaries as WebGL points
+boxplot_points_max_rows = 5000
+boxplot_max_points = 500
+boxplot_max_outliers = 1000
+
+def boxplot_mode(snapshot):
+    """
+    Returns the salary boxplot mode of a dataset version ('points' or 'summary'). The modes
+    have different traces, so a hot reload crossing 'boxplot_points_max_rows' changes the
+    figure structure: the browsers keep the mode of their layout in the 'boxplot_mode'
+    store, and get a full figure instead of a patch when it is not the current one.
+    """
+    return 'points' if len(snapshot) <= boxplot_points_max_rows else 'summary'
 
 # Plotting functions
 
 
+# Plotting functions take either the filtered rows (Dataframe or row ids) or the filtered
+# cells of the aggregate cube (CubeView), see 'dashboard_figures'. They build the full figures
+# once, when the layout is first served; on every filter change only the trace data returned
+# by the matching '*_update' function is sent to the browser.
+
 # Sample size and Avg Salary: Card
-def plot_card_salary(df):
+def plot_card_salary(cube):
   
-    avg_salary = np.mean(df['Salary'])
+    avg_salary = cube.mean_salary()
 
     card_salary = go.Figure()
 
@@ -86,10 +183,14 @@ def plot_card_salary(df):
 
     return card_salary
 
+def card_salary_update(cube):
+
+    return {'data': [{'value': cube.mean_salary()}]}
 
-def plot_card_demand(df):
 
-    sample_size = len(df)   
+def plot_card_demand(cube):
+
+    sample_size = cube.total()   
 
     card_demand = go.Figure()
 
@@ -115,10 +216,21 @@ def plot_card_demand(df):
 
     return card_demand
 
+def card_demand_update(cube):
+
+    return {'data': [{'value': cube.total()}]}
+
 # Job Demand: Pie Chart
-def plot_pie_chart(df):
+def pie_chart_data(cube):
+
+    return cube.rollup('Job')[['Job', 'Count']].sort_values(by = 'Count', ascending = False)
+
+def plot_pie_chart(cube):
 
-    job_df = pd.DataFrame(df['Job'].value_counts().reset_index()).rename(columns = {'count': 'Count'})
+    # Imported on first use, plotly.express is slow to import
+    import plotly.express as px
+
+    job_df = pie_chart_data(cube)
 
     pie_colors = ['#154360','#539ecd','#89bedc',"#a9cce3", "#d4e6f1",'#dbe9f6', "#ebf5fb"]
 
@@ -158,21 +270,36 @@ def plot_pie_chart(df):
     
     return demand_job_plot
 
+def pie_chart_update(cube):
+
+    job_df = pie_chart_data(cube)
+
+    return {'data': [{'labels': job_df['Job'].to_numpy(),
+                      'values': job_df['Count'].to_numpy(),
+                      'customdata': job_df[['Job']].to_numpy()}]}
+
 
 
 # Company Demand: Treemap
-def plot_treemap(df):
+top_companies = 10
 
-    top = 10
+def treemap_data(cube, top=top_companies):
 
-    company_df =  (df.loc[lambda d: d['Company'] != 'Confidential']
-                  .groupby(by='Company', as_index=False)['Job'].count()
-                  .sort_values(by = 'Job', ascending = False)
-                  .rename(columns = {'Job': 'Vacancies'})[:top]
-                  .assign(Company=lambda d:d['Company'].map(lambda x: x[:15]))
+    company_df =  (cube.rollup('Company')[['Company', 'Count']]
+                  .loc[lambda d: d['Company'] != 'Confidential']
+                  .sort_values(by = 'Count', ascending = False)
+                  .rename(columns = {'Count': 'Vacancies'})[:top]
+                  .assign(Company=lambda d:d['Company'].str[:15])
                 )
 
-    company_df = company_df[company_df['Vacancies'] > 0]
+    return company_df[company_df['Vacancies'] > 0]
+
+def plot_treemap(cube, top=top_companies):
+
+    # Imported on first use, plotly.express is slow to import
+    import plotly.express as px
+
+    company_df = treemap_data(cube, top)
 
     demand_company_plot = px.treemap(company_df, 
                                      path = ['Company'], 
@@ -204,8 +331,18 @@ def plot_treemap(df):
               
     return demand_company_plot
 
+def treemap_update(cube):
+
+    # Same hierarchy as px.treemap(path=['Company']): one leaf per (truncated) name
+    company_df = treemap_data(cube).groupby('Company', sort=True)['Vacancies'].sum()
+
+    return {'data': [{'ids': company_df.index.to_numpy(dtype=object),
+                      'labels': company_df.index.to_numpy(dtype=object),
+                      'parents': np.full(len(company_df), '', dtype=object),
+                      'values': company_df.to_numpy()}]}
+
 # Location Demand: Choropleth Map
-def plot_cloropleth(df):
+def cloropleth_data(cube):
 
     # States dictionary with corresponding ID
     location_dict = {'Aguascalientes': 'AS', 
@@ -245,23 +382,29 @@ def plot_cloropleth(df):
                   .rename(columns={"index": "State", 0: "ID"}).set_index('State')
                     )
 
-    demand = (pd.DataFrame(df['Location'].value_counts())
-              .reset_index()
-              .rename(columns={'count':'Count', 'Location':'State'})
+    demand = (cube.rollup('Location')[['Location', 'Count']]
+              .rename(columns={'Location':'State'})
               .assign(total= lambda d: sum(d.Count))
               .assign(Percentage= lambda d: (d['Count'] / d.total )*100)
               .drop(columns=['total'])
               )
 
-    location_df = location_df.merge(demand, left_on='State', right_on='State', how = 'outer').fillna(0)
+    return location_df.merge(demand, left_on='State', right_on='State', how = 'outer').fillna(0)
+
+def plot_cloropleth(cube, resolution=map_resolution):
+
+    # Imported on first use, plotly.express is slow to import
+    import plotly.express as px
+
+    location_df = cloropleth_data(cube)
 
     demand_location_plot = px.choropleth(location_df, 
-                                        geojson = 'https://raw.githubusercontent.com/isaacarroyov/data_visualization_practice/master/Python/visualizing_mexican_wildfires_tds/data/states_mx.json', 
+                                        geojson = load_states(resolution), 
                                         locations='ID', 
                                         color='Percentage',
                                         color_continuous_scale=dash_theme,
                                         scope="north america",
-                                        height= 340,
+                                        height= map_height,
                                         #title='Demand of Data Jobs per Mexican State',                                        
                                         labels={'Percentage':'National <br>Demand %'}
                                         )
@@ -291,10 +434,24 @@ def plot_cloropleth(df):
  
     return demand_location_plot
 
+def cloropleth_update(cube):
+
+    location_df = cloropleth_data(cube)
+
+    return {'data': [{'locations': location_df['ID'].to_numpy(),
+                      'z': location_df['Percentage'].to_numpy()}]}
+
 # Salary Per Job: Boxplot
+def boxplot_data(df):
+
+    return df.dropna(axis = 0, how='any', subset = ['Salary'])
+
 def plot_boxplot(df):
 
-    salary_job_df = df.dropna(axis = 0, how='any', subset = ['Salary'])
+    # Imported on first use, plotly.express is slow to import
+    import plotly.express as px
+
+    salary_job_df = boxplot_data(df)
 
     salary_job_plot = px.box(salary_job_df, 
                             x = "Job", 
@@ -340,15 +497,85 @@ def plot_boxplot(df):
 
     return salary_job_plot
 
-# Salary Per Company: Heatmap plot 1
+def boxplot_update(df):
+
+    salary_job_df = boxplot_data(df)
+
+    return {'data': [{'x': salary_job_df['Job'].to_numpy(dtype=object),
+                      'y': salary_job_df['Salary'].to_numpy()}]}
+
+# Salary Per Job: Boxplot from summary statistics, for large datasets
+def salary_boxes():
+    """
+    Returns the box statistics of the current dataset version, built on first use.
+    """
+    snapshot = snapshots.snapshot()
+    return snapshot.derived('salary_boxes', lambda: SalaryBoxes(snapshot.data, 'Job', max_points=boxplot_max_points,
+                                                                max_outliers=boxplot_max_outliers,
+                                                                index=snapshot.engine.salary_indexes['Job']))
+
+def boxplot_summary_update(rows):
+
+    boxes = salary_boxes().summary(rows)
+    positions = np.arange(len(boxes))
+
+    # Sampled salaries and outliers drawn left of their box with a fixed jitter, like px.box(points="all")
+    points = [np.concatenate([box['points'], box['outliers']]) for box in boxes]
+    counts = [len(values) for values in points]
+    jitter = np.random.default_rng(0).uniform(-0.1, 0.1, sum(counts))
+    points_x = np.repeat(positions - 0.37, counts) + jitter
+
+    return {'data': [{'x': positions,
+                      'q1': [box['q1'] for box in boxes],
+                      'median': [box['median'] for box in boxes],
+                      'q3': [box['q3'] for box in boxes],
+                      'lowerfence': [box['lowerfence'] for box in boxes],
+                      'upperfence': [box['upperfence'] for box in boxes],
+                      'text': [box['label'] for box in boxes]},
+                     {'x': points_x,
+                      'y': np.concatenate(points) if boxes else [],
+                      'text': np.repeat([box['label'] for box in boxes], counts)}],
+            'layout': {'xaxis': {'tickvals': positions,
+                                 'ticktext': [box['label'] for box in boxes]}}}
+
+def plot_boxplot_summary(rows):
+
+    update = boxplot_summary_update(rows)
+    box, points = update['data']
+
+    salary_job_plot = go.Figure()
+
+    salary_job_plot.add_trace(go.Box(**box,
+                                     boxpoints=False,
+                                     marker_color='#2874a6',
+                                     hoverinfo='text+y',
+                                     showlegend=False))
+
+    salary_job_plot.add_trace(go.Scattergl(**points,
+                                           mode='markers',
+                                           marker=dict(color='#2874a6', size=4, opacity=0.6),
+                                           hovertemplate='Data Job Category=%{text}<br>Mean Monthly Salary (MXN)=%{y}<extra></extra>',
+                                           showlegend=False))
+
+    salary_job_plot.update_layout(title='<b>Salary Per Data Job Category</b>',
+                                  height=390,
+                                  transition_duration=400, 
+                                  title_x=0.5, 
+                                  paper_bgcolor="rgba(0,0,0,0)", 
+                                  plot_bgcolor='#E5E4E2',
+                                  margin={"r":10,"t":40,"l":40,"b":0})
+
+    salary_job_plot.update_xaxes(title='Data Job Category', **update['layout']['xaxis'])
+    salary_job_plot.update_yaxes(title='Mean Monthly Salary (MXN)', tickformat = '$,~s')
 
-def plot_heatmap(df):
+    return salary_job_plot
 
-    top = 15
+# Salary Per Company: Heatmap plot 1
+top_salary_companies = 15
 
-    salary_job_df = df.dropna(axis = 0, how='any', subset = ['Salary'])
+def heatmap_data(cube, top=top_salary_companies):
 
-    salary_company_df = (pd.pivot_table(salary_job_df, index = 'Company', columns = 'Job', values = 'Salary', aggfunc= 'mean')
+    salary_company_df = (cube.mean_pivot(index = 'Company', columns = 'Job')
                         .assign(Max_Value= lambda d: d.max(axis=1, numeric_only= True))
                         .reset_index()
                         .assign(Company= lambda d: d.Company.str[:20])
@@ -358,82 +585,317 @@ def plot_heatmap(df):
                         .drop(columns = 'Max_Value')
                         )                  
 
-    salary_company_df = pd.melt(salary_company_df, id_vars = 'Company', var_name = 'Job', value_name = 'Salary')
-
-    salary_company_plot = px.density_heatmap(salary_company_df, 
-                                            y='Company', 
-                                            x = 'Job', 
-                                            z = 'Salary',
-                                            histfunc="avg", 
-                                            color_continuous_scale=dash_theme,
-                                            height=430,
-                                            title='<b>Salary Per Company And Data Job</b>',
-                                            labels={"Job": ""},                                         
-                                            #text_auto=True
-                                            )
-    salary_company_plot.update_layout(transition_duration=400, 
-                                      title_x=0.5, 
-                                      coloraxis_colorbar=dict(title="Avg. Mth. <br>Salary (MXN)"),
-                                      paper_bgcolor="rgba(0,0,0,0)", 
-                                      plot_bgcolor="rgba(0,0,0,0)",
-                                      margin={"r":20,"t":40,"l":20,"b":40}
-                                      )
+    # Company x Job matrix; companies whose truncated names collide are averaged
+    return salary_company_df.groupby('Company', sort=False).mean()
+
+def heatmap_figure(update, label, title):
+    """
+    Returns a salary heatmap of a Job column matrix with the given row label, from a heatmap update.
+    """
+    heatmap_plot = go.Figure(go.Heatmap(**update['data'][0],
+                                        coloraxis='coloraxis',
+                                        name='',
+                                        hovertemplate=f'=%{{x}}<br>{label}=%{{y}}<br>avg of Salary=%{{z}}<extra></extra>'))
 
-    salary_company_plot.update_coloraxes(colorbar_tickformat = '$,~s')
-    #salary_company_plot.update_traces(texttemplate="$%{z:,.0f}")
+    heatmap_plot.update_layout(title=title,
+                               height=430,
+                               xaxis_title='',
+                               yaxis_title=label,
+                               coloraxis_colorscale=dash_theme,
+                               legend_tracegroupgap=0)
 
-    return salary_company_plot
+    heatmap_plot.update_layout(transition_duration=400, 
+                               title_x=0.5, 
+                               coloraxis_colorbar=dict(title="Avg. Mth. <br>Salary (MXN)"),
+                               paper_bgcolor="rgba(0,0,0,0)", 
+                               plot_bgcolor="rgba(0,0,0,0)",
+                               margin={"r":20,"t":40,"l":20,"b":40}
+                               )
+
+    heatmap_plot.update_coloraxes(colorbar_tickformat = '$,~s')
+    #heatmap_plot.update_traces(texttemplate="$%{z:,.0f}")
+
+    return heatmap_plot
+
+def plot_heatmap(cube):
+
+    return heatmap_figure(heatmap_update(cube), 'Company', '<b>Salary Per Company And Data Job</b>')
+
+def heatmap_update(cube):
+
+    salary_company_df = heatmap_data(cube)
+
+    return {'data': [{'x': salary_company_df.columns.to_numpy(dtype=object),
+                      'y': salary_company_df.index.to_numpy(dtype=object),
+                      'z': salary_company_df.to_numpy()}]}
 
 # Salary Per Location: Heatmap plot 2
-def plot_heatmap_2(df):
+def heatmap_2_data(cube):
 
-    salary_location_df = (pd.pivot_table(df, index = 'Location', columns = 'Job', values = 'Salary', aggfunc= 'mean')
+    salary_location_df = (cube.mean_pivot(index = 'Location', columns = 'Job')
                         .assign(Max_Value= lambda d: d.max(axis=1, numeric_only= True))
                         .fillna(0).sort_values('Max_Value', ascending = True)                                                                                              
-                        .drop(columns = 'Max_Value').reset_index()
+                        .drop(columns = 'Max_Value')
                         )   
     
-    salary_location_df = pd.melt(salary_location_df, id_vars = 'Location', var_name = 'Job', value_name = 'Salary')
-
-    salary_location_plot = px.density_heatmap(salary_location_df, 
-                                              y='Location', 
-                                              x='Job', 
-                                              z='Salary',
-                                              histfunc="avg", 
-                                              color_continuous_scale=dash_theme,
-                                              height=430,
-                                              title='<b>Salary Per Location And Data Job</b>',
-                                              labels={
-                                                        "State": "Location",
-                                                        'Job': ''
-                                                        }
-                                                )
-    
-    salary_location_plot.update_layout(transition_duration=400, 
-                                      title_x=0.5, 
-                                      coloraxis_colorbar=dict(title="Avg. Mth. <br>Salary (MXN)"),
-                                      paper_bgcolor="rgba(0,0,0,0)", 
-                                      plot_bgcolor="rgba(0,0,0,0)",
-                                      margin={"r":20,"t":40,"l":20,"b":40}
-                                      )
-
-    salary_location_plot.update_coloraxes(colorbar_tickformat = '$,~s')
-    #salary_location_plot.update_traces(texttemplate="$%{z:,.0f}")
-
-    return salary_location_plot
-
+    # Location x Job matrix
+    return salary_location_df
+
+def plot_heatmap_2(cube):
+
+    return heatmap_figure(heatmap_2_update(cube), 'Location', '<b>Salary Per Location And Data Job</b>')
+
+def heatmap_2_update(cube):
+
+    salary_location_df = heatmap_2_data(cube)
+
+    return {'data': [{'x': salary_location_df.columns.to_numpy(dtype=object),
+                      'y': salary_location_df.index.to_numpy(dtype=object),
+                      'z': salary_location_df.to_numpy()}]}
+
+
+# Salary Per Job: every salary as a point, or box statistics, depending on the size of the dataset version
+def plot_salary_job(rows):
+
+    snapshot = snapshots.snapshot()
+    if boxplot_mode(snapshot) == 'summary':
+        return plot_boxplot_summary(rows)
+    return plot_boxplot(snapshot.data.frame(rows))
+
+def salary_job_update(rows):
+
+    snapshot = snapshots.snapshot()
+    if boxplot_mode(snapshot) == 'summary':
+        return boxplot_summary_update(rows)
+    return boxplot_update(snapshot.data.frame(rows))
+
+# Figures of the dashboard: output component id, plotting function, figure update function
+# and their input ('cube' for the filtered cube cells, 'rows' for the filtered rows as a
+# Dataframe, 'row_ids' for their ids)
+dashboard_figures = {'demand_job_plot': (plot_pie_chart, pie_chart_update, 'cube'),
+                     'demand_company_plot': (plot_treemap, treemap_update, 'cube'),
+                     'demand_location_plot': (plot_cloropleth, cloropleth_update, 'cube'),
+                     'salary_job_plot': (plot_salary_job, salary_job_update, 'row_ids'),
+                     'salary_company_plot': (plot_heatmap, heatmap_update, 'cube'),
+                     'salary_location_plot': (plot_heatmap_2, heatmap_2_update, 'cube'),
+                     'card_salary': (plot_card_salary, card_salary_update, 'cube'),
+                     'card_demand': (plot_card_demand, card_demand_update, 'cube')}
+
+# Figures updated by clientside callbacks (assets/dashboard.js) instead of the server
+clientside_figures = ['card_salary', 'card_demand']
+
+# Helper functions for the filter state
+def state_to_key(state):
+    """
+    Converts the filter state kept in the 'filter_state' store (JSON lists) into a cache key.
+
+    The salary range is widened to the grid of the salary range slider, so that the figures
+    computed from the cube and from the rows show the same postings for a stale or crafted
+    range (update_filter_state in assets/dashboard.js aligns it the same way for the cards). A malformed state, such as a range that is not a pair of numbers, prevents the update.
+    """
+    try:
+        job, location, company, salary_range = (None if value is None else tuple(value) for value in state)
+        if salary_range is not None:
+            salary_range = align_salary_range(salary_range, SALARY_STEP)
+    except (TypeError, ValueError):
+        raise PreventUpdate
+    return job, location, company, salary_range
+
+def key_to_state(key):
+    """
+    Converts a cache key into the JSON-compatible filter state kept in the 'filter_state' store.
+    """
+    return [None if value is None else list(value) for value in key]
+
+def filtered_rows(key):
+    """
+    Returns the row ids of a filter state, shared by all the figure callbacks of the same interaction.
+    """
+    snapshot = snapshots.snapshot()
+    job, location, company, salary_range = key
+
+    def select():
+        with metrics.timer(filter_seconds, source='row_ids'):
+            return snapshot.engine.query(job=job, location=location, company=company, salary=salary_range)
+
+    return selection_cache.get_or_compute((snapshot.version, 'row_ids') + key, select)
+
+def filtered_frame(key):
+    """
+    Returns the rows of a filter state as a Dataframe, shared by all the figure callbacks of the same interaction.
+    """
+    snapshot = snapshots.snapshot()
+
+    def select():
+        rows = filtered_rows(key)
+        with metrics.timer(filter_seconds, source='rows'):
+            return snapshot.data.frame(rows)
+
+    return selection_cache.get_or_compute((snapshot.version, 'rows') + key, select)
+
+def filtered_cube(key):
+    """
+    Returns the aggregate cube cells of a filter state, shared by all the figure callbacks of the same interaction.
+    """
+    snapshot = snapshots.snapshot()
+    job, location, company, salary_range = key
+
+    def select():
+        with metrics.timer(filter_seconds, source='cube'):
+            return snapshot.cube.view(job=job, location=location, company=company, salary=salary_range)
+
+    return selection_cache.get_or_compute((snapshot.version, 'cube') + key, select)
+
+# Selection function of each figure input
+selections = {'cube': filtered_cube,
+              'rows': filtered_frame,
+              'row_ids': filtered_rows}
+
+def render_figure(component_id, key):
+    """
+    Returns a full figure of the dashboard for a filter state.
+    """
+    plot, _, source = dashboard_figures[component_id]
+    return plot(selections[source](key))
+
+def render_update(component_id, key):
+    """
+    Returns the figure data that changes with the filter state, as a dictionary with the
+    trace properties under 'data' (one dictionary per trace) and optionally 'layout' properties,
+    with its arrays prepared for fast JSON encoding (see serialization.py).
+    """
+    _, update, source = dashboard_figures[component_id]
+
+    def compute():
+        selection = selections[source](key)
+        with metrics.timer(figure_seconds, figure=component_id):
+            return prepare(update(selection))
+
+    return figure_cache.get_or_compute((snapshots.snapshot().version, component_id) + key, compute)
+
+def assign_patch(patch, update):
+    """
+    Assigns every leaf of a nested figure update to a Dash Patch.
+    """
+    for name, value in update.items():
+        if name == 'data':
+            for index, trace in enumerate(value):
+                assign_patch(patch['data'][index], trace)
+        elif isinstance(value, dict):
+            assign_patch(patch[name], value)
+        else:
+            patch[name] = value
+
+def render_patch(component_id, key):
+    """
+    Returns a Dash Patch replacing the changing data of a figure built by 'render_figure'.
+    """
+    patch = Patch()
+    assign_patch(patch, render_update(component_id, key))
+    return patch
+
+# Full figures for the initial (unfiltered) state: layout, colors and axis formatting are
+# built once per dataset version, when the layout is first served, and later filter changes
+# only patch their trace data
+initial_key = filter_key('All', 'All', 'All')
+
+def figure_template(component_id):
+    """
+    Returns the full figure of a component for the initial (unfiltered) state of the current
+    dataset version, built on first use.
+    """
+    return snapshots.snapshot().derived(('figure', component_id), lambda: render_figure(component_id, initial_key))
+
+# Dropdown options: instead of every label, a capped page of the labels with postings under
+# the other filters (e.g. the companies with the selected jobs and locations), sorted by their
+# number of postings and searched by prefix on the server as the user types (see option_index.py)
+dropdown_columns = {'job_dropdown': 'Job',
+                    'location_dropdown': 'Location',
+                    'company_dropdown': 'Company'}
+
+def option_index(column):
+    """
+    Returns the option index of a dropdown column for the current dataset version.
+    """
+    snapshot = snapshots.snapshot()
+    return snapshot.derived(('options', column), lambda: OptionIndex(snapshot.engine, column))
+
+# Value of the disabled option telling how many labels are not listed
+more_options_value = '__more__'
+
+def option_counts(column, key):
+    """
+    Returns the number of postings of every label of a dropdown column under the other filters of a filter state.
+    """
+    # The selection of the column itself does not change its counts
+    position = list(dropdown_columns.values()).index(column)
+    key = key[:position] + (None,) + key[position + 1:]
+    job, location, company, salary_range = key
+    options = option_index(column)
+
+    def count():
+        with metrics.timer(filter_seconds, source='options'):
+            return options.counts(job=job, location=location, company=company, salary=salary_range)
+
+    return selection_cache.get_or_compute((snapshots.snapshot().version, 'counts', column) + key, count)
 
 # Helper function for dropdowns
-def create_dropdown_options(series):
-    options = [{'label': i, 'value': i} for i in series.sort_values().unique()]
-    options.insert(0, {'label': 'All', 'value': 'All'})
+def create_dropdown_options(column, key=None, search=None, selected=None):
+    """
+    Returns the options of a dropdown: 'All', the selected labels and the first page of the
+    labels matching the search, labelled with their number of postings under the other filters.
+    """
+    options_index = option_index(column)
+    counts = option_counts(column, initial_key if key is None else key)
+    page = options_index.page(counts, search=search)
+    selected = [value for value in normalize_selection(selected) or [] if value in options_index.labels]
+
+    def option(label, count):
+        return {'label': f'{label} ({count:,})', 'value': label, 'search': f'{label} {normalize_text(label)}'}
+
+    options = [{'label': 'All', 'value': 'All'}]
+    options += [option(label, counts[options_index.labels.get_loc(label)]) for label in selected]
+    options += [option(item['value'], item['count']) for item in page['options'] if item['value'] not in selected]
+
+    hidden = page['total'] - len(page['options'])
+    if hidden > 0:
+        options.append({'label': f'{hidden:,} more, type to search', 'value': more_options_value,
+                        'search': search or '', 'disabled': True})
     return options
 
 # Dash application
 app = dash.Dash(__name__)
 
-# App Layout
-app.layout = html.Div(children=[
+# Clientside data for the KPI cards: the codes and salaries of every row, with the Job labels
+# only. The labels of the other dropdown columns (e.g. every company) would make most of the
+# layout, so the browser loads them from '/client-labels/<name>' when that column is first filtered
+client_label_columns = ['Job']
+
+def client_data():
+    """
+    Returns the encoded filter columns of the current dataset version for the clientside callbacks.
+    """
+    snapshot = snapshots.snapshot()
+    data = snapshot.data.client_columns(label_columns=client_label_columns)
+    data.update({'version': snapshot.version, 'labels_url': app.get_relative_path('/client-labels/')})
+    return data
+
+# WSGI application (see wsgi.py)
+server = app.server
+
+# App Layout, built by a function when it is first served: the figures, dropdown options and
+# clientside data it holds are not computed at import time, so the app starts quickly
+def build_layout(placeholders=False):
+    """
+    Returns the app layout for the current dataset version. With placeholders, the figures,
+    dropdown options and clientside data are left empty: enough for Dash to validate the
+    callbacks against it.
+    """
+    figure = (lambda component_id: {}) if placeholders else figure_template
+    options = (lambda column: []) if placeholders else create_dropdown_options
+    min_salary, max_salary = salary_bounds(snapshots.snapshot())
+
+    return html.Div(children=[
                                 # First section
                                 # Adding Title
                                 html.Div(children=[ 
@@ -504,7 +966,7 @@ app.layout = html.Div(children=[
                                                         ),  style={'background-color': dark_bg_color,}
                                             ),                                            
                                             dcc.Dropdown(id='job_dropdown',
-                                                      options=create_dropdown_options(df['Job']),
+                                                      options=options('Job'),
                                                       value='All',
                                                       placeholder="Select Data Job",
                                                       multi=True,
@@ -533,7 +995,7 @@ app.layout = html.Div(children=[
 
                                               ),                                              
                                               dcc.Dropdown(id='location_dropdown',
-                                                          options=create_dropdown_options(df['Location']),
+                                                          options=options('Location'),
                                                           value='All',
                                                           placeholder="Select Location",
                                                           multi=True,
@@ -562,7 +1024,7 @@ app.layout = html.Div(children=[
                                                               ), style={'background-color': dark_bg_color,}
                                                ),                                              
                                               dcc.Dropdown(id='company_dropdown',
-                                                          options=create_dropdown_options(df['Company']),
+                                                          options=options('Company'),
                                                           value='All',
                                                           placeholder="Select Company",
                                                           multi=True,
@@ -619,13 +1081,16 @@ app.layout = html.Div(children=[
                                               
                                               html.Div(
                                               dcc.RangeSlider(id='salary_slider',
-                                                              min=0, max=100000, step=2000,
+                                                              min=0, max=100000, step=SALARY_STEP,
                                                               marks={0:  {'label': '$0', 'style': {'font-size': 17, 'font-family': 'Tahoma'}},                                                                     
                                                                      30000: {'label': '$30k', 'style': {'font-size': 17, 'font-family': 'Tahoma'}},
                                                                      60000: {'label': '$60k', 'style': {'font-size': 17, 'font-family': 'Tahoma'}},
                                                                      90000: {'label': '$90k', 'style': {'font-size': 17, 'font-family': 'Tahoma'}},                                                                     
                                                                      },
-                                                              value=[min_salary, max_salary]
+                                                              value=[min_salary, max_salary],
+                                                              # Salary ranges are resolved from the sorted salary indexes, so the
+                                                              # figures can follow the slider while it is dragged
+                                                              updatemode='drag'
                                                               ), style={'background-color': 'white',}
                                               ),
                                     ], id='fifth-selector',
@@ -712,7 +1177,7 @@ app.layout = html.Div(children=[
                                                                         }
                                           ),
                                             # Card
-                                            dcc.Graph(id='card_salary'),
+                                            dcc.Graph(id='card_salary', figure=figure('card_salary')),
 
                                             
 
@@ -739,7 +1204,7 @@ app.layout = html.Div(children=[
                                                                         }
                                           ),
                                             # Card
-                                            dcc.Graph(id='card_demand'),
+                                            dcc.Graph(id='card_demand', figure=figure('card_demand')),
 
                                             
 
@@ -759,7 +1224,7 @@ app.layout = html.Div(children=[
                                         # Card with Data Jobs Info
                                         html.Div(children=[
                                                 # Job Demand Plot: Donnut chart
-                                                dcc.Graph(id='demand_job_plot'),                                   
+                                                dcc.Graph(id='demand_job_plot', figure=figure('demand_job_plot')),                                   
                                         
                                                 ], id='Donut_chart',
                                                   style={'margin-top': '10px',
@@ -776,7 +1241,7 @@ app.layout = html.Div(children=[
                                           html.Div(children=[
                                           
                                                 # Job-Salary Plot: Treemap
-                                                      dcc.Graph(id='demand_company_plot'),
+                                                      dcc.Graph(id='demand_company_plot', figure=figure('demand_company_plot')),
                                               
                                               ], id='Treemap',
                                                 style={'margin-top': '-'+top_plot_height,
@@ -793,7 +1258,7 @@ app.layout = html.Div(children=[
                                           html.Div(children=[
 
                                                 # Location Demand Plot: Map
-                                                dcc.Graph(id='demand_location_plot'),
+                                                dcc.Graph(id='demand_location_plot', figure=figure('demand_location_plot')),
                                                 ], id='Map',
                                                 style={'margin-top': '-'+top_plot_height,
                                                         'margin-left': '66%',
@@ -821,7 +1286,7 @@ app.layout = html.Div(children=[
                                                 html.Div(children=[
 
                                                 # Company Demand Plot: Boxplot
-                                                dcc.Graph(id='salary_job_plot'),
+                                                dcc.Graph(id='salary_job_plot', figure=figure('salary_job_plot')),
 
                                                 ], id='Boxplot',
                                                 style={'margin-top': '60px',
@@ -838,7 +1303,7 @@ app.layout = html.Div(children=[
                                                 html.Div(children=[
 
                                                     # Company-Salary Plot: 1° Heatmap
-                                                    dcc.Graph(id='salary_company_plot'),
+                                                    dcc.Graph(id='salary_company_plot', figure=figure('salary_company_plot')),
 
                                                     ], id='Heatmap',
                                                     style={'margin-top': '-'+bottom_plot_height,
@@ -855,7 +1320,7 @@ app.layout = html.Div(children=[
                                               html.Div(children=[
 
                                                     # Location-Salary Plot: 2° Heatmap
-                                                    dcc.Graph(id='salary_location_plot'),
+                                                    dcc.Graph(id='salary_location_plot', figure=figure('salary_location_plot')),
 
                                                     ], id='Heatmap_2',
                                                     style={'margin-top': '-'+bottom_plot_height,
@@ -888,6 +1353,16 @@ app.layout = html.Div(children=[
 
 
 
+                                # Normalized filter state shared by the figure callbacks
+                                dcc.Store(id='filter_state', data=key_to_state(initial_key)),
+
+                                # Salary boxplot mode of the figure in the layout
+                                dcc.Store(id='boxplot_mode',
+                                          data=None if placeholders else boxplot_mode(snapshots.snapshot())),
+
+                                # Encoded filter columns for the clientside callbacks, sent once with the layout
+                                dcc.Store(id='client_data', data=None if placeholders else client_data()),
+
                         ], id='entire-dashboard',
                            style={'width': '100%',
                                   'height': '100%',
@@ -896,6 +1371,18 @@ app.layout = html.Div(children=[
                                  }
                         )
 
+def serve_layout():
+    """
+    Returns the app layout of the dataset version of the request, built once per version.
+    """
+    return snapshots.snapshot().derived('layout', build_layout)
+
+# Components of the layout with their ids only, for Dash to validate the callbacks without
+# building the layout at import time
+app.validation_layout = html.Div([type(component)(id=component.id)
+                                  for component in build_layout(placeholders=True)._traverse_ids()])
+app.layout = serve_layout
+
 
 
 
@@ -903,140 +1390,178 @@ app.layout = html.Div(children=[
 
 # Callback Functions
 
-# Callback function for 'job_dropdown' as input and 'demand_job_plot' as output
-@app.callback([Output(component_id='demand_job_plot', component_property='figure'),
-               Output(component_id='demand_company_plot', component_property='figure'),
-               Output(component_id='demand_location_plot', component_property='figure'),
-               Output(component_id='salary_job_plot', component_property='figure'),
-               Output(component_id='salary_company_plot', component_property='figure'),
-               Output(component_id='salary_location_plot', component_property='figure'),
-               Output(component_id='card_salary', component_property='figure'),
-               Output(component_id='card_demand', component_property='figure')],
-              [Input(component_id='job_dropdown', component_property='value'),
-               Input(component_id='location_dropdown', component_property='value'),
-               Input(component_id='company_dropdown', component_property='value'),
-               Input(component_id='salary_slider', component_property='value'),
-               Input(component_id='salary_filter', component_property='value')]
-              )
-def update_output(job, location, company, salary, salary_filter):
-  """
-  This function updates the output plots based on the parameters of:
-  - job
-  - location
-  - company
-  - salary
-  """
-  dff = df.copy()
-  low, high = salary
-
-  if salary_filter == ['Enable Salary Range Selection']:
-    mask = (dff['Salary'] >= low) & (dff['Salary'] <= high)
-    dff = dff[mask]
+# Callback function for the dropdowns, slider and checkbox as inputs and the filter state as output.
+# The state only changes (and the figures only recompute) when the selected rows can change,
+# e.g. moving the salary slider does nothing while the salary range selection is disabled.
+# It runs in the browser (assets/dashboard.js) and normalizes the inputs like 'filter_key':
+# - job
+# - location
+# - company
+# - salary (only when the salary range selection is enabled)
+app.clientside_callback(ClientsideFunction(namespace='dashboard', function_name='update_filter_state'),
+                        Output(component_id='filter_state', component_property='data'),
+                        [Input(component_id='job_dropdown', component_property='value'),
+                         Input(component_id='location_dropdown', component_property='value'),
+                         Input(component_id='company_dropdown', component_property='value'),
+                         Input(component_id='salary_slider', component_property='value'),
+                         Input(component_id='salary_filter', component_property='value')],
+                        State(component_id='filter_state', component_property='data')
+                        )
 
-  if (job or company or location or salary) == None:
-        raise PreventUpdate 
-  
-  if 'All' in job and 'All' in location and 'All' in company:
-    
-    demand_job_plot = plot_pie_chart(dff)
-    demand_company_plot = plot_treemap(dff)
-    demand_location_plot = plot_cloropleth(dff)
-    salary_job_plot = plot_boxplot(dff)
-    salary_company_plot = plot_heatmap(dff)
-    salary_location_plot = plot_heatmap_2(dff)
-    card_demand = plot_card_demand(dff)
-    card_salary = plot_card_salary(dff)
+# Callback function for the filter state as input and the KPI cards as output. The number
+# of postings and their mean salary are computed in the browser from the 'client_data'
+# store, so the cards never wait for the server.
+app.clientside_callback(ClientsideFunction(namespace='dashboard', function_name='update_cards'),
+                        [Output(component_id='card_salary', component_property='figure'),
+                         Output(component_id='card_demand', component_property='figure')],
+                        Input(component_id='filter_state', component_property='data'),
+                        [State(component_id='client_data', component_property='data'),
+                         State(component_id='card_salary', component_property='figure'),
+                         State(component_id='card_demand', component_property='figure')],
+                        prevent_initial_call=True
+                        )
 
+# Callback functions for the filter state as input and each figure as output.
+# Every figure has its own callback, so they are requested and computed concurrently
+# and a slow figure does not hold back the others. The callbacks only patch the trace
+# data of the figures already in the layout, which show the initial state, so they
+# do not run on page load.
+def figure_callback(component_id):
+  """
+  This function returns the callback updating the trace data of a single figure from the filter state.
+  """
+  def update_figure(state):
+    if state is None:
+      raise PreventUpdate
+    patch = render_patch(component_id, state_to_key(state))
+    if 'metrics_start' in flask.g:
+      flask.g.metrics_computed = time.perf_counter()
+    return patch
+
+  return update_figure
+
+# The salary boxplot callback also checks the boxplot mode of the browser: after a hot reload
+# to a dataset version with the other mode, it sends the full figure and the new mode.
+def boxplot_callback(state, client_mode):
+  if state is None:
+    raise PreventUpdate
+  key = state_to_key(state)
+  mode = boxplot_mode(snapshots.snapshot())
+  if client_mode == mode:
+    result = render_patch('salary_job_plot', key), dash.no_update
   else:
-
-        if ('All' in (company and location)) and ('All' not in job):
-          dff = dff[dff.Job.isin(job)]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-        
-        elif ('All' in (job and location)) and ('All' not in company):
-          dff = dff[dff.Company.isin(company)]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-        
-        elif ('All' in (company and job)) and ('All' not in location):
-          dff = dff[dff.Location.isin(location)]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-        
-        elif ('All' in job) and ('All' not in (company and location)):
-          dff = dff[(dff.Company.isin(company)) & (dff.Location.isin(location))]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-
-        elif ('All' in location) and ('All' not in (company and job)):
-          dff = dff[(dff.Company.isin(company)) & (dff.Job.isin(job))]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-
-        elif ('All' in company) and ('All' not in (location and job)):
-          dff = dff[(dff.Location.isin(location)) & (dff.Job.isin(job))]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-
-        elif 'All' not in (company and location and job):
-          dff = dff[(dff.Job.isin(job)) & (dff.Location.isin(location)) & (dff.Company.isin(company))]
-
-          demand_job_plot = plot_pie_chart(dff)
-          demand_company_plot = plot_treemap(dff)
-          demand_location_plot = plot_cloropleth(dff)
-          salary_job_plot = plot_boxplot(dff)
-          salary_company_plot = plot_heatmap(dff)
-          salary_location_plot = plot_heatmap_2(dff)
-          card_demand = plot_card_demand(dff)
-          card_salary = plot_card_salary(dff)
-        
-        else:
-          raise PreventUpdate 
-
-  return demand_job_plot, demand_company_plot, demand_location_plot, salary_job_plot, salary_company_plot, salary_location_plot, card_salary, card_demand
+    result = render_figure('salary_job_plot', key), mode
+  if 'metrics_start' in flask.g:
+    flask.g.metrics_computed = time.perf_counter()
+  return result
+
+app.callback([Output(component_id='salary_job_plot', component_property='figure'),
+              Output(component_id='boxplot_mode', component_property='data')],
+             Input(component_id='filter_state', component_property='data'),
+             State(component_id='boxplot_mode', component_property='data'),
+             prevent_initial_call=True
+             )(boxplot_callback)
+
+for component_id in dashboard_figures:
+  if component_id in clientside_figures or component_id == 'salary_job_plot':
+    continue
+  app.callback(Output(component_id=component_id, component_property='figure'),
+               Input(component_id='filter_state', component_property='data'),
+               prevent_initial_call=True
+               )(figure_callback(component_id))
+
+# Callback functions for the text typed in each dropdown and the filter state as inputs and
+# the dropdown options as output. The options of a dropdown depend on the other filters, and
+# the selected values are always listed, so that they stay displayed.
+def options_callback(column):
+  """
+  This function returns the callback updating the options of a dropdown.
+  """
+  def update_options(search_value, state, value):
+    if state is None:
+      raise PreventUpdate
+    return create_dropdown_options(column, state_to_key(state), search=search_value, selected=value)
+
+  return update_options
+
+for dropdown_id, column in dropdown_columns.items():
+  app.callback(Output(component_id=dropdown_id, component_property='options'),
+               [Input(component_id=dropdown_id, component_property='search_value'),
+                Input(component_id='filter_state', component_property='data')],
+               State(component_id=dropdown_id, component_property='value'),
+               prevent_initial_call=True
+               )(options_callback(column))
+
+# Dataset snapshot of each request, pinned when it starts, so that it finishes against the
+# version it started with if a new one is swapped in meanwhile; the snapshot watcher and
+# admin endpoints (with DATAJOBS_ADMIN_TOKEN) are started with it (see snapshot_manager.py).
+# Registered first, the other hooks use the snapshot of the request.
+snapshots.init_app(app.server)
+
+# Server hooks for the metrics: sampled callback requests are timed from the request to
+# the serialized response, and the response size is recorded per callback output
+@app.server.before_request
+def start_metrics_timer():
+  if metrics.enabled and flask.request.path.endswith('/_dash-update-component') and metrics.sampled():
+    flask.g.metrics_start = time.perf_counter()
+
+@app.server.after_request
+def observe_metrics(response):
+  start = flask.g.pop('metrics_start', None)
+  if start is None:
+    return response
+
+  end = time.perf_counter()
+  output = (flask.request.get_json(silent=True) or {}).get('output', '')
+  callback_seconds.observe(end - start, output=output)
+  computed = flask.g.pop('metrics_computed', None)
+  if computed is not None:
+    serialization_seconds.observe(end - computed, output=output)
+  response_bytes.observe(response.content_length or 0, output=output)
+  return response
+
+# Response layer: cached callback responses by their inputs, ETags and compression
+# (registered after the metrics hooks, so that cache hits are timed and the compressed
+# sizes are recorded)
+response_cache.init_app(app.server)
+
+@app.server.route('/metrics')
+def metrics_endpoint():
+  return flask.Response(metrics.exposition(), content_type=CONTENT_TYPE)
+
+# Paginated dropdown options as JSON, e.g. /options/company?q=ban&job=Data%20Analyst&offset=100&limit=50
+# (the other filters as repeated 'job', 'location' and 'company' parameters, and 'salary=low,high')
+@app.server.route('/options/<name>')
+def options_endpoint(name):
+  column = name.capitalize()
+  if column not in dropdown_columns.values():
+    flask.abort(404)
+
+  args = flask.request.args
+  try:
+    salary_range = tuple(float(bound) for bound in args['salary'].split(',')) if 'salary' in args else None
+    if salary_range is not None and len(salary_range) != 2:
+      raise ValueError
+    key = filter_key(args.getlist('job') or None, args.getlist('location') or None,
+                     args.getlist('company') or None, salary_range)
+    counts = option_counts(column, key)
+    page = option_index(column).page(counts, search=args.get('q'),
+                                       offset=args.get('offset', 0), limit=args.get('limit', OPTIONS_LIMIT))
+  except ValueError:
+    flask.abort(400)
+  return flask.jsonify(page)
+
+# Labels of a dropdown column for the clientside data, e.g. /client-labels/company?version=<version>
+# (in code order; only for the dataset version of the request, as the codes of other versions differ)
+@app.server.route('/client-labels/<name>')
+def client_labels_endpoint(name):
+  column = name.capitalize()
+  if column not in dropdown_columns.values():
+    flask.abort(404)
+  snapshot = snapshots.snapshot()
+  if flask.request.args.get('version') != snapshot.version:
+    flask.abort(404)
+  return flask.jsonify(snapshot.data.categories[column].tolist())
 
 # Run the app
 if __name__ == '__main__':
@@ -0,0 +1,232 @@
+### DATA JOBS IN MEXICO: ARRAY STORE
+
+"""
+Read-only, memory-mapped NumPy arrays shared by the dashboard worker processes.
+
+The encoded columns ('EncodedFrame'), the filter indexes ('FilterEngine') and the
+aggregate cube ('AggregateCube') are plain NumPy arrays. They are saved once as
+'.npy' files in a store folder named after the dataset version and the build
+settings, and every process maps them back read-only ('mmap_mode="r"') instead of
+building its own copy. The pages live in the operating system page cache and are
+shared by all the processes mapping the files, so the resident memory added by a
+worker does not grow with the dataset, whether or not the workers were forked from
+a preloaded master. Reading a mapped array is zero-copy.
+
+Stores are written to a temporary folder and renamed into place, so concurrent
+processes never map a partial store. If the store folder is not writable, the
+arrays are kept in memory (logged as a warning).
+
+Every dataset version served (e.g. after a hot reload) gets its own store, so the
+stores folder is bounded: after loading a store, only the MAX_STORES most recently
+loaded ones are kept. A removed store is renamed away before being deleted, and the
+processes still mapping it keep their mapping (the files are only freed once unmapped).
+
+The stores folder defaults to 'datajobs-arrays' in the system temporary folder and
+can be changed with the DATAJOBS_ARRAY_DIR environment variable.
+"""
+
+# Import required libraries
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from datastore import EncodedFrame
+from filter_engine import FilterEngine
+from cube import SALARY_STEP, AggregateCube
+
+# Settings
+
+ARRAY_DIR = Path(os.environ.get('DATAJOBS_ARRAY_DIR', Path(tempfile.gettempdir()) / 'datajobs-arrays'))
+
+# Bump when the stored arrays (names, layout) change
+STORE_VERSION = 1
+
+MANIFEST_NAME = 'manifest.json'
+
+# Stores kept in the stores folder (the most recently loaded ones), and seconds after which
+# the temporary folder of an unfinished store is removed
+MAX_STORES = 3
+TMP_MAX_AGE = 3600
+
+logger = logging.getLogger(__name__)
+
+
+def store_key(*parts):
+    """
+    Returns a short hash identifying a store from JSON-compatible parts (dataset version, settings).
+    """
+    text = json.dumps([STORE_VERSION, *parts], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def save_arrays(directory, arrays, metadata=None):
+    """
+    Saves named arrays as '.npy' files with a manifest. The store is written to a temporary
+    folder and renamed into place; if another process wrote it first, that store is kept.
+
+    Parameters
+
+    directory: Folder of the store (String or Path).
+    arrays: Dictionary of NumPy arrays by name.
+    metadata: Optional JSON-compatible dictionary saved in the manifest.
+    """
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f'{directory.name}.', suffix='.tmp', dir=directory.parent))
+
+    try:
+        for name, array in arrays.items():
+            np.save(tmp_dir / f'{name}.npy', np.ascontiguousarray(array), allow_pickle=False)
+
+        manifest = {'version': STORE_VERSION,
+                    'arrays': {name: {'dtype': array.dtype.str, 'shape': list(array.shape)}
+                               for name, array in arrays.items()},
+                    'metadata': metadata or {},
+                    }
+        (tmp_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1) + '\n', encoding='utf-8')
+
+        try:
+            os.replace(tmp_dir, directory)
+        except OSError:
+            # The store was written by another process in the meantime
+            if not (directory / MANIFEST_NAME).exists():
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_arrays(directory, mmap_mode='r'):
+    """
+    Returns the arrays of a store, memory-mapped read-only by default, and its metadata.
+
+    Raises OSError if the store is missing and ValueError if it does not match its manifest.
+    """
+    directory = Path(directory)
+    manifest = json.loads((directory / MANIFEST_NAME).read_text(encoding='utf-8'))
+    if manifest.get('version') != STORE_VERSION:
+        raise ValueError(f"Array store version {manifest.get('version')} != {STORE_VERSION}")
+
+    arrays = {}
+    for name, spec in manifest['arrays'].items():
+        # Plain ndarray views of the mapping (not np.memmap), so results of indexing are ndarrays
+        array = np.asarray(np.load(directory / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False))
+        if array.dtype.str != spec['dtype'] or list(array.shape) != spec['shape']:
+            raise ValueError(f'Unexpected layout of {name}.npy')
+        arrays[name] = array
+
+    # The modification time of the manifest is the last load of the store, for the pruning
+    try:
+        os.utime(directory / MANIFEST_NAME)
+    except OSError:
+        pass
+    return arrays, manifest['metadata']
+
+
+def load_or_build(directory, build, mmap_mode='r'):
+    """
+    Returns the arrays and metadata of a store, building and saving them with build()
+    first when the store is missing or invalid. The built arrays are returned as they are
+    when the store cannot be written.
+    """
+    try:
+        return load_arrays(directory, mmap_mode)
+    except (OSError, ValueError, KeyError):
+        pass
+
+    arrays, metadata = build()
+    try:
+        save_arrays(directory, arrays, metadata)
+        return load_arrays(directory, mmap_mode)
+    except (OSError, ValueError, KeyError) as error:
+        logger.warning('Array store unavailable (%s); keeping the arrays in memory', error)
+        return arrays, metadata
+
+
+def prune_stores(array_dir=ARRAY_DIR, keep=None, max_stores=MAX_STORES):
+    """
+    Removes the least recently loaded stores of a folder beyond 'max_stores' (never the store
+    'keep'), and the temporary folders of unfinished stores older than TMP_MAX_AGE.
+
+    Returns
+
+    removed: Number of stores removed (Integer).
+    """
+    array_dir = Path(array_dir)
+    keep = Path(keep).name if keep is not None else None
+    stores = []
+    try:
+        paths = list(array_dir.iterdir())
+    except OSError:
+        return 0
+    for path in paths:
+        try:
+            if path.name.endswith('.tmp'):
+                if time.time() - path.stat().st_mtime > TMP_MAX_AGE:
+                    shutil.rmtree(path, ignore_errors=True)
+            elif path.name != keep and path.is_dir():
+                stores.append((path.joinpath(MANIFEST_NAME).stat().st_mtime, path))
+        except OSError:
+            continue
+
+    stores.sort(reverse=True)
+    removed = 0
+    for _, path in stores[max_stores - (keep is not None):]:
+        # Renamed first, so that no process loads a partly removed store
+        trash = path.with_name(f'{path.name}.{os.getpid()}.deleted.tmp')
+        try:
+            os.replace(path, trash)
+        except OSError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def load_shared(df, version, category_orders=None, step=SALARY_STEP, array_dir=ARRAY_DIR):
+    """
+    Returns the encoded dataset, filter engine and aggregate cube of the dashboard over
+    memory-mapped arrays shared by every process serving the same dataset version.
+
+    Parameters
+
+    df: Pandas Dataframe with the dataset, only read when the store is built, or a
+        function returning it.
+    version: Identifier of the dataset, e.g. the checksum returned by 'load_dataset' (String).
+    category_orders: Optional dictionary with the category order of some columns (see 'EncodedFrame').
+    step: Salary bucket grid step of the cube (Integer).
+    array_dir: Folder of the stores (String or Path).
+
+    Returns
+
+    data: EncodedFrame.
+    engine: FilterEngine.
+    cube: AggregateCube.
+    """
+    category_orders = {column: list(order) for column, order in (category_orders or {}).items()}
+    directory = Path(array_dir) / store_key(version, category_orders, step)
+
+    def build():
+        data = EncodedFrame(df() if callable(df) else df, category_orders=category_orders)
+        arrays, metadata = data.arrays()
+        arrays = {f'data.{name}': array for name, array in arrays.items()}
+        arrays.update({f'engine.{name}': array for name, array in FilterEngine(data).arrays().items()})
+        arrays.update({f'cube.{name}': array for name, array in AggregateCube(data, step=step).arrays().items()})
+        return arrays, metadata
+
+    arrays, metadata = load_or_build(directory, build)
+    prune_stores(array_dir, keep=directory)
+
+    def group(prefix):
+        return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+    data = EncodedFrame.from_arrays(group('data.'), metadata)
+    engine = FilterEngine.from_arrays(data, group('engine.'))
+    cube = AggregateCube.from_arrays(data, group('cube.'), step=step)
+    return data, engine, cube
@@ -0,0 +1,232 @@
+// DATA JOBS IN MEXICO DASHBOARD: CLIENTSIDE CALLBACKS
+//
+// The dashboard sends the dictionary-encoded filter columns to the browser once
+// ('client_data' store, see EncodedFrame.client_columns in datastore.py). The filter
+// state and the KPI cards are then computed here, without a request to the server.
+// Only the Job labels come with the layout: the labels of the Location and Company
+// codes are loaded once, from '/client-labels/<name>', when that column is first filtered.
+
+(function () {
+    'use strict';
+
+    var ALL = 'All';
+    var SALARY_FILTER = 'Enable Salary Range Selection';
+
+    // Step of the salary range slider (SALARY_STEP in cube.py)
+    var SALARY_STEP = 2000;
+
+    // Filter state position of each encoded column
+    var FILTER_COLUMNS = ['Job', 'Location', 'Company'];
+
+    var TYPED_ARRAYS = {
+        int8: Int8Array,
+        int16: Int16Array,
+        int32: Int32Array,
+        float32: Float32Array,
+        float64: Float64Array
+    };
+
+    // Decodes a base64 little-endian array into a typed array
+    function decodeArray(encoded) {
+        var binary = atob(encoded.data);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPED_ARRAYS[encoded.dtype](bytes.buffer);
+    }
+
+    // Decoded columns and the label requests of their dataset version, kept until the
+    // 'client_data' store changes
+    var decoded = {source: null, columns: null, labels: {}};
+
+    function decodeColumns(clientData) {
+        if (decoded.source !== clientData) {
+            var codes = {};
+            Object.keys(clientData.codes).forEach(function (column) {
+                codes[column] = decodeArray(clientData.codes[column]);
+            });
+            decoded.source = clientData;
+            decoded.columns = {
+                rows: clientData.rows,
+                categories: Object.assign({}, clientData.categories),
+                codes: codes,
+                salary: decodeArray(clientData.salary)
+            };
+            decoded.labels = {};
+        }
+        return decoded.columns;
+    }
+
+    // Promise of the labels of a column, loaded once per dataset version; the server only has
+    // the labels of its current version, so it fails after a reload to a new one
+    function loadLabels(clientData, columns, column) {
+        if (!decoded.labels[column]) {
+            var url = clientData.labels_url + column.toLowerCase() +
+                      '?version=' + encodeURIComponent(clientData.version);
+            decoded.labels[column] = fetch(url, {credentials: 'same-origin'})
+                .then(function (response) {
+                    if (!response.ok) {
+                        throw new Error('Labels of ' + column + ': HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function (labels) {
+                    columns.categories[column] = labels;
+                })
+                .catch(function (error) {
+                    delete decoded.labels[column];
+                    throw error;
+                });
+        }
+        return decoded.labels[column];
+    }
+
+    // Same rules as normalize_selection in filter_engine.py: null for no constraint,
+    // otherwise the sorted unique selected labels
+    function normalizeSelection(value) {
+        if (value === null || value === undefined) {
+            return null;
+        }
+        if (typeof value === 'string') {
+            value = [value];
+        }
+        if (value.indexOf(ALL) >= 0) {
+            return null;
+        }
+        return value.filter(function (label, i) {
+            return value.indexOf(label) === i;
+        }).sort();
+    }
+
+    // Boolean lookup table by code, or null when the column is not constrained
+    function codeLookup(columns, column, selection) {
+        if (selection === null) {
+            return null;
+        }
+        var categories = columns.categories[column];
+        var lookup = new Uint8Array(categories.length);
+        selection.forEach(function (label) {
+            var code = categories.indexOf(label);
+            if (code >= 0) {
+                lookup[code] = 1;
+            }
+        });
+        return lookup;
+    }
+
+    // Number of matching postings and sum/count of their disclosed salaries
+    function aggregate(columns, state) {
+        var lookups = FILTER_COLUMNS
+            .map(function (column, i) {
+                return [column, state[i]];
+            })
+            .map(function (entry) {
+                return [columns.codes[entry[0]], codeLookup(columns, entry[0], entry[1])];
+            })
+            .filter(function (entry) {
+                return entry[1] !== null;
+            });
+        var salaryRange = state[3];
+        var salary = columns.salary;
+
+        var count = 0, salarySum = 0, salaryCount = 0;
+        for (var row = 0; row < columns.rows; row++) {
+            var match = true;
+            for (var j = 0; j < lookups.length && match; j++) {
+                var code = lookups[j][0][row];
+                match = code >= 0 && lookups[j][1][code] === 1;
+            }
+            if (!match) {
+                continue;
+            }
+            var value = salary[row];
+            // Comparisons with NaN are false, so postings without salary never match a range
+            if (salaryRange !== null && !(value >= salaryRange[0] && value <= salaryRange[1])) {
+                continue;
+            }
+            count++;
+            if (!isNaN(value)) {
+                salarySum += value;
+                salaryCount++;
+            }
+        }
+        return {count: count, salarySum: salarySum, salaryCount: salaryCount};
+    }
+
+    // Copy of an indicator figure with a new value
+    function withValue(figure, value) {
+        var trace = Object.assign({}, figure.data[0], {value: value});
+        return Object.assign({}, figure, {data: [trace].concat(figure.data.slice(1))});
+    }
+
+    // Smallest salary range on the slider grid containing a range, as align_salary_range
+    // in cube.py, or null if a bound is not a finite number
+    function alignSalaryRange(salary) {
+        var low = Number(salary[0]), high = Number(salary[1]);
+        if (!isFinite(low) || !isFinite(high)) {
+            return null;
+        }
+        return [Math.floor(low / SALARY_STEP) * SALARY_STEP, Math.ceil(high / SALARY_STEP) * SALARY_STEP];
+    }
+
+    // KPI cards of a filter state
+    function cards(columns, state, cardSalary, cardDemand) {
+        var totals = aggregate(columns, state);
+        var meanSalary = totals.salaryCount ? totals.salarySum / totals.salaryCount : null;
+
+        return [withValue(cardSalary, meanSalary), withValue(cardDemand, totals.count)];
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        dashboard: {
+            // Same state as state_to_key in the dashboard, with the salary range aligned to the
+            // slider grid, so the cards and the server figures filter the same rows; no update
+            // when it did not change
+            update_filter_state: function (job, location, company, salary, salaryFilter, currentState) {
+                if (job === null || location === null || company === null || salary === null ||
+                    job === undefined || location === undefined || company === undefined || salary === undefined) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+
+                var enabled = Array.isArray(salaryFilter) && salaryFilter.length === 1 &&
+                              salaryFilter[0] === SALARY_FILTER;
+                var salaryRange = enabled ? alignSalaryRange(salary) : null;
+                if (enabled && salaryRange === null) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var state = [normalizeSelection(job),
+                             normalizeSelection(location),
+                             normalizeSelection(company),
+                             salaryRange];
+
+                if (JSON.stringify(state) === JSON.stringify(currentState)) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                return state;
+            },
+
+            update_cards: function (state, clientData, cardSalary, cardDemand) {
+                if (!state || !clientData) {
+                    throw window.dash_clientside.PreventUpdate;
+                }
+                var columns = decodeColumns(clientData);
+                var missing = FILTER_COLUMNS.filter(function (column, i) {
+                    return state[i] !== null && !columns.categories[column];
+                });
+                if (!missing.length) {
+                    return cards(columns, state, cardSalary, cardDemand);
+                }
+
+                // The cards keep their values if the labels cannot be loaded
+                return Promise.all(missing.map(function (column) {
+                    return loadLabels(clientData, columns, column);
+                })).then(function () {
+                    return cards(columns, state, cardSalary, cardDemand);
+                }, function () {
+                    throw window.dash_clientside.PreventUpdate;
+                });
+            }
+        }
+    });
+})();
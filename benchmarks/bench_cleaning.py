@@ -0,0 +1,179 @@
+### DATA JOBS IN MEXICO: CLEANING BENCHMARKS
+
+"""
+Throughput (rows per second) and peak memory of the raw-to-processed cleaning pipeline.
+
+Synthetic raw files are written by drawing every column independently, with replacement,
+from 'Dataset_raw.csv' (company names get a numbered variant, so that most rows are
+distinct and the deduplication keeps growing). Each file is cleaned in its own process
+with each of the following variants:
+
+- whole: the whole raw file read and cleaned at once, in memory
+- chunked: the raw file cleaned in chunks of --chunk-size rows with 'clean_csv'
+
+The peak resident memory of the chunked variant should stay flat as the raw file
+grows (apart from the 8 bytes per distinct row of the deduplication), while that of
+the whole file variant grows with it.
+
+As the synthetic rows are nearly all distinct, the chunked cleaning is first checked
+against 'clean' on the real raw file, and on the raw file written twice in a row (as
+after appending a re-scrape), in chunks of --check-chunk-size rows: chunks left empty
+by the deduplication must not change the processed rows.
+
+    python benchmarks/bench_cleaning.py --sizes 100k 1m --output cleaning.json
+"""
+
+# Import required libraries
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+from bench_dashboard import CACHE_DIR, ROOT, environment
+
+sys.path.insert(0, str(ROOT))
+
+from cleaning import CHUNK_SIZE, RAW_COLUMNS, RAW_CSV, clean, clean_chunks, clean_csv, read_raw
+
+# Settings
+
+VARIANTS = ['whole', 'chunked']
+
+# Numbered variants per company name
+COMPANY_VARIANTS = 1000
+
+
+def raw_csv(n_rows, seed=0):
+    """
+    Returns the path of the synthetic raw file of a size, writing it on first use (in chunks).
+    """
+    path = CACHE_DIR / f'raw_rows{n_rows}_seed{seed}.csv'
+    if path.exists():
+        return path
+
+    source = pd.read_csv(RAW_CSV, dtype=str)
+    rng = np.random.default_rng(seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.csv.tmp')
+    for start in range(0, n_rows, CHUNK_SIZE):
+        size = min(CHUNK_SIZE, n_rows - start)
+        chunk = pd.DataFrame({column: source[column].to_numpy()[rng.integers(len(source), size=size)]
+                              for column in RAW_COLUMNS})
+        variant = pd.Series(rng.integers(COMPANY_VARIANTS, size=size)).astype(str)
+        chunk['Company'] = chunk['Company'] + (' ' + variant).where(variant != '0', '')
+        chunk.to_csv(tmp, mode='a' if start else 'w', header=not start, index=False, encoding='utf-8')
+    tmp.replace(path)
+    return path
+
+
+def check_chunked(chunk_size):
+    """
+    Returns whether cleaning the real raw file in chunks, once and written twice in a row, gives
+    the processed rows of 'clean'.
+    """
+    raw = pd.read_csv(RAW_CSV, dtype=str)
+    expected = clean(raw)
+    same = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for copies in (1, 2):
+            path = Path(tmp) / f'raw{copies}.csv'
+            pd.concat([raw] * copies).to_csv(path, index=False, encoding='utf-8')
+            for size in (chunk_size, len(raw)):
+                output = Path(tmp) / 'processed.csv'
+                clean_csv(path, output, chunk_size=size)
+                chunks = pd.concat(list(clean_chunks(read_raw(path, size))), ignore_index=True)
+                same &= output.read_text(encoding='utf-8') == expected.to_csv(index=False)
+                same &= chunks.equals(expected)
+    return same
+
+
+def run_worker(variant, path, chunk_size):
+    """
+    Cleans a raw file with a variant (run in its own process) and returns its timing and peak memory.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'processed.csv'
+        start = time.perf_counter()
+        if variant == 'whole':
+            df = clean(pd.read_csv(path, dtype=str))
+            df.to_csv(output, index=False, encoding='utf-8')
+            raw_rows, processed_rows = None, len(df)
+        else:
+            stats = clean_csv(path, output, chunk_size=chunk_size)
+            raw_rows, processed_rows = stats['raw_rows'], stats['processed_rows']
+        seconds = time.perf_counter() - start
+
+    return {'variant': variant,
+            'seconds': seconds,
+            'processed_rows': processed_rows,
+            'raw_rows': raw_rows,
+            # Kilobytes on Linux
+            'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+
+
+def run_size(n_rows, seed, chunk_size, variants):
+    """
+    Benchmarks one raw file size, each variant in a separate process, and returns the records.
+    """
+    path = raw_csv(n_rows, seed)
+    records = []
+    for variant in variants:
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'results.json'
+            subprocess.run([sys.executable, __file__, '--worker', str(output), '--variant', variant,
+                            '--raw', str(path), '--chunk-size', str(chunk_size)],
+                           env=dict(os.environ), cwd=ROOT, check=True)
+            record = json.loads(output.read_text(encoding='utf-8'))
+        record.update({'rows': n_rows, 'rows_per_s': n_rows / record['seconds'],
+                       'raw_mb': path.stat().st_size / 2 ** 20})
+        records.append(record)
+        print(f"{n_rows:>10} rows ({record['raw_mb']:7.1f} MB) {variant:>8}: {record['seconds']:7.2f} s, "
+              f"{record['rows_per_s']:>10,.0f} rows/s, peak RSS {record['peak_rss_mb']:7.1f} MB, "
+              f"{record['processed_rows']} processed rows", flush=True)
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the raw-to-processed cleaning pipeline.')
+    parser.add_argument('--sizes', nargs='+', default=['100k', '1m'],
+                        help=f"raw file sizes (numbers of rows or {', '.join(synthetic.SIZES)})")
+    parser.add_argument('--variants', nargs='+', default=VARIANTS, choices=VARIANTS, help='cleaning variants')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='raw rows per chunk')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic raw files')
+    parser.add_argument('--check-chunk-size', type=int, default=97,
+                        help='raw rows per chunk of the check against the real raw file')
+    parser.add_argument('--output', help='JSON file with the results')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--variant', help=argparse.SUPPRESS)
+    parser.add_argument('--raw', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        record = run_worker(args.variant, args.raw, args.chunk_size)
+        Path(args.worker).write_text(json.dumps(record), encoding='utf-8')
+        sys.exit(0)
+
+    same_rows = check_chunked(args.check_chunk_size)
+    print(f"chunked cleaning of the real raw file: {'same rows' if same_rows else 'DIFFERENT ROWS'} as 'clean'",
+          flush=True)
+
+    records = []
+    for size in args.sizes:
+        records += run_size(synthetic.parse_size(size), args.seed, args.chunk_size, args.variants)
+
+    if args.output:
+        results = {'environment': environment(), 'chunk_size': args.chunk_size, 'same_rows': same_rows,
+                   'records': records}
+        Path(args.output).write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+
+    sys.exit(0 if same_rows else 1)
@@ -0,0 +1,257 @@
+### DATA JOBS IN MEXICO: DASHBOARD BENCHMARKS
+
+"""
+Benchmarks of the dashboard callback path on synthetic datasets.
+
+For each dataset size a synthetic snapshot is written (once, in a cache folder) and the
+dashboard is imported in a fresh process with DATAJOBS_SNAPSHOT_DIR pointing at it.
+Every figure is then measured under every filter scenario (each combination of the
+Job, Location and Company dropdowns and the salary range, selected or 'All'):
+
+- filter: selecting the rows or cube cells of the filter state
+- update: computing the figure data sent to the browser on a filter change (prepared
+  for encoding, see serialization.py)
+- patch_json / patch_bytes: serializing the Dash Patch with that data
+- plot: building the full figure (done once at startup)
+- figure_json / figure_bytes: serializing the full figure
+
+Times are in milliseconds (median and minimum over the repeats). Results are written
+as JSON together with the commit and library versions, so that runs from different
+commits can be compared:
+
+    python benchmarks/bench_dashboard.py --sizes 1k 100k --output before.json
+    python benchmarks/bench_dashboard.py --sizes 1k 100k --output after.json --compare before.json
+"""
+
+# Import required libraries
+import argparse
+import importlib.util
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import synthetic
+
+# Settings
+
+ROOT = Path(__file__).resolve().parent.parent
+DASHBOARD = ROOT / '3_DataJobsMX_Nov2023_Dashboard.py'
+CACHE_DIR = Path(tempfile.gettempdir()) / 'datajobs-benchmarks'
+
+DIMENSIONS = ['job', 'location', 'company', 'salary']
+
+# Number of (most frequent) labels selected in a constrained dropdown
+SELECTED_LABELS = 2
+SALARY_RANGE = (20000, 40000)
+
+# Median time ratio above which a measurement is reported as a regression
+REGRESSION_RATIO = 1.2
+
+
+def measure(function, repeat):
+    """
+    Calls function repeat times and returns its last result and the timings in milliseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, {'median': statistics.median(times), 'min': min(times)}
+
+
+def scenarios(data):
+    """
+    Returns the (name, job, location, company, salary) filter scenarios of a dataset: every
+    combination of constrained dimensions, selecting the most frequent labels.
+    """
+    selected = {}
+    for dimension, column in zip(DIMENSIONS, ['Job', 'Location', 'Company']):
+        counts = data.frame()[column].value_counts()
+        selected[dimension] = list(counts.index[:SELECTED_LABELS])
+    selected['salary'] = SALARY_RANGE
+
+    for constrained in itertools.product([False, True], repeat=len(DIMENSIONS)):
+        names = [d for d, c in zip(DIMENSIONS, constrained) if c]
+        values = [selected[d] if c else ('All' if d != 'salary' else None)
+                  for d, c in zip(DIMENSIONS, constrained)]
+        yield ('+'.join(names) or 'all', *values)
+
+
+def import_dashboard():
+    """
+    Imports the dashboard script as the 'dashboard' module, without running the server.
+    """
+    sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location('dashboard', DASHBOARD)
+    dashboard = importlib.util.module_from_spec(spec)
+    sys.modules['dashboard'] = dashboard
+    spec.loader.exec_module(dashboard)
+    return dashboard
+
+
+def run_worker(repeat):
+    """
+    Benchmarks the dashboard on the snapshot in DATAJOBS_SNAPSHOT_DIR (run in its own process).
+    """
+    from dash import Patch
+    from plotly.io.json import to_json_plotly
+
+    dashboard, startup = measure(import_dashboard, 1)
+
+    records = []
+    for name, job, location, company, salary in scenarios(dashboard.snapshots.current.data):
+        key = dashboard.filter_key(job, location, company, salary)
+
+        for component_id, (plot, update, source) in dashboard.dashboard_figures.items():
+            select = dashboard.selections[source]
+
+            def filter_rows():
+                dashboard.selection_cache.clear()
+                return select(key)
+
+            selection, filter_time = measure(filter_rows, repeat)
+            figure_update, update_time = measure(lambda: dashboard.prepare(update(selection)), repeat)
+
+            def patch_json():
+                patch = Patch()
+                dashboard.assign_patch(patch, figure_update)
+                return to_json_plotly(patch)
+
+            patch_text, patch_time = measure(patch_json, repeat)
+            figure, plot_time = measure(lambda: plot(selection), repeat)
+            figure_text, figure_time = measure(lambda: to_json_plotly(figure), repeat)
+
+            records.append({'rows': len(dashboard.snapshots.current.data),
+                            'scenario': name,
+                            'figure': component_id,
+                            'clientside': component_id in dashboard.clientside_figures,
+                            'filter_ms': filter_time,
+                            'update_ms': update_time,
+                            'patch_json_ms': patch_time,
+                            'patch_bytes': len(patch_text.encode('utf-8')),
+                            'plot_ms': plot_time,
+                            'figure_json_ms': figure_time,
+                            'figure_bytes': len(figure_text.encode('utf-8')),
+                            })
+
+    return {'rows': len(dashboard.snapshots.current.data), 'startup_ms': startup['median'], 'records': records}
+
+
+def snapshot_dir(n_rows, seed):
+    """
+    Returns the folder of the synthetic snapshot of a size, writing it on first use.
+    """
+    path = CACHE_DIR / f'rows{n_rows}_seed{seed}'
+    if not (path / 'Dataset_processed_v1.json').exists():
+        synthetic.write(n_rows, path, seed)
+    return path
+
+
+def run_size(n_rows, seed, repeat):
+    """
+    Benchmarks one dataset size in a separate process and returns its results.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'results.json'
+        env = dict(os.environ, DATAJOBS_SNAPSHOT_DIR=str(snapshot_dir(n_rows, seed)))
+        subprocess.run([sys.executable, __file__, '--worker', str(output), '--repeat', str(repeat)],
+                       env=env, cwd=ROOT, check=True)
+        return json.loads(output.read_text(encoding='utf-8'))
+
+
+def environment():
+    """
+    Returns the commit and library versions the benchmarks ran with.
+    """
+    import dash
+    import numpy
+    import pandas
+    import plotly
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {'commit': commit,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy.__version__,
+            'pandas': pandas.__version__,
+            'plotly': plotly.__version__,
+            'dash': dash.__version__,
+            }
+
+
+def compare(results, baseline, ratio=REGRESSION_RATIO):
+    """
+    Prints the measurements whose median time grew by more than ratio against a baseline
+    run and returns their number.
+    """
+    def index(run):
+        return {(r['rows'], r['scenario'], r['figure']): r for size in run['sizes'] for r in size['records']}
+
+    current, previous = index(results), index(baseline)
+    # Only the measurements of both runs are compared (the sizes or scenarios may differ)
+    shared = sorted(current.keys() & previous.keys())
+    regressions = 0
+    for key in shared:
+        for metric in ['filter_ms', 'update_ms', 'patch_json_ms', 'plot_ms', 'figure_json_ms']:
+            new, old = current[key][metric]['median'], previous[key][metric]['median']
+            if old > 0 and new / old > ratio:
+                regressions += 1
+                print(f'{key[0]:>9} rows  {key[1]:<28} {key[2]:<22} {metric:<14} {old:9.3f} -> {new:9.3f} ms')
+
+    for metric in ['patch_bytes', 'figure_bytes']:
+        new = sum(current[key][metric] for key in shared)
+        old = sum(previous[key][metric] for key in shared)
+        print(f'{metric}: {old} -> {new}')
+
+    print(f'{regressions} regression(s) above {ratio:.2f}x')
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard callback path on synthetic datasets.')
+    parser.add_argument('--sizes', nargs='+', default=['1k', '100k'],
+                        help=f"dataset sizes (numbers of rows or {', '.join(synthetic.SIZES)})")
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per measurement')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--output', default=str(CACHE_DIR / 'benchmark_results.json'),
+                        help='JSON file with the results (in the benchmarks cache folder by default)')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        Path(args.worker).write_text(json.dumps(run_worker(args.repeat)), encoding='utf-8')
+        sys.exit(0)
+
+    results = {'environment': environment(),
+               'seed': args.seed,
+               'repeat': args.repeat,
+               'sizes': [],
+               }
+    for size in args.sizes:
+        n_rows = synthetic.parse_size(size)
+        print(f'Benchmarking {n_rows} rows...', flush=True)
+        results['sizes'].append(run_size(n_rows, args.seed, args.repeat))
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+    print(f'Results written to {output}')
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        sys.exit(1 if compare(results, baseline) else 0)
@@ -0,0 +1,149 @@
+### DATA JOBS IN MEXICO: EXTRACTION BENCHMARKS
+
+"""
+Pages per second of the vacancy extraction, over the saved OCC results pages.
+
+The results pages rendered by 'occ_standin.py' from the raw dataset are extracted with
+each of the following variants, and every variant must extract the same vacancies as
+the notebook:
+
+- notebook: BeautifulSoup's 'html.parser' and the notebook's 'extract_data' (copied
+  here) for every field of every card, compiling the class regular expressions on every
+  lookup (before)
+- html.parser: the VacancyExtractor on BeautifulSoup's 'html.parser'
+- lxml: the VacancyExtractor on lxml (after)
+
+Times are the median and minimum over the repeats of extracting every page:
+
+    python benchmarks/bench_extraction.py --repeat 5 --output extraction.json
+"""
+
+# Import required libraries
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from bench_dashboard import ROOT, environment, measure
+from occ_standin import NUMBER_PAGES, read_pages, write_pages
+
+sys.path.insert(0, str(ROOT))
+
+from bs4 import BeautifulSoup
+
+from occscraper import COMPANY_CLASS, JOBNAME_CLASS, LOCATION_CLASS, SALARY_CLASS, VACANCY_CLASS
+from vacancy_extractor import VacancyExtractor, lxml
+
+# Settings
+
+VARIANTS = ['notebook', 'html.parser', 'lxml']
+
+CLASSES = (VACANCY_CLASS, JOBNAME_CLASS, SALARY_CLASS, COMPANY_CLASS, LOCATION_CLASS)
+
+
+# Function to try to extract data from html, copied from the notebook (the baseline)
+def extract_data(data, html, tag_1, tag_2, tag_3, class_id_1, class_id_2, class_id_3):
+    """
+    The purpose of this function is to extract the data from a html soup using specific tags and class identifiers.
+    This function will try to scrap the html by using three specific tags and class identifiers. If none is successful, it will append a Numpy NaN value.
+    
+    Parameters
+
+    data (list): List that will store the data scraped from the html soup.
+    html (string): HTML soup processed using Beautiful Soup.
+    tag_1 (string): Class tag such as "span", "div" or "p".
+    tag_2 (string): Class tag such as "span", "div" or "p".
+    tag_3 (string): Class tag such as "span", "div" or "p".
+    class_id_1 (re string): Class identifier as a regular expression
+    class_id_2 (re string): Class identifier as a regular expression
+    class_id_3 (re string): Class identifier as a regular expression
+
+    Returns
+
+    data (list): List with the extracted data.
+
+    """    
+
+    try:
+        data.append(html.find(tag_1, attrs = {'class': re.compile(class_id_1)}).text)    
+    except:
+            try:
+                data.append(html.find(tag_2, attrs = {'class': re.compile(class_id_2)}).text)
+            except:
+                try:
+                    data.append(html.find(tag_3, attrs = {'class': re.compile(class_id_3)}).text)
+                except:
+                    data.append(np.nan)
+    return data
+
+
+def notebook_extract(html):
+    """
+    Returns the vacancies of a results page extracted as in the notebook.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    vacancies = []
+    for tag, vacancies_class in VACANCY_CLASS:
+        for vacancy in soup.find_all(tag, attrs={'class': vacancies_class}):
+            job = []
+            for field_class in (JOBNAME_CLASS, SALARY_CLASS, COMPANY_CLASS, LOCATION_CLASS):
+                extract_data(job, vacancy, field_class[0][0], field_class[1][0], field_class[2][0],
+                             field_class[0][1], field_class[1][1], field_class[2][1])
+            vacancies.append(job)
+    return vacancies
+
+
+def extraction(variant):
+    """
+    Returns the function extracting the vacancies of a page with a variant.
+    """
+    if variant == 'notebook':
+        return notebook_extract
+    return VacancyExtractor(*CLASSES, parser=variant).extract
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the vacancy extraction over saved OCC results pages.')
+    parser.add_argument('--variants', nargs='+', default=VARIANTS, choices=VARIANTS, help='extraction variants')
+    parser.add_argument('--pages', type=int, default=NUMBER_PAGES, help='results pages per search term')
+    parser.add_argument('--repeat', type=int, default=3, help='repeats per variant')
+    parser.add_argument('--output', help='JSON file with the results')
+    args = parser.parse_args()
+
+    if lxml is None:
+        args.variants = [variant for variant in args.variants if variant != 'lxml']
+    pages = [text for _, text in read_pages(write_pages(number_pages=args.pages))]
+
+    records, reference = [], None
+    for variant in args.variants:
+        extract = extraction(variant)
+        vacancies, times = measure(lambda: [extract(text) for text in pages], args.repeat)
+
+        # NaN != NaN, so the missing fields are compared as None
+        vacancies = [[value if isinstance(value, str) else None for value in vacancy]
+                     for page in vacancies for vacancy in page]
+        if reference is None:
+            reference = vacancies
+        record = {'variant': variant,
+                  'pages': len(pages),
+                  'vacancies': len(vacancies),
+                  'median_ms': times['median'],
+                  'min_ms': times['min'],
+                  'pages_per_s': len(pages) / times['median'] * 1000,
+                  'same_vacancies': vacancies == reference,
+                  }
+        record['speedup'] = records[0]['median_ms'] / record['median_ms'] if records else 1.0
+        records.append(record)
+
+        print(f"{variant:>12}: {record['median_ms']:8.1f} ms, {record['pages_per_s']:7.1f} pages/s, "
+              f"x{record['speedup']:.1f}, {record['vacancies']} vacancies"
+              f"{'' if record['same_vacancies'] else ', DIFFERENT VACANCIES'}")
+
+    if args.output:
+        results = {'environment': environment(), 'records': records}
+        Path(args.output).write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+
+    sys.exit(0 if all(record['same_vacancies'] for record in records) else 1)
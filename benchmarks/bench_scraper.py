@@ -0,0 +1,92 @@
+### DATA JOBS IN MEXICO: SCRAPER BENCHMARKS
+
+"""
+Wall time of a scrape at several concurrency limits, against the local OCC stand-in server.
+
+The notebook's search (14 terms x 10 pages) is scraped from the saved results pages served
+by 'occ_standin.py' with a simulated page latency, once per concurrency limit, with the
+plain HTTP transport and no per-host rate limit. Every run must extract the same vacancies;
+the wall time should scale down with the concurrency until the extraction (CPU) dominates:
+
+    python benchmarks/bench_scraper.py --concurrency 1 4 16 --latency 0.2
+    python benchmarks/bench_scraper.py --failure-rate 0.1 --output scraper.json
+"""
+
+# Import required libraries
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from bench_dashboard import ROOT, environment
+from occ_standin import JOBS_LIST, LATENCY, NUMBER_PAGES, StandInServer, write_pages
+
+sys.path.insert(0, str(ROOT))
+
+from occscraper import Fetcher, HTTPTransport, run, scrape
+
+# Settings
+
+CONCURRENCY = [1, 2, 4, 8, 16]
+
+# Seconds before the first retry of a failed page (short, the stand-in recovers at once)
+BACKOFF = 0.05
+
+
+def scrape_standin(server, concurrency, jobs_list=JOBS_LIST, number_pages=NUMBER_PAGES):
+    """
+    Scrapes the stand-in server and returns the vacancies and the run statistics.
+    """
+    fetcher = Fetcher(HTTPTransport(max_connections=concurrency), concurrency=concurrency, rate=None,
+                      backoff=BACKOFF)
+    start = time.perf_counter()
+    df = run(scrape(jobs_list, number_pages, fetcher=fetcher, base_url=server.base_url, verbose=False))
+    wall = time.perf_counter() - start
+
+    pages = len(jobs_list) * number_pages
+    return df, {'concurrency': concurrency,
+                'wall_s': wall,
+                'pages': pages,
+                'pages_per_s': pages / wall,
+                'vacancies': len(df),
+                'requests': fetcher.requests,
+                'retries': fetcher.retried,
+                'failures': len(fetcher.failures),
+                }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the scraper against a local OCC stand-in server.')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=CONCURRENCY, help='concurrency limits')
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds the stand-in takes per page')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='share of the pages whose first request fails with 503')
+    parser.add_argument('--pages', type=int, default=NUMBER_PAGES, help='results pages per search term')
+    parser.add_argument('--output', help='JSON file with the results')
+    args = parser.parse_args()
+
+    directory = write_pages(number_pages=args.pages)
+
+    records, reference = [], None
+    for concurrency in args.concurrency:
+        # A new server per run, so that every run sees the same failures
+        with StandInServer(directory, latency=args.latency, failure_rate=args.failure_rate) as server:
+            df, record = scrape_standin(server, concurrency, number_pages=args.pages)
+
+        if reference is None:
+            reference = df
+        record['same_vacancies'] = df.equals(reference)
+        record['speedup'] = records[0]['wall_s'] / record['wall_s'] if records else 1.0
+        records.append(record)
+
+        print(f"concurrency {concurrency:>3}: {record['wall_s']:7.2f} s, {record['pages_per_s']:6.1f} pages/s, "
+              f"x{record['speedup']:.1f}, {record['vacancies']} vacancies, {record['retries']} retries, "
+              f"{record['failures']} failed pages{'' if record['same_vacancies'] else ', DIFFERENT VACANCIES'}")
+
+    if args.output:
+        results = {'environment': environment(), 'latency_s': args.latency,
+                   'failure_rate': args.failure_rate, 'records': records}
+        Path(args.output).write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+
+    sys.exit(0 if all(record['same_vacancies'] and not record['failures'] for record in records) else 1)
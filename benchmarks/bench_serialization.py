@@ -0,0 +1,157 @@
+### DATA JOBS IN MEXICO: SERIALIZATION BENCHMARKS
+
+"""
+Benchmarks of the JSON encoding of the dashboard callback responses on synthetic datasets.
+
+The figure update of every figure under every filter scenario (see bench_dashboard.py)
+is encoded as a Dash Patch with each of the following variants:
+
+- json: plotly's 'json' engine on the raw update
+- orjson_raw: the 'orjson' engine on the raw update (label arrays and NumPy scalars
+  make plotly fall back to its cleaning pass)
+- orjson: the 'orjson' engine on the update converted by serialization.prepare
+- orjson_typed: the same, with numeric arrays as base64 typed arrays (plotly.js 2.28+)
+- long_form (heatmaps only): the 'orjson' engine on the heatmap sent as one
+  (x, y, z) triple per cell, like a density heatmap of a long-form Dataframe
+
+Times are in milliseconds (median and minimum over the repeats) and sizes in bytes:
+
+    python benchmarks/bench_serialization.py --sizes 1k 100k --output serialization.json
+"""
+
+# Import required libraries
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+import synthetic
+from bench_dashboard import ROOT, environment, import_dashboard, measure, scenarios, snapshot_dir
+
+# Settings
+
+VARIANTS = ['json', 'orjson_raw', 'orjson', 'orjson_typed', 'long_form']
+
+HEATMAPS = ['salary_company_plot', 'salary_location_plot']
+
+
+def long_form(update):
+    """
+    Returns a matrix heatmap update with one x, y and z value per cell.
+    """
+    trace = update['data'][0]
+    z = np.asarray(trace['z'])
+    return {'data': [{'x': np.tile(np.asarray(trace['x'], dtype=object), z.shape[0]),
+                      'y': np.repeat(np.asarray(trace['y'], dtype=object), z.shape[1]),
+                      'z': z.ravel()}]}
+
+
+def run_worker(repeat):
+    """
+    Benchmarks the encoding of the figure updates on the snapshot in DATAJOBS_SNAPSHOT_DIR
+    (run in its own process).
+    """
+    from dash import Patch
+    from plotly.io.json import to_json_plotly
+
+    from serialization import orjson, prepare
+
+    dashboard = import_dashboard()
+
+    def encoder(update, engine, convert=None):
+        def encode():
+            patch = Patch()
+            dashboard.assign_patch(patch, convert(update) if convert else update)
+            return to_json_plotly(patch, engine=engine)
+        return encode
+
+    records = []
+    for name, job, location, company, salary in scenarios(dashboard.snapshots.current.data):
+        key = dashboard.filter_key(job, location, company, salary)
+
+        for component_id, (_, update, source) in dashboard.dashboard_figures.items():
+            figure_update = update(dashboard.selections[source](key))
+
+            variants = {'json': encoder(figure_update, 'json')}
+            if orjson is not None:
+                variants['orjson_raw'] = encoder(figure_update, 'orjson')
+                variants['orjson'] = encoder(figure_update, 'orjson', lambda u: prepare(u, typed_arrays=False))
+                variants['orjson_typed'] = encoder(figure_update, 'orjson', lambda u: prepare(u, typed_arrays=True))
+                if component_id in HEATMAPS:
+                    variants['long_form'] = encoder(long_form(figure_update), 'orjson',
+                                                    lambda u: prepare(u, typed_arrays=False))
+
+            for variant, encode in variants.items():
+                text, encode_time = measure(encode, repeat)
+                records.append({'rows': len(dashboard.snapshots.current.data),
+                                'scenario': name,
+                                'figure': component_id,
+                                'variant': variant,
+                                'encode_ms': encode_time,
+                                'bytes': len(text.encode('utf-8')),
+                                })
+
+    return {'rows': len(dashboard.snapshots.current.data), 'records': records}
+
+
+def run_size(n_rows, seed, repeat):
+    """
+    Benchmarks one dataset size in a separate process and returns its results.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        output = Path(tmp) / 'results.json'
+        env = dict(os.environ, DATAJOBS_SNAPSHOT_DIR=str(snapshot_dir(n_rows, seed)))
+        subprocess.run([sys.executable, __file__, '--worker', str(output), '--repeat', str(repeat)],
+                       env=env, cwd=ROOT, check=True)
+        return json.loads(output.read_text(encoding='utf-8'))
+
+
+def report(size):
+    """
+    Prints the median encoding time and size of every figure and variant, summed over the scenarios.
+    """
+    totals = {}
+    for r in size['records']:
+        total = totals.setdefault((r['figure'], r['variant']), [0.0, 0])
+        total[0] += r['encode_ms']['median']
+        total[1] += r['bytes']
+
+    print(f"{size['rows']} rows (sums over the filter scenarios)")
+    for figure in dict.fromkeys(f for f, _ in totals):
+        cells = [f'{v}: {totals[figure, v][0]:8.2f} ms {totals[figure, v][1]:9d} B'
+                 for v in VARIANTS if (figure, v) in totals]
+        print(f'  {figure:<22} ' + '  '.join(cells))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the JSON encoding of the dashboard callback responses.')
+    parser.add_argument('--sizes', nargs='+', default=['1k', '100k'],
+                        help=f"dataset sizes (numbers of rows or {', '.join(synthetic.SIZES)})")
+    parser.add_argument('--repeat', type=int, default=5, help='timed calls per measurement')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--output', default='serialization_results.json', help='JSON file with the results')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        Path(args.worker).write_text(json.dumps(run_worker(args.repeat)), encoding='utf-8')
+        sys.exit(0)
+
+    results = {'environment': environment(),
+               'seed': args.seed,
+               'repeat': args.repeat,
+               'sizes': [],
+               }
+    for size in args.sizes:
+        n_rows = synthetic.parse_size(size)
+        print(f'Benchmarking {n_rows} rows...', flush=True)
+        results['sizes'].append(run_size(n_rows, args.seed, args.repeat))
+        report(results['sizes'][-1])
+
+    Path(args.output).write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+    print(f'Results written to {args.output}')
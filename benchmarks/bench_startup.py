@@ -0,0 +1,181 @@
+### DATA JOBS IN MEXICO: STARTUP BENCHMARKS
+
+"""
+Startup time budget of the dashboard server.
+
+The WSGI entry point ('wsgi.py') is imported in a fresh process with '-X importtime'
+(without its layout warm-up), and the parsed report gives the total import time, the
+time spent in the dashboard module itself and the slowest imported packages. The
+app's own share is the time spent in the modules that importing the frameworks alone
+(NumPy, pandas, Flask, Dash and plotly.graph_objects) does not load.
+
+Readiness is the time from the start of a fresh process until its first '/_dash-layout'
+response, measured twice:
+
+- warm: as served by gunicorn, the entry point builds the layout (figures, dropdown
+  options and clientside data) when loaded, in the preloaded master; the first layout
+  response is then what every forked worker waits for
+- lazy: with DATAJOBS_WARM_UP=0, the first layout response builds the layout
+
+The check fails (exit status 1) when the import, the app's own share, the warm
+readiness or the first layout response of a warmed up worker takes longer than its
+budget, or when a module that must load on first use only (e.g. plotly.express) is
+imported at startup:
+
+    python benchmarks/bench_startup.py --budget 2.0 --app-budget 0.25 --ready-budget 4.0
+    python benchmarks/bench_startup.py --size 1m --output startup.json
+"""
+
+# Import required libraries
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import synthetic
+from bench_dashboard import ROOT, environment, snapshot_dir
+
+# Settings
+
+# Seconds allowed to import the WSGI entry point, and for the app's own share of it. The
+# import is mostly the frameworks' (about 1.4 s for Dash, pandas, Flask and NumPy on a
+# single-core VM, against 0.07 s for the app), so the app's share is the tight budget
+IMPORT_BUDGET = 2.0
+APP_BUDGET = 0.25
+
+# Seconds allowed from the start of the process to the first layout response with the
+# warm-up (import and layout, about 2.3 s on the same VM), and for that first response
+# once the layout is warm (what a worker forked from the preloaded master waits for)
+READY_BUDGET = 4.0
+FIRST_LAYOUT_BUDGET = 0.25
+
+# Imports of the frameworks the app is built on
+FRAMEWORKS = 'import numpy, pandas, flask, dash, plotly.graph_objects'
+
+# Modules that must not be imported at startup
+DEFERRED_MODULES = ['plotly.express']
+
+READINESS_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import wsgi
+loaded = time.perf_counter()
+response = wsgi.server.test_client().get('/_dash-layout')
+ready = time.perf_counter()
+print(json.dumps({'load_s': loaded - start, 'first_layout_s': ready - loaded, 'ready_s': ready - start,
+                  'layout_status': response.status_code, 'layout_bytes': len(response.data)}))
+"""
+
+
+def parse_importtime(text):
+    """
+    Returns the modules of an '-X importtime' report as (name, depth, self seconds,
+    cumulative seconds) tuples, in import order.
+    """
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return modules
+
+
+def run(code, env, *options):
+    """
+    Runs Python code in a fresh process from the repository root and returns it.
+    """
+    return subprocess.run([sys.executable, *options, '-c', code], env=env, cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+
+
+def readiness(env):
+    """
+    Returns the load, first layout and total readiness times of the WSGI entry point in a fresh process.
+    """
+    return json.loads(run(READINESS_SCRIPT, env).stdout.strip().splitlines()[-1])
+
+
+def measure(env, top=10):
+    """
+    Returns the import report and the readiness times of the WSGI entry point, warm and lazy.
+    """
+    lazy_env = {**env, 'DATAJOBS_WARM_UP': '0'}
+    modules = parse_importtime(run('import wsgi', lazy_env, '-X', 'importtime').stderr)
+    imported = {name for name, *_ in modules}
+    frameworks = {name for name, *_ in parse_importtime(run(FRAMEWORKS, env, '-X', 'importtime').stderr)}
+    wsgi = next(m for m in modules if m[0] == 'wsgi')
+    # Packages imported directly by the entry point and the dashboard, slowest first
+    packages = sorted((m for m in modules if m[1] <= 1 and m[0] != 'wsgi'), key=lambda m: -m[3])
+
+    return {'import_s': wsgi[3],
+            'dashboard_self_s': wsgi[2],
+            'app_s': sum(self_s for name, _, self_s, _ in modules if name not in frameworks),
+            'slowest_imports': [{'module': name, 'cumulative_s': cumulative}
+                                for name, _, _, cumulative in packages[:top]],
+            'deferred_imported': [name for name in DEFERRED_MODULES if name in imported],
+            'readiness': {'warm': readiness({**env, 'DATAJOBS_WARM_UP': '1'}), 'lazy': readiness(lazy_env)},
+            }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the startup time budget of the dashboard.')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET, help='seconds allowed to import the app')
+    parser.add_argument('--app-budget', type=float, default=APP_BUDGET,
+                        help="seconds allowed for the app's own share of the import")
+    parser.add_argument('--ready-budget', type=float, default=READY_BUDGET,
+                        help='seconds allowed from the start of the process to the first layout, warmed up')
+    parser.add_argument('--first-layout-budget', type=float, default=FIRST_LAYOUT_BUDGET,
+                        help='seconds allowed for the first layout response once warmed up')
+    parser.add_argument('--size', help=f"synthetic dataset size (number of rows or {', '.join(synthetic.SIZES)}); "
+                                       "the bundled dataset by default")
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic dataset')
+    parser.add_argument('--output', help='JSON file with the results')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.size:
+        env['DATAJOBS_SNAPSHOT_DIR'] = str(snapshot_dir(synthetic.parse_size(args.size), args.seed))
+        # Build the array store once, so that startup is measured as for a new worker
+        run('import wsgi', env)
+
+    results = measure(env)
+    results['environment'] = environment()
+    results['budget_s'] = args.budget
+    results['app_budget_s'] = args.app_budget
+    results['ready_budget_s'] = args.ready_budget
+    results['first_layout_budget_s'] = args.first_layout_budget
+
+    print(f"Import: {results['import_s']:.3f} s (budget {args.budget:.3f} s), "
+          f"app's own share: {results['app_s']:.3f} s (budget {args.app_budget:.3f} s), "
+          f"dashboard module: {results['dashboard_self_s']:.3f} s")
+    for package in results['slowest_imports']:
+        print(f"  {package['module']:<32} {package['cumulative_s']:.3f} s")
+    for mode, readiness in results['readiness'].items():
+        print(f"Ready ({mode}) after {readiness['ready_s']:.3f} s: loaded after {readiness['load_s']:.3f} s, "
+              f"first layout {readiness['first_layout_s']:.3f} s more ({readiness['layout_bytes']} bytes)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=1) + '\n', encoding='utf-8')
+
+    failures = []
+    if results['import_s'] > args.budget:
+        failures.append(f"import takes {results['import_s']:.3f} s, over the {args.budget:.3f} s budget")
+    if results['app_s'] > args.app_budget:
+        failures.append(f"the app's own share takes {results['app_s']:.3f} s, over the {args.app_budget:.3f} s budget")
+    warm = results['readiness']['warm']
+    if warm['ready_s'] > args.ready_budget:
+        failures.append(f"the first layout takes {warm['ready_s']:.3f} s from the start, "
+                        f"over the {args.ready_budget:.3f} s budget")
+    if warm['first_layout_s'] > args.first_layout_budget:
+        failures.append(f"the first layout response of a warmed up worker takes {warm['first_layout_s']:.3f} s, "
+                        f"over the {args.first_layout_budget:.3f} s budget")
+    if warm['layout_status'] != 200:
+        failures.append(f"the layout response has status {warm['layout_status']}")
+    failures += [f'{name} is imported at startup' for name in results['deferred_imported']]
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
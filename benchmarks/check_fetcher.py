@@ -0,0 +1,196 @@
+### DATA JOBS IN MEXICO: FETCHER CHECKS
+
+"""
+Checks of the scraper's fetch engine ('Fetcher') against the local OCC stand-in server.
+
+The scraper benchmark only sees pages that succeed, at once or after a first 503. Each
+check here runs a Fetcher against a stand-in server configured for one failure path,
+and compares what the server received (its request log) with what the fetcher did:
+
+- not_found: a 404 is not retried, and the page is listed in 'failures'
+- retries_exhausted: a page still failing after the retries is skipped and listed in 'failures'
+- retry_after: a 503 with a Retry-After header is retried after that many seconds, not the backoff
+- backoff: a 503 without Retry-After is retried after the (short) backoff
+- host_rate: requests to the same host are spaced by 1 / rate seconds, whatever the concurrency
+- other_hosts: requests waiting for the rate limit of their host do not hold the concurrency
+  slots, so the requests to another host are not delayed by them
+
+The script exits with status 1 when a check fails:
+
+    python benchmarks/check_fetcher.py
+"""
+
+# Import required libraries
+import sys
+import time
+
+from bench_dashboard import ROOT
+from occ_standin import JOBS_LIST, StandInServer, write_pages
+
+sys.path.insert(0, str(ROOT))
+
+from occscraper import Fetcher, HTTPTransport, job_url, page_urls, run
+
+# Settings
+
+# Pages per search term of the checks
+NUMBER_PAGES = 2
+
+# Seconds to wait for the Retry-After checks, and before a retry otherwise
+RETRY_AFTER = 1
+BACKOFF = 0.05
+
+# Requests per second of the rate limit check, over this many pages
+RATE = 10.0
+RATE_PAGES = 20
+
+# Seconds of scheduling and network jitter tolerated in the timings
+TOLERANCE = 0.02
+
+
+def fetch_urls(fetcher, urls):
+    """
+    Returns the Responses (None for the pages that could not be fetched) of urls, and closes the fetcher.
+    """
+    async def fetch():
+        try:
+            return await fetcher.fetch_all(urls)
+        finally:
+            await fetcher.close()
+
+    return run(fetch())
+
+
+def new_fetcher(concurrency=4, rate=None, retries=2, backoff=BACKOFF):
+    """
+    Returns a Fetcher over the plain HTTP transport.
+    """
+    return Fetcher(HTTPTransport(max_connections=concurrency), concurrency=concurrency, rate=rate,
+                   retries=retries, backoff=backoff)
+
+
+def requests_by_path(server):
+    """
+    Returns the arrival times and statuses of the requests received by a server, by path.
+    """
+    requests = {}
+    for arrival, path, status in sorted(server.log):
+        requests.setdefault(path, []).append((arrival, status))
+    return requests
+
+
+def retry_gaps(server):
+    """
+    Returns the seconds between the consecutive requests of every path received by a server.
+    """
+    return [later[0] - earlier[0] for requests in requests_by_path(server).values()
+            for earlier, later in zip(requests, requests[1:])]
+
+
+def check_not_found(directory):
+    """
+    Checks that a 404 is not retried and is listed in the failures.
+    """
+    with StandInServer(directory, latency=0) as server:
+        fetcher = new_fetcher(retries=3)
+        responses = fetch_urls(fetcher, [job_url('not a search term', server.base_url)])
+
+    passed = (responses == [None] and len(server.log) == 1 and fetcher.retried == 0
+              and len(fetcher.failures) == 1 and 'HTTP 404' in fetcher.failures[0])
+    return passed, f'{len(server.log)} request(s), {fetcher.retried} retries, failures: {fetcher.failures}'
+
+
+def check_retries_exhausted(directory):
+    """
+    Checks that the pages failing after the retries are skipped and listed in the failures.
+    """
+    with StandInServer(directory, latency=0, failure_rate=1.0) as server:
+        urls = [url for _, _, url in page_urls(JOBS_LIST[:2], NUMBER_PAGES, server.base_url)]
+        fetcher = new_fetcher(retries=0)
+        responses = fetch_urls(fetcher, urls)
+
+    passed = (responses == [None] * len(urls) and len(server.log) == len(urls)
+              and len(fetcher.failures) == len(urls) and all('HTTP 503' in f for f in fetcher.failures))
+    return passed, f'{len(server.log)} request(s) for {len(urls)} pages, {len(fetcher.failures)} failures'
+
+
+def check_retry(directory, retry_after):
+    """
+    Checks that a 503 is retried after its Retry-After seconds, or after the backoff without it.
+    """
+    with StandInServer(directory, latency=0, failure_rate=1.0, retry_after=retry_after) as server:
+        urls = [url for _, _, url in page_urls(JOBS_LIST[:1], NUMBER_PAGES, server.base_url)]
+        fetcher = new_fetcher()
+        responses = fetch_urls(fetcher, urls)
+
+    gaps = retry_gaps(server)
+    # The first retry waits Retry-After seconds, or the backoff with a jitter of 0.5 to 1.5 times
+    if retry_after is not None:
+        lower, upper = retry_after, retry_after + BACKOFF
+    else:
+        lower, upper = BACKOFF * 0.5, BACKOFF * 1.5
+    passed = (all(response is not None and response.status == 200 for response in responses)
+              and len(gaps) == len(urls) and fetcher.retried == len(urls) and not fetcher.failures
+              and all(lower - TOLERANCE <= gap <= upper + TOLERANCE for gap in gaps))
+    return passed, (f"{fetcher.retried} retries, waited {', '.join(f'{gap:.3f}' for gap in gaps)} s "
+                    f"(expected {lower:.3f} s to {upper:.3f} s)")
+
+
+def check_host_rate(directory):
+    """
+    Checks that the requests to the stand-in host are spaced by 1 / RATE seconds.
+    """
+    with StandInServer(directory, latency=0) as server:
+        urls = [url for _, _, url in page_urls(JOBS_LIST, NUMBER_PAGES, server.base_url)][:RATE_PAGES]
+        fetcher = new_fetcher(concurrency=8, rate=RATE)
+        start = time.perf_counter()
+        responses = fetch_urls(fetcher, urls)
+        wall = time.perf_counter() - start
+
+    arrivals = sorted(arrival for arrival, _, _ in server.log)
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    passed = (all(response is not None for response in responses) and len(arrivals) == len(urls)
+              and min(gaps) >= 1 / RATE - TOLERANCE and wall >= (len(urls) - 1) / RATE - TOLERANCE)
+    return passed, (f'{len(urls)} pages in {wall:.2f} s at {RATE:g} requests/s, '
+                    f'smallest gap {min(gaps):.3f} s (limit {1 / RATE:.3f} s)')
+
+
+def check_other_hosts(directory):
+    """
+    Checks that requests waiting for their host's rate limit do not delay the requests to another host.
+    """
+    with StandInServer(directory, latency=0) as first, StandInServer(directory, latency=0) as second:
+        urls = [url for _, _, url in page_urls(JOBS_LIST, NUMBER_PAGES, first.base_url)][:RATE_PAGES // 2]
+        urls += [url for _, _, url in page_urls(JOBS_LIST, NUMBER_PAGES, second.base_url)][:RATE_PAGES // 2]
+        fetcher = new_fetcher(concurrency=2, rate=RATE)
+        responses = fetch_urls(fetcher, urls)
+
+    arrivals = [sorted(arrival for arrival, _, _ in server.log) for server in (first, second)]
+    gaps = [later - earlier for host in arrivals for earlier, later in zip(host, host[1:])]
+    # Both hosts start at once, and are then each limited by their own rate
+    lag = arrivals[1][0] - arrivals[0][0]
+    passed = (all(response is not None for response in responses) and lag <= 1 / RATE / 2
+              and min(gaps) >= 1 / RATE - TOLERANCE)
+    return passed, (f'second host started {lag:.3f} s after the first (limit {1 / RATE / 2:.3f} s), '
+                    f'smallest gap {min(gaps):.3f} s (limit {1 / RATE:.3f} s)')
+
+
+# Checks by name, each returning whether it passed and its details
+CHECKS = {'not_found': check_not_found,
+          'retries_exhausted': check_retries_exhausted,
+          'retry_after': lambda directory: check_retry(directory, RETRY_AFTER),
+          'backoff': lambda directory: check_retry(directory, None),
+          'host_rate': check_host_rate,
+          'other_hosts': check_other_hosts}
+
+
+if __name__ == '__main__':
+    directory = write_pages(number_pages=NUMBER_PAGES)
+
+    failed = 0
+    for name, check in CHECKS.items():
+        passed, details = check(directory)
+        failed += not passed
+        print(f"{name:>18}: {'PASS' if passed else 'FAIL'} ({details})", flush=True)
+
+    sys.exit(1 if failed else 0)
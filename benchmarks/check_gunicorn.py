@@ -0,0 +1,199 @@
+### DATA JOBS IN MEXICO: GUNICORN CHECKS
+
+"""
+Checks of the production entry point ('wsgi.py') served with the gunicorn settings
+('gunicorn.conf.py').
+
+The script starts 'gunicorn -c gunicorn.conf.py' on a free local port with a few
+workers, waits until it answers, and checks that:
+
+- workers: the master forked DATAJOBS_WORKERS worker processes
+- index, layout, assets, metrics: the page, its layout, the clientside script and
+  /metrics are served
+- callback: a figure callback answers a filter change
+- preload: the workers share the preloaded app with the master, i.e. the private
+  memory of each worker is a small part of its resident memory (Linux only)
+
+The script exits with status 1 when a check fails:
+
+    python benchmarks/check_gunicorn.py --workers 3
+"""
+
+# Import required libraries
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from bench_dashboard import ROOT
+
+# Settings
+
+# Worker processes started by default
+WORKERS = 2
+
+# Seconds to wait for the server to answer after starting it
+START_TIMEOUT = 120
+
+# Largest share of a worker's resident memory that may be private to it
+PRIVATE_SHARE = 0.5
+
+# Filter state of the callback check (all jobs, locations and companies, a salary range)
+CALLBACK_STATE = [None, None, None, [20000, 40000]]
+
+
+def free_port():
+    """
+    Returns a local TCP port that is not in use.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def request(url, body=None):
+    """
+    Returns the status and body of a GET request, or of a JSON POST request when body is given.
+    """
+    data = None if body is None else json.dumps(body).encode()
+    headers = {} if body is None else {'Content-Type': 'application/json'}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=30) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.read()
+
+
+def wait_ready(process, base_url, timeout=START_TIMEOUT):
+    """
+    Returns the seconds until the server answers its index page, or None if it exited or timed out.
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            if request(base_url + '/')[0] == 200:
+                return time.perf_counter() - start
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return None
+
+
+def worker_pids(master_pid):
+    """
+    Returns the process ids of the children of the gunicorn master (Linux only).
+    """
+    children = Path(f'/proc/{master_pid}/task/{master_pid}/children')
+    return [int(pid) for pid in children.read_text().split()] if children.exists() else []
+
+
+def memory(pid):
+    """
+    Returns the resident and private memory (MB) of a process, from /proc/<pid>/smaps_rollup.
+    """
+    fields = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]:
+        name, value = line.split(':', 1)
+        fields[name] = int(value.split()[0]) / 1024
+    return fields['Rss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+
+def check_workers(process, base_url, workers):
+    """
+    Checks that the master forked the configured number of workers.
+    """
+    pids = worker_pids(process.pid)
+    if not Path('/proc').exists():
+        return True, 'skipped (no /proc)'
+    return len(pids) == workers, f'{len(pids)} worker(s), expected {workers}'
+
+
+def check_get(path):
+    """
+    Returns a check that a GET request of path is answered with status 200.
+    """
+    def check(process, base_url, workers):
+        status, body = request(base_url + path)
+        return status == 200 and len(body) > 0, f'{path}: HTTP {status}, {len(body)} bytes'
+
+    return check
+
+
+def check_callback(process, base_url, workers):
+    """
+    Checks that a figure callback answers a filter change.
+    """
+    body = {'output': 'demand_job_plot.figure',
+            'outputs': {'id': 'demand_job_plot', 'property': 'figure'},
+            'inputs': [{'id': 'filter_state', 'property': 'data', 'value': CALLBACK_STATE}],
+            'changedPropIds': ['filter_state.data']}
+    status, response = request(base_url + '/_dash-update-component', body)
+    passed = status == 200 and 'demand_job_plot' in json.loads(response).get('response', {})
+    return passed, f'HTTP {status}, {len(response)} bytes'
+
+
+def check_preload(process, base_url, workers):
+    """
+    Checks that the private memory of each worker is a small part of its resident memory.
+    """
+    pids = worker_pids(process.pid)
+    if not pids or not Path(f'/proc/{pids[0]}/smaps_rollup').exists():
+        return True, 'skipped (no /proc/<pid>/smaps_rollup)'
+    usage = [memory(pid) for pid in pids]
+    passed = all(private <= PRIVATE_SHARE * rss for rss, private in usage)
+    master_rss, _ = memory(process.pid)
+    return passed, (f'master {master_rss:.0f} MB resident, workers '
+                    + ', '.join(f'{rss:.0f} MB resident / {private:.0f} MB private' for rss, private in usage))
+
+
+# Checks by name, each returning whether it passed and its details
+CHECKS = {'workers': check_workers,
+          'index': check_get('/'),
+          'layout': check_get('/_dash-layout'),
+          'assets': check_get('/assets/dashboard.js'),
+          'metrics': check_get('/metrics'),
+          'callback': check_callback,
+          'preload': check_preload}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the dashboard served by gunicorn with gunicorn.conf.py.')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes to start')
+    args = parser.parse_args()
+
+    base_url = f'http://127.0.0.1:{free_port()}'
+    env = dict(os.environ, DATAJOBS_BIND=base_url[len('http://'):], DATAJOBS_WORKERS=str(args.workers))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+    failed = 0
+    try:
+        ready = wait_ready(process, base_url)
+        if ready is None:
+            print(f'gunicorn did not answer within {START_TIMEOUT} s', flush=True)
+            failed = 1
+        else:
+            print(f'gunicorn answered after {ready:.2f} s with {args.workers} worker(s)', flush=True)
+            for name, check in CHECKS.items():
+                passed, details = check(process, base_url, args.workers)
+                failed += not passed
+                print(f"{name:>10}: {'PASS' if passed else 'FAIL'} ({details})", flush=True)
+    finally:
+        process.terminate()
+        try:
+            _, errors = process.communicate(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            _, errors = process.communicate()
+
+    if failed and errors:
+        print(errors[-2000:], file=sys.stderr)
+    sys.exit(1 if failed else 0)
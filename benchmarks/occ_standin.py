@@ -0,0 +1,284 @@
+### DATA JOBS IN MEXICO: OCC STAND-IN SERVER
+
+"""
+Saved OCC results pages and a local stand-in server serving them, for the scraper benchmarks.
+
+The pages are rendered from the vacancies of 'Dataset_raw.csv' with the markup and class
+identifiers of the OCC website as of November 2023 (see the notebook and occscraper.py):
+cards of 20 vacancies, some of them 'standout' cards, with the alternative classes of the
+job name, salary and company, confidential companies and missing locations, inside a page
+with the header, filters and scripts of a results page. They are saved once as HTML files
+('<job>/page-<n>.html') in a cache folder.
+
+The server answers '/empleos/de-<job>/?page=<n>' like the website, after a simulated
+latency (the time a browser or the network takes to deliver a page), and can fail the
+first request of a share of the pages with '503 Service Unavailable' (optionally with a
+Retry-After header) to exercise retries. Unknown pages are answered with '404 Not Found'.
+Every request is logged with its arrival time and status, to check the fetcher against.
+
+Write the pages and serve them on http://127.0.0.1:8060/empleos/de-... with:
+
+    python benchmarks/occ_standin.py --port 8060 --latency 0.2
+"""
+
+# Import required libraries
+import argparse
+import hashlib
+import html
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from occscraper import job_url
+
+# Settings
+
+RAW_CSV = ROOT / 'Dataset_raw.csv'
+PAGES_DIR = Path(tempfile.gettempdir()) / 'datajobs-benchmarks' / 'occ-pages'
+
+# Search terms of the notebook
+JOBS_LIST = ['analista datos', 'data analyst', 'cientifico datos', 'data scientist', 'ingeniero datos',
+             'data engineer', 'arquitecto datos', 'data architect', 'analista negocio', 'business analyst',
+             'bi analyst', 'business intelligence', 'aprendizaje automatico', 'machine learning']
+NUMBER_PAGES = 10
+VACANCIES_PER_PAGE = 20
+
+# Seconds before answering a request, and share of the pages whose first request fails
+LATENCY = 0.2
+FAILURE_RATE = 0.0
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es"><head><meta charset="utf-8"><title>Empleos de {title} | OCC</title>
+<link rel="stylesheet" href="/static/css/main.css">{styles}</head>
+<body><div id="root"><header class="header-0-2-12 sticky-0-2-13"><nav class="nav-0-2-14">{nav}</nav></header>
+<main class="conFluid-0-2-60 mainContainer-0-2-61"><div class="row-0-2-173">
+<aside class="col-0-2-174 xs12-0-2-443 md3-0-2-455 filters-0-2-600">{filters}</aside>
+<section class="col-0-2-174 xs12-0-2-443 md9-0-2-461 results-0-2-610">
+<h1 class="text-0-2-82 heading-0-2-85 highEmphasis-0-2-103">{count} empleos de {title}</h1>
+{cards}
+</section></div></main><footer class="footer-0-2-700">{footer}</footer></div>{scripts}</body></html>
+"""
+
+CARD_TEMPLATE = """<div id="jobcard-{id}" class="{card_class}">
+<a class="jobcard-0-2-558" aria-label="Vacante {job}" id="{rank}" href="/empleo/oferta/{id}/?page={page}&amp;rank={rank}"></a>
+<div class="conFluid-0-2-60 gridContainer-0-2-570"><div class="row-0-2-173 cardContent-0-2-557">
+<div class="col-0-2-174 xs12-0-2-443 ribbonCol-0-2-576 formatCol-0-2-571"><div class="flex-0-2-4 jbetween-0-2-16 astart-0-2-19"><div class="flex-0-2-4 wrap-0-2-11 astart-0-2-19">
+<label class="text-0-2-82 small-0-2-90 highEmphasis-0-2-103 date-0-2-567">Hace {days} días</label></div></div></div>
+<div class="col-0-2-174 xs12-0-2-443 formatCol-0-2-571"><div class="flex-0-2-4 wrap-0-2-11">
+<h2 class="{job_class}">{job}</h2></div></div>
+<div class="col-0-2-174 xs12-0-2-443 formatCol-0-2-571 smallBottomSpace-0-2-573">
+<span class="{salary_class}">{salary}</span></div>
+<div class="fresnel-container fresnel-at-sm "></div>
+<div class="col-0-2-174 xs12-0-2-443 formatCol-0-2-571"><div class="flex-0-2-4 acenter-0-2-21"><div class="" style="flex:1">
+<div class="flex-0-2-4 jbetween-0-2-16 acenter-0-2-21"><div>
+{company}
+{location}
+</div></div></div></div></div>
+</div></div></div>
+"""
+
+
+def slug(job):
+    """
+    Returns the folder name of a search term, as in its url ('data analyst' -> 'data-analyst').
+    """
+    return job_url(job, base_url='').strip('/')
+
+
+def render_card(row, number, page):
+    """
+    Returns the HTML of a vacancy card, with the class variants seen on the website.
+    """
+    variant = number % 10
+    job, salary, company, location = (html.escape(str(value)) if isinstance(value, str) else None for value in row)
+
+    emphasis = 'midEmphasis' if variant in (3, 7) else 'highEmphasis'
+    job_class = (f'text-0-2-83 subheading-0-2-87 {emphasis}-0-2-{105 if variant in (3, 7) else 104} '
+                 'job-0-2-561 longWord-0-2-573')
+    salary_class = f'text-0-2-83 standard-0-2-90 {emphasis}-0-2-104 salary-0-2-{564 if variant % 2 else 563}'
+
+    if company is None or 'confidencial' in company.lower():
+        company_html = f'<span class="locContainer-0-2-604">{company or "Empresa confidencial"}</span>'
+    else:
+        company_html = (f'<label class="text-0-2-83 standard-0-2-90 {emphasis}-0-2-104 strong-0-2-93 linkContainer-0-2-565">'
+                        f'<a class="locContainer-0-2-564 companyLink-0-2-566 noClickable-0-2-581" '
+                        f'title="Buscar empleos en {company}" href="/empleos/bolsa-de-trabajo-{number}/">'
+                        f'<div class="fresnel-container fresnel-lessThan-sm "></div>'
+                        f'<div class="fresnel-container fresnel-greaterThanOrEqual-sm ">{company}</div></a></label>')
+
+    if location is None:
+        location_html = ''
+    else:
+        links = ', '.join(f'<a title="Empleos en {part.strip()}" class="link-0-2-602 metalink-0-2-603 '
+                          f'linkNoMarginRight-0-2-604" href="/empleos/en-{part.strip().lower()}/">{part.strip()}</a>'
+                          for part in location.split(','))
+        location_html = f'<p class="text-0-2-83 small-0-2-91 {emphasis}-0-2-104 zonesLinks-0-2-601">{links}</p>'
+
+    card_class = 'card-0-2-520 flat-0-2-522 card-0-2-558' + (' standout-0-2-559' if variant == 0 else '')
+    return CARD_TEMPLATE.format(id=16000000 + number, card_class=card_class, job=job, rank=number % 20 + 1,
+                                page=page, days=number % 30 + 1, job_class=job_class, salary_class=salary_class,
+                                salary=salary, company=company_html, location=location_html)
+
+
+def render_page(rows, title, page, first_number=0):
+    """
+    Returns the HTML of a results page with the vacancies of the given rows.
+    """
+    cards = '\n'.join(render_card(row, first_number + i, page) for i, row in enumerate(rows))
+    styles = ''.join(f'<style data-jss="" data-meta="makeStyles-{i}">.c-0-2-{i}{{display:flex;margin:{i % 8}px}}</style>'
+                     for i in range(150))
+    nav = ''.join(f'<a class="navLink-0-2-{15 + i}" href="/menu/{i}/">Menú {i}</a>' for i in range(20))
+    filters = ''.join(f'<div class="filter-0-2-{601 + i % 5}"><label class="text-0-2-82 small-0-2-90">'
+                      f'<input type="checkbox" value="{i}"> Opción {i}</label></div>' for i in range(120))
+    footer = ''.join(f'<p class="footLink-0-2-{701 + i}"><a href="/pie/{i}/">Enlace {i}</a></p>' for i in range(40))
+    scripts = ''.join(f'<script>window.__chunk{i}=' + '{"a":1,"b":[1,2,3]};' * 20 + '</script>' for i in range(10))
+    return PAGE_TEMPLATE.format(title=html.escape(title), styles=styles, nav=nav, filters=filters,
+                                count=len(rows), cards=cards, footer=footer, scripts=scripts)
+
+
+def write_pages(directory=PAGES_DIR, jobs_list=JOBS_LIST, number_pages=NUMBER_PAGES, raw_csv=RAW_CSV):
+    """
+    Writes the results pages of every search term (once) and returns their folder. The
+    vacancies of 'Dataset_raw.csv' are laid out in order, VACANCIES_PER_PAGE per page,
+    starting over when they run out.
+    """
+    directory = Path(directory)
+    done = directory / f'.done-{len(jobs_list)}x{number_pages}'
+    if done.exists():
+        return directory
+
+    rows = list(pd.read_csv(raw_csv, dtype=str).itertuples(index=False, name=None))
+    number = 0
+    for job in jobs_list:
+        (directory / slug(job)).mkdir(parents=True, exist_ok=True)
+        for page in range(1, number_pages + 1):
+            page_rows = [rows[(number + i) % len(rows)] for i in range(VACANCIES_PER_PAGE)]
+            text = render_page(page_rows, job.title(), page, first_number=number)
+            (directory / slug(job) / f'page-{page}.html').write_text(text, encoding='utf-8')
+            number += VACANCIES_PER_PAGE
+    done.touch()
+    return directory
+
+
+def read_pages(directory=PAGES_DIR):
+    """
+    Returns the saved results pages as a list of (path, HTML text) tuples.
+    """
+    return [(path, path.read_text(encoding='utf-8')) for path in sorted(Path(directory).glob('*/page-*.html'))]
+
+
+class StandInServer:
+    """
+    Local HTTP server answering OCC search urls with the saved pages, in a background thread.
+
+    Parameters
+
+    directory: Folder of the saved pages (String or Path).
+    latency: Seconds before answering a request (Float).
+    failure_rate: Share of the pages whose first request fails with 503 (Float).
+    port: Port to listen on, any free port by default (Integer).
+    retry_after: Seconds sent in the Retry-After header of the failed requests, or None (Integer).
+    """
+
+    def __init__(self, directory=PAGES_DIR, latency=LATENCY, failure_rate=FAILURE_RATE, port=0, retry_after=None):
+        self.directory = Path(directory)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.retry_after = retry_after
+        self.requests = 0
+        # (monotonic arrival time, path, status) of every request
+        self.log = []
+        self._failed = set()
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                arrival = time.monotonic()
+                status, body = server.respond(self.path)
+                with server._lock:
+                    server.log.append((arrival, self.path, status))
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                if status == 503 and server.retry_after is not None:
+                    self.send_header('Retry-After', str(server.retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        """
+        Base url of the searcher to pass to the scraper.
+        """
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}/empleos/de-'
+
+    def should_fail(self, path):
+        """
+        Returns whether the request of a path fails: the first one of a stable share of the pages.
+        """
+        share = int(hashlib.blake2b(path.encode('utf-8'), digest_size=4).hexdigest(), 16) / 2 ** 32
+        with self._lock:
+            self.requests += 1
+            if share < self.failure_rate and path not in self._failed:
+                self._failed.add(path)
+                return True
+        return False
+
+    def respond(self, path):
+        """
+        Returns the status and body of the response to a request path.
+        """
+        time.sleep(self.latency)
+        if self.should_fail(path):
+            return 503, b'Service Unavailable'
+
+        parts = urllib.parse.urlsplit(path)
+        name = parts.path.strip('/').split('/')[-1]
+        page = urllib.parse.parse_qs(parts.query).get('page', ['1'])[0]
+        file = self.directory / name[len('de-'):] / f'page-{page}.html'
+        if not name.startswith('de-') or not page.isdigit() or not file.exists():
+            return 404, b'Not Found'
+        return 200, file.read_bytes()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve saved OCC results pages locally.')
+    parser.add_argument('--port', type=int, default=8060, help='port to listen on')
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds before answering a request')
+    parser.add_argument('--failure-rate', type=float, default=FAILURE_RATE,
+                        help='share of the pages whose first request fails')
+    args = parser.parse_args()
+
+    with StandInServer(write_pages(), args.latency, args.failure_rate, args.port) as server:
+        print(f'Serving {PAGES_DIR} at {server.base_url}<job>/')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
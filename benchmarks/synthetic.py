@@ -0,0 +1,120 @@
+### DATA JOBS IN MEXICO: SYNTHETIC DATASETS
+
+"""
+Synthetic versions of the processed Data Jobs dataset, at any number of rows, for the benchmarks.
+
+Rows are drawn with replacement from 'Dataset_processed.csv', which keeps the joint
+distribution of Job, Location and Company and the share of postings without salary.
+Disclosed salaries get a small multiplicative noise (rounded to 50 MXN and kept within
+the original range) so that they do not repeat the ~100 original values. Companies with
+a single posting are split into numbered variants, so the number of distinct companies
+grows with the square root of the number of rows, as it does when more postings are
+scraped.
+
+Write a synthetic snapshot (read by the dashboard with DATAJOBS_SNAPSHOT_DIR) with:
+
+    python benchmarks/synthetic.py 1m path/to/snapshot_dir
+"""
+
+# Import required libraries
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from datastore import COLUMNS, read_csv, write_snapshot
+
+# Settings
+
+SIZES = {'1k': 1_000,
+         '100k': 100_000,
+         '1m': 1_000_000,
+         '10m': 10_000_000,
+         }
+
+# Standard deviation of the log-normal salary noise
+SALARY_NOISE = 0.1
+SALARY_ROUNDING = 50
+
+
+def parse_size(size):
+    """
+    Returns the number of rows of a size name ('1k', '100k', '1m', '10m') or number.
+    """
+    return SIZES[size] if size in SIZES else int(size)
+
+
+def generate(n_rows, seed=0, source=None):
+    """
+    Returns a synthetic dataset with the distributions of the processed dataset.
+
+    Parameters
+
+    n_rows: Number of rows (Integer).
+    seed: Random seed, the same seed always gives the same dataset (Integer).
+    source: Optional prepared dataset to draw from; 'Dataset_processed.csv' by default.
+
+    Returns
+
+    df: Pandas Dataframe with categorical 'Job', 'Company' and 'Location' columns and 'Salary'.
+    """
+    source = read_csv() if source is None else source
+    rng = np.random.default_rng(seed)
+    sample = rng.integers(0, len(source), n_rows)
+
+    columns = {}
+    for column in ['Job', 'Location']:
+        categorical = pd.Categorical(source[column])
+        columns[column] = pd.Categorical.from_codes(categorical.codes[sample], categorical.categories)
+
+    # Companies with a single posting get numbered variants
+    companies = pd.Categorical(source['Company'])
+    codes = companies.codes[sample].astype(np.int64)
+    counts = np.bincount(companies.codes[companies.codes >= 0], minlength=len(companies.categories))
+    singles = np.flatnonzero(counts == 1)
+    variants = max(1, int(np.sqrt(n_rows / len(source))))
+
+    categories = list(companies.categories)
+    if variants > 1 and len(singles):
+        single_rank = np.full(len(categories), -1)
+        single_rank[singles] = np.arange(len(singles))
+
+        variant = rng.integers(0, variants, n_rows)
+        split = (codes >= 0) & (single_rank[np.maximum(codes, 0)] >= 0) & (variant > 0)
+        codes[split] = (len(categories)
+                        + single_rank[codes[split]] * (variants - 1)
+                        + variant[split] - 1)
+        categories += [f'{companies.categories[code]} ({k + 1})'
+                       for code in singles for k in range(1, variants)]
+
+    columns['Company'] = pd.Categorical.from_codes(codes, categories)
+
+    # Salaries with noise, within the original range
+    salary = source['Salary'].to_numpy(dtype=np.float64)
+    low, high = np.nanmin(salary), np.nanmax(salary)
+    salary = salary[sample] * rng.lognormal(0, SALARY_NOISE, n_rows)
+    columns['Salary'] = np.clip(np.round(salary / SALARY_ROUNDING) * SALARY_ROUNDING, low, high)
+
+    return pd.DataFrame(columns)[COLUMNS]
+
+
+def write(n_rows, snapshot_dir, seed=0):
+    """
+    Writes a synthetic dataset as a dashboard snapshot and returns its manifest.
+    """
+    return write_snapshot(generate(n_rows, seed), snapshot_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic Data Jobs snapshot.')
+    parser.add_argument('size', help=f"number of rows or one of {', '.join(SIZES)}")
+    parser.add_argument('snapshot_dir', help='directory of the snapshot')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(write(parse_size(args.size), args.snapshot_dir, args.seed), indent=2))
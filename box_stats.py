@@ -0,0 +1,140 @@
+### DATA JOBS IN MEXICO: BOXPLOT STATISTICS
+
+"""
+Server-side box statistics and point downsampling for the salary boxplot.
+
+Drawing a boxplot with every observation ('points="all"') sends and renders one
+point per posting. In summary mode the dashboard sends, per category, only the
+quartiles and fences (computed like plotly.js, so the boxes look the same), the
+outliers beyond the fences and a bounded, rank-stratified sample of the salaries
+within them, all drawn with WebGL. They are read from the sorted salaries of a
+'SalaryIndex', so their cost does not depend on sorting the selection.
+"""
+
+# Import required libraries
+import numpy as np
+
+from salary_index import SalaryIndex
+
+# Settings
+
+# Maximum number of points drawn per category, within the fences and beyond them
+MAX_POINTS = 500
+MAX_OUTLIERS = 1000
+
+
+def interpolate(values, p):
+    """
+    Returns the p-quantile of sorted values with the interpolation of plotly.js boxes
+    (position p * n - 0.5, i.e. the 'hazen' method).
+    """
+    n = len(values)
+    position = min(max(p * n - 0.5, 0), n - 1)
+    below = int(np.floor(position))
+    above = int(np.ceil(position))
+    fraction = position - below
+    return float(fraction * values[above] + (1 - fraction) * values[below])
+
+
+def box_statistics(values, max_outliers=MAX_OUTLIERS):
+    """
+    Returns the box statistics of sorted values, as drawn by a plotly box trace with the
+    default 'linear' quartile method and 1.5 IQR whiskers.
+
+    Returns
+
+    stats: Dictionary with 'count', 'q1', 'median', 'q3', 'lowerfence', 'upperfence' and
+           'outliers', the sorted values beyond the fences (a rank-stratified sample of at
+           most max_outliers of them, always with the most extreme ones).
+    """
+    q1 = interpolate(values, 0.25)
+    median = interpolate(values, 0.5)
+    q3 = interpolate(values, 0.75)
+
+    # Whiskers end at the most extreme values within 1.5 IQR of the box
+    reach = 1.5 * (q3 - q1)
+    inner = values[(values >= q1 - reach) & (values <= q3 + reach)]
+
+    lowerfence = min(q1, float(inner[0])) if len(inner) else q1
+    upperfence = max(q3, float(inner[-1])) if len(inner) else q3
+
+    # The values are sorted, so the outliers are a prefix and a suffix of them
+    below = np.searchsorted(values, lowerfence, side='left')
+    above = np.searchsorted(values, upperfence, side='right')
+    outliers = np.concatenate([values[:below], values[above:]])
+
+    return {'count': len(values),
+            'q1': q1,
+            'median': median,
+            'q3': q3,
+            'lowerfence': lowerfence,
+            'upperfence': upperfence,
+            'outliers': stratified_sample(outliers, max_outliers),
+            }
+
+
+def stratified_sample(values, max_points=MAX_POINTS):
+    """
+    Returns at most max_points of the sorted values, evenly spaced by rank so that the
+    sample keeps the shape of the distribution, the minimum and the maximum.
+    """
+    if len(values) <= max_points:
+        return values
+    positions = np.linspace(0, len(values) - 1, max_points).round().astype(np.int64)
+    return values[positions]
+
+
+class SalaryBoxes:
+    """
+    Per-category box statistics and downsampled points of the disclosed salaries of an
+    'EncodedFrame', for any selection of rows.
+
+    Parameters
+
+    data: EncodedFrame with the dataset.
+    column: Categorical column with the box categories (String).
+    max_points: Maximum number of points within the fences returned per category (Integer).
+    max_outliers: Maximum number of outliers returned per category (Integer).
+    index: Optional 'SalaryIndex' of the data grouped by the column, e.g. the one of the
+           filter engine; built when not given.
+    """
+
+    def __init__(self, data, column='Job', max_points=MAX_POINTS, max_outliers=MAX_OUTLIERS, index=None):
+        self.data = data
+        self.column = column
+        self.max_points = max_points
+        self.max_outliers = max_outliers
+        self.index = SalaryIndex(data, column) if index is None else index
+
+    def summary(self, rows=None):
+        """
+        Returns the box statistics, outliers and sampled salaries within the fences of every
+        category with disclosed salaries among the given rows (all rows by default), in
+        category order.
+
+        Parameters
+
+        rows: Optional array of selected row ids.
+
+        Returns
+
+        boxes: List of dictionaries with the category 'code' and 'label', the box statistics
+               with the outliers (see 'box_statistics') and the sampled salaries within the
+               fences ('points').
+        """
+        mask = np.zeros(len(self.data), dtype=bool)
+        mask[self.data.row_ids if rows is None else rows] = True
+
+        boxes = []
+        for code, label in enumerate(self.data.categories[self.column]):
+            values = self.index.select(code, mask)
+            if len(values) == 0:
+                continue
+            box = {'code': code, 'label': label}
+            box.update(box_statistics(values, self.max_outliers))
+            inner = values[np.searchsorted(values, box['lowerfence'], side='left'):
+                           np.searchsorted(values, box['upperfence'], side='right')]
+            box['points'] = stratified_sample(inner, self.max_points)
+            boxes.append(box)
+
+        return boxes
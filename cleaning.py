@@ -0,0 +1,312 @@
+### DATA JOBS IN MEXICO: DATA CLEANING
+
+"""
+Cleaning of the raw scraped vacancies ('Dataset_raw.csv') into the processed dataset
+('Dataset_processed.csv') used by the analysis and the dashboard.
+
+Every raw vacancy (Job, Salary, Company, Location) becomes a processed row (Original
+Job Title, Job, Company, Location, Min Salary, Max Salary, Avg Salary):
+
+- duplicated raw vacancies (found by several search terms) are dropped
+- the job title is assigned to a data job category (Data Analyst, BI Analyst, Business
+  Analyst, Data Scientist, Data Engineer, Data Architect, ML Engineer) when it names one
+  of those roles, in English or Spanish; the vacancies of other jobs are dropped. When
+  a title names several roles, the first one wins ('Data Engineer o Arquitecto de Datos')
+- the salary text is parsed into its minimum and maximum, for ranges ('$20,000 - $25,000
+  Mensual') and single values ('$16,000  Mensual'), and normalized to monthly salaries
+  from its period (hourly, daily, weekly, biweekly, monthly or yearly); undisclosed
+  salaries ('Sueldo no mostrado por la empresa') are left empty
+- the location is reduced to its state ('Polanco II Sección, Miguel Hidalgo, CDMX' ->
+  'Ciudad de México'), or 'Remote/NA' when missing
+- company names are title-cased, and confidential ones named 'Confidential'
+
+All the steps are vectorized string operations on a chunk of rows, so that the raw CSV
+is read and the processed CSV written in chunks of CHUNK_SIZE rows: the memory used
+does not depend on the size of the raw file, except for the deduplication, which keeps
+a 64-bit hash (8 bytes) per distinct raw vacancy. As the scraped values repeat a lot
+(the 3822 raw vacancies have 924 job titles, 249 salary texts and 145 locations), each
+step runs on the distinct values of its column in the chunk, and its results are
+mapped back to the rows.
+
+Clean the raw dataset with:
+
+    python cleaning.py [raw_csv] [processed_csv]
+"""
+
+# Import required libraries
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Settings
+
+BASE_DIR = Path(__file__).resolve().parent
+RAW_CSV = BASE_DIR / 'Dataset_raw.csv'
+PROCESSED_CSV = BASE_DIR / 'Dataset_processed.csv'
+
+# Raw rows read and cleaned at a time
+CHUNK_SIZE = 50_000
+
+RAW_COLUMNS = ['Job', 'Salary', 'Company', 'Location']
+PROCESSED_COLUMNS = ['Original Job Title', 'Job', 'Company', 'Location', 'Min Salary', 'Max Salary', 'Avg Salary']
+
+# Data job categories and the roles naming them in a job title (lower case, without
+# accents), by priority when several match at the same position
+JOB_CATEGORIES = [
+    ('ML Engineer', r'machine learning'),
+    ('Data Architect', r'arquitect[oa]s? (?:de )?(?:\w+ ){0,2}datos|data ar[cq]hitect\b'),
+    ('Data Analyst', r'data (?:\S+ ){0,2}analyst|analista (?:\w+ ){0,2}(?:bases? )?(?:de )?datos'),
+    ('Data Engineer', r'data (?:\S+ )?engineer|engineer data|ingenier[oa] ?(?:\w+ ){0,3}datos'),
+    ('Data Scientist', r'data scien|cientific[oa] (?:de )?datos|datascience'),
+    ('BI Analyst', r'business intelligence|inteligencia de negocios?|analista (?:\w+ ){0,3}\(?bi\b|\bbi (?:\w+ )?analyst'),
+    ('Business Analyst', r'business (?:(?!data)\S+ ){0,3}analyst|business analysis|analyst, (?:\w+ )?business'
+                         r'|analista de negocios?'),
+]
+
+# One alternative per category: the leftmost match is the first role named in the title
+JOB_PATTERN = '|'.join(f'({pattern})' for _, pattern in JOB_CATEGORIES)
+
+# Salary texts: '$<min>[ - $<max>] <period>'
+SALARY_PATTERN = r'\$\s*(?P<min>\d[\d,]*(?:\.\d+)?)(?:\s*-\s*\$?\s*(?P<max>\d[\d,]*(?:\.\d+)?))?\s*(?P<period>.*)$'
+
+# Hours worked per month (48-hour legal week in Mexico) and days paid per month
+HOURS_PER_MONTH = 48 * 52 / 12
+DAYS_PER_MONTH = 30
+
+# Salary periods (lower case, without accents) and their factors to a monthly salary;
+# salaries without period are monthly, as on the OCC website
+SALARY_PERIODS = [
+    (r'hora|hour', HOURS_PER_MONTH),
+    (r'diari|dia\b|day|daily', DAYS_PER_MONTH),
+    (r'quincena|biweekly|fortnight', 2),
+    (r'semana|week', 52 / 12),
+    (r'mensual|\bmes\b|month', 1),
+    (r'anual|\bano\b|year|annual', 1 / 12),
+]
+
+# State of the OCC location abbreviations (lower case, without accents, spaces and dots)
+STATES = {'ags': 'Aguascalientes', 'bc': 'Baja California', 'bcs': 'Baja California Sur', 'camp': 'Campeche',
+          'chis': 'Chiapas', 'chih': 'Chihuahua', 'cdmx': 'Ciudad de México', 'df': 'Ciudad de México',
+          'coah': 'Coahuila', 'col': 'Colima', 'dgo': 'Durango', 'edomex': 'Estado de México',
+          'gto': 'Guanajuato', 'gro': 'Guerrero', 'hgo': 'Hidalgo', 'jal': 'Jalisco', 'mich': 'Michoacán',
+          'mor': 'Morelos', 'nay': 'Nayarit', 'nl': 'Nuevo León', 'oax': 'Oaxaca', 'pue': 'Puebla',
+          'qro': 'Querétaro', 'qroo': 'Quintana Roo', 'slp': 'San Luis Potosí', 'sin': 'Sinaloa', 'son': 'Sonora',
+          'tab': 'Tabasco', 'tamps': 'Tamaulipas', 'tlax': 'Tlaxcala', 'ver': 'Veracruz', 'yuc': 'Yucatán',
+          'zac': 'Zacatecas'}
+# Full state names are accepted as well
+STATES.update({re.sub(r'[\s.]', '', name.lower()).translate(str.maketrans('áéíóú', 'aeiou')): name
+               for name in set(STATES.values())})
+
+REMOTE_LOCATION = 'Remote/NA'
+CONFIDENTIAL_COMPANY = 'Confidential'
+CONFIDENTIAL_PATTERN = r'^\s*(?:empresa\s+)?confidencial\s*$'
+
+
+def normalize_series(texts):
+    """
+    Returns texts in lower case, without accents (e.g. 'Científico' -> 'cientifico'), as a Pandas Series.
+    """
+    return (texts.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+            .str.lower())
+
+
+def per_value(function, texts):
+    """
+    Returns the result of a vectorized function of texts (a Series or Dataframe), computed on
+    their distinct values only and repeated for every row.
+    """
+    codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+    if not len(uniques):
+        # Some string methods (e.g. 'idxmax') fail on empty inputs
+        uniques = np.array([''], dtype=object)
+    result = function(pd.Series(uniques, dtype=object))
+    if isinstance(result, pd.DataFrame):
+        return result.iloc[codes].set_axis(texts.index)
+    return pd.Series(result.to_numpy()[codes], index=texts.index, name=texts.name)
+
+
+def job_categories(titles):
+    """
+    Returns the data job category of each job title, or NaN for other jobs.
+    """
+    matches = normalize_series(titles).str.extract(JOB_PATTERN)
+    matches.columns = [name for name, _ in JOB_CATEGORIES]
+    return matches.notna().idxmax(axis=1).where(matches.notna().any(axis=1))
+
+
+def parse_salaries(salaries):
+    """
+    Returns the monthly minimum, maximum and average salary of each salary text, NaN when
+    not disclosed or in an unknown period.
+
+    Parameters
+
+    salaries: Salary texts, e.g. '$20,000 - $25,000  Mensual' (Pandas Series).
+
+    Returns
+
+    df: Pandas Dataframe with the 'Min Salary', 'Max Salary' and 'Avg Salary' columns.
+    """
+    parts = salaries.str.extract(SALARY_PATTERN)
+    low = pd.to_numeric(parts['min'].str.replace(',', '', regex=False), errors='coerce')
+    high = pd.to_numeric(parts['max'].str.replace(',', '', regex=False), errors='coerce').fillna(low)
+
+    period = normalize_series(parts['period'].fillna('')).str.strip()
+    factor = pd.Series(np.where(period == '', 1.0, np.nan), index=salaries.index)
+    for pattern, period_factor in reversed(SALARY_PERIODS):
+        factor = factor.mask(period.str.contains(pattern, regex=True), period_factor)
+
+    low, high = low * factor, high * factor
+    return pd.DataFrame({'Min Salary': low, 'Max Salary': high, 'Avg Salary': (low + high) / 2})
+
+
+def state_locations(locations):
+    """
+    Returns the state of each location (its last part, e.g. 'Zapopan, Jal.' -> 'Jalisco'),
+    'Remote/NA' when missing, or the last part itself if it is not a known state.
+    """
+    last = locations.str.rsplit(',', n=1).str[-1].str.replace('\u200b', '', regex=False).str.strip()
+    key = normalize_series(last).str.replace(r'[\s.]', '', regex=True)
+    return key.map(STATES).fillna(last).fillna(REMOTE_LOCATION)
+
+
+def clean_companies(companies):
+    """
+    Returns the company names in title case, with the confidential ones as 'Confidential'.
+    """
+    confidential = companies.str.contains(CONFIDENTIAL_PATTERN, case=False, regex=True, na=False)
+    return companies.str.strip().str.title().mask(confidential, CONFIDENTIAL_COMPANY)
+
+
+class Deduplicator:
+    """
+    Drops the rows already seen, over a stream of Dataframe chunks, keeping a sorted array
+    with a 64-bit hash per distinct row.
+    """
+
+    def __init__(self):
+        self.seen = np.array([], dtype=np.uint64)
+
+    def new_rows(self, chunk):
+        """
+        Returns a boolean mask of the rows of a chunk not seen before (in this chunk or earlier ones).
+        """
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        new = ~pd.Series(hashes).duplicated().to_numpy()
+
+        positions = np.searchsorted(self.seen, hashes)
+        found = positions < len(self.seen)
+        found[found] = self.seen[positions[found]] == hashes[found]
+        new &= ~found
+
+        if new.any():
+            # Merges the sorted new hashes in, rather than sorting everything again
+            added = np.sort(hashes[new])
+            self.seen = np.insert(self.seen, np.searchsorted(self.seen, added), added)
+        return new
+
+
+def empty_processed():
+    """
+    Returns an empty processed Dataframe, with the PROCESSED_COLUMNS and their types.
+    """
+    return pd.DataFrame({column: pd.Series(dtype=float if column.endswith('Salary') else object)
+                         for column in PROCESSED_COLUMNS})
+
+
+def clean_chunk(chunk, deduplicator=None):
+    """
+    Returns the processed rows of a chunk of raw rows.
+
+    Parameters
+
+    chunk: Pandas Dataframe with the raw 'Job', 'Salary', 'Company' and 'Location' columns (as strings).
+    deduplicator: Deduplicator shared by the chunks of a file, or None to keep the duplicated rows.
+
+    Returns
+
+    df: Pandas Dataframe with the PROCESSED_COLUMNS, for the data jobs only.
+    """
+    chunk = chunk[RAW_COLUMNS]
+    if deduplicator is not None:
+        chunk = chunk[deduplicator.new_rows(chunk)]
+
+    job = per_value(job_categories, chunk['Job'].fillna(''))
+    chunk = chunk[job.notna()]
+    if chunk.empty:
+        # Only duplicated rows or other jobs, e.g. a chunk of a re-scrape appended to the raw file
+        return empty_processed()
+
+    df = pd.DataFrame({'Original Job Title': chunk['Job'],
+                       'Job': job[job.notna()],
+                       'Company': per_value(clean_companies, chunk['Company']),
+                       'Location': per_value(state_locations, chunk['Location'])})
+    return pd.concat([df, per_value(parse_salaries, chunk['Salary'])], axis=1).reset_index(drop=True)
+
+
+def read_raw(raw_csv=RAW_CSV, chunk_size=CHUNK_SIZE):
+    """
+    Returns an iterator over the chunks of the raw CSV file, as Pandas Dataframes of strings.
+    """
+    return pd.read_csv(raw_csv, dtype=str, usecols=RAW_COLUMNS, chunksize=chunk_size, encoding='utf-8')
+
+
+def clean_chunks(chunks, deduplicate=True):
+    """
+    Yields the processed Dataframe of every chunk of raw rows (e.g. from 'read_raw').
+    """
+    deduplicator = Deduplicator() if deduplicate else None
+    for chunk in chunks:
+        yield clean_chunk(chunk, deduplicator)
+
+
+def clean(df, deduplicate=True):
+    """
+    Returns the processed Dataframe of a raw Dataframe held in memory.
+    """
+    return clean_chunk(df.astype({column: object for column in RAW_COLUMNS}),
+                       Deduplicator() if deduplicate else None)
+
+
+def clean_csv(raw_csv=RAW_CSV, processed_csv=PROCESSED_CSV, chunk_size=CHUNK_SIZE, deduplicate=True):
+    """
+    Cleans a raw CSV file into a processed CSV file, in chunks. The processed file is written to a
+    temporary file renamed over it at the end, so it is never left half written.
+
+    Returns
+
+    stats: Dictionary with the raw rows read, the processed rows written and the seconds taken.
+    """
+    start = time.perf_counter()
+    processed_csv = Path(processed_csv)
+    deduplicator = Deduplicator() if deduplicate else None
+    raw_rows, processed_rows = 0, 0
+
+    with tempfile.NamedTemporaryFile('w', dir=processed_csv.parent, prefix='.tmp-', suffix='.csv', delete=False,
+                                     encoding='utf-8', newline='') as tmp:
+        try:
+            pd.DataFrame(columns=PROCESSED_COLUMNS).to_csv(tmp, index=False)
+            for chunk in read_raw(raw_csv, chunk_size):
+                df = clean_chunk(chunk, deduplicator)
+                df.to_csv(tmp, header=False, index=False)
+                raw_rows += len(chunk)
+                processed_rows += len(df)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, processed_csv)
+
+    return {'raw_rows': raw_rows, 'processed_rows': processed_rows, 'seconds': time.perf_counter() - start}
+
+
+if __name__ == '__main__':
+    stats = clean_csv(*sys.argv[1:3])
+    print(f"{stats['raw_rows']} raw rows -> {stats['processed_rows']} processed rows "
+          f"in {stats['seconds']:.2f} s ({stats['raw_rows'] / stats['seconds']:,.0f} rows/s)")
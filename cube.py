@@ -0,0 +1,225 @@
+### DATA JOBS IN MEXICO: AGGREGATE CUBE
+
+"""
+Pre-aggregated (Job x Location x Company x Salary bucket) cube of the Data Jobs dataset.
+
+Each cell holds the number of postings, and the sum, count and sum of squares of
+the disclosed salaries. Filtering and rolling up the cube costs time proportional
+to the number of distinct cells rather than to the number of rows, so the demand
+and salary figures of the dashboard stay flat as more scrape snapshots are added.
+
+Salary buckets follow the grid of the salary range slider: with a step of 2000,
+bucket 2k holds salaries equal to 2000*k and bucket 2k+1 those strictly between
+2000*k and 2000*(k+1). Any inclusive range whose bounds lie on the grid is then an
+exact, contiguous range of buckets; other ranges are widened to the grid first.
+Postings without salary are in bucket -1.
+"""
+
+# Import required libraries
+import numpy as np
+import pandas as pd
+
+from datastore import CATEGORICAL_COLUMNS
+from filter_engine import normalize_selection
+
+# Settings
+
+# Step of the dashboard salary range slider
+SALARY_STEP = 2000
+
+MEASURES = ['Count', 'Salary Sum', 'Salary Count', 'Salary SumSq']
+
+
+def salary_buckets(salary, step=SALARY_STEP):
+    """
+    Returns the salary bucket of each salary (-1 for missing salaries).
+    """
+    salary = np.asarray(salary, dtype=np.float64)
+    disclosed = ~np.isnan(salary)
+    quotient = np.where(disclosed, salary, 0) / step
+    grid = np.floor(quotient)
+    buckets = 2 * grid.astype(np.int64) + (quotient != grid)
+    return np.where(disclosed, buckets, -1)
+
+
+def align_salary_range(salary, step=SALARY_STEP):
+    """
+    Returns the smallest inclusive salary range on the bucket grid containing an inclusive
+    salary range, flooring the low bound and ceiling the high bound, e.g. (21000, 39500)
+    becomes (20000.0, 40000.0) with a step of 2000.
+
+    Raises ValueError if the range is not a pair of finite numbers.
+    """
+    low, high = (float(bound) for bound in salary)
+    if not (np.isfinite(low) and np.isfinite(high)):
+        raise ValueError(f'Salary range {salary} is not a pair of finite numbers')
+    return float(np.floor(low / step) * step), float(np.ceil(high / step) * step)
+
+
+def bucket_range(salary, step=SALARY_STEP):
+    """
+    Returns the inclusive (first, last) bucket range of an inclusive salary range, widened
+    to the bucket grid if its bounds are not on it. A range with low > high has no buckets.
+
+    Raises ValueError if the range is not a pair of finite numbers.
+    """
+    low, high = align_salary_range(salary, step)
+    return 2 * int(low // step), 2 * int(high // step)
+
+
+class AggregateCube:
+    """
+    Count, salary sum, salary count and salary sum of squares per (Job, Location,
+    Company, Salary bucket) cell of an 'EncodedFrame'.
+
+    Parameters
+
+    data: EncodedFrame with the dataset to aggregate.
+    step: Salary bucket grid step, i.e. the step of the salary range slider (Integer).
+    """
+
+    def __init__(self, data, step=SALARY_STEP):
+        self.data = data
+        self.step = step
+        self.categories = data.categories
+
+        buckets = salary_buckets(data.salary, step)
+        dimensions = [data.codes[column].astype(np.int64) for column in CATEGORICAL_COLUMNS] + [buckets]
+
+        # Shift every dimension by one so that missing values (-1) become 0
+        shape = tuple(int(d.max(initial=-1)) + 2 for d in dimensions)
+        flat = np.ravel_multi_index([d + 1 for d in dimensions], shape)
+        cells, inverse = np.unique(flat, return_inverse=True)
+
+        salary = data.salary.astype(np.float64)
+        disclosed = ~np.isnan(salary)
+        salary = np.where(disclosed, salary, 0)
+
+        self.cells = {name: codes - 1 for name, codes
+                      in zip(CATEGORICAL_COLUMNS + ['Bucket'], np.unravel_index(cells, shape))}
+        self.measures = {'Count': np.bincount(inverse, minlength=len(cells)),
+                         'Salary Sum': np.bincount(inverse, weights=salary, minlength=len(cells)),
+                         'Salary Count': np.bincount(inverse, weights=disclosed, minlength=len(cells)),
+                         'Salary SumSq': np.bincount(inverse, weights=salary ** 2, minlength=len(cells)),
+                         }
+
+    @classmethod
+    def from_arrays(cls, data, arrays, step=SALARY_STEP):
+        """
+        Returns an AggregateCube over the arrays returned by 'arrays', without aggregating again.
+        """
+        cube = cls.__new__(cls)
+        cube.data = data
+        cube.step = step
+        cube.categories = data.categories
+        cube.cells = {name: arrays[f'cells.{name}'] for name in CATEGORICAL_COLUMNS + ['Bucket']}
+        cube.measures = {name: arrays[f'measures.{name}'] for name in MEASURES}
+        return cube
+
+    def arrays(self):
+        """
+        Returns the cell coordinates and measures by name, to rebuild the cube with 'from_arrays'.
+        """
+        arrays = {f'cells.{name}': codes for name, codes in self.cells.items()}
+        arrays.update({f'measures.{name}': values for name, values in self.measures.items()})
+        return arrays
+
+    def __len__(self):
+        return len(self.measures['Count'])
+
+    def view(self, job=None, location=None, company=None, salary=None):
+        """
+        Returns the cells matching the filters as a 'CubeView'.
+
+        Parameters
+
+        job, location, company: Selected labels (List of strings), a single label, 'All' or None.
+        salary: Optional (low, high) inclusive salary range, widened to the bucket grid; cells
+                without salary never match it.
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        for column, value in (('Job', job), ('Location', location), ('Company', company)):
+            selection = normalize_selection(value)
+            if selection is not None:
+                mask &= self.data.lookup(column, selection)[self.cells[column]] & (self.cells[column] >= 0)
+
+        if salary is not None:
+            first, last = bucket_range(salary, self.step)
+            buckets = self.cells['Bucket']
+            mask &= (buckets >= first) & (buckets <= last)
+
+        index = np.flatnonzero(mask)
+        return CubeView(self,
+                        {name: codes[index] for name, codes in self.cells.items()},
+                        {name: values[index] for name, values in self.measures.items()})
+
+
+class CubeView:
+    """
+    Filtered subset of the cells of an 'AggregateCube', with roll-up helpers.
+    """
+
+    def __init__(self, cube, cells, measures):
+        self.cube = cube
+        self.cells = cells
+        self.measures = measures
+
+    def __len__(self):
+        return len(self.measures['Count'])
+
+    def total(self):
+        """
+        Returns the number of postings in the view.
+        """
+        return int(self.measures['Count'].sum())
+
+    def mean_salary(self):
+        """
+        Returns the mean of the disclosed salaries in the view (NaN if there are none).
+        """
+        count = self.measures['Salary Count'].sum()
+        return self.measures['Salary Sum'].sum() / count if count else np.nan
+
+    def rollup(self, by):
+        """
+        Aggregates the view by some of its dimensions.
+
+        Parameters
+
+        by: Dimensions to keep ('Job', 'Location' and/or 'Company'), as a string or list of strings.
+
+        Returns
+
+        df: Pandas Dataframe with one row per non-empty group, in category order, with the
+            labels of the dimensions, the measures ('Count', 'Salary Sum', 'Salary Count',
+            'Salary SumSq') and the mean salary ('Salary', NaN for groups without salary).
+        """
+        by = [by] if isinstance(by, str) else list(by)
+
+        codes = pd.DataFrame({column: self.cells[column] for column in by})
+        measures = pd.DataFrame(self.measures)
+        rolled = measures.groupby([codes[column] for column in by], sort=True).sum()
+        rolled = rolled[rolled['Count'] > 0].reset_index()
+
+        for column in by:
+            categories = self.cube.categories[column]
+            rolled[column] = np.where(rolled[column] >= 0,
+                                      categories.take(rolled[column].clip(lower=0)),
+                                      None)
+
+        salary_count = rolled['Salary Count']
+        rolled['Salary'] = (rolled['Salary Sum'] / salary_count).where(salary_count > 0)
+
+        return rolled[by + MEASURES + ['Salary']]
+
+    def mean_pivot(self, index, columns):
+        """
+        Returns the mean salary per (index, columns) pair as a wide Dataframe, with the
+        labels of both dimensions sorted and only the groups having disclosed salaries,
+        like pd.pivot_table(df, index=index, columns=columns, values='Salary', aggfunc='mean').
+        """
+        rolled = self.rollup([index, columns])
+        rolled = rolled[rolled['Salary Count'] > 0]
+        pivot = rolled.pivot(index=index, columns=columns, values='Salary')
+        return pivot.sort_index(axis=0).sort_index(axis=1)
@@ -0,0 +1,436 @@
+### DATA JOBS IN MEXICO: DATASET STORE
+
+"""
+Local snapshot loader for the processed Data Jobs dataset.
+
+The dashboard used to read 'Dataset_processed.csv' from GitHub at import time.
+This module builds a versioned Arrow (Feather v2) snapshot of that file with the
+dashboard's rename/drop step already applied, and loads it back with a checksum
+check. The manifest records the checksum of the CSV the snapshot was built from:
+when the CSV has changed since (e.g. cleaned again with 'cleaning.py'), the snapshot
+is rebuilt on load. Both checksums are only computed when a file's size or
+modification time differ from the ones recorded when it last matched (in a stat
+cache next to the snapshot), so loading an unchanged snapshot does not read the
+files in full. If the snapshot is missing, corrupted, stale and cannot be
+rebuilt, or 'pyarrow' is not installed, the bundled CSV is read instead (logged as
+a warning).
+
+'EncodedFrame' holds the loaded data in a compact, dictionary-encoded form
+(integer category codes, float32 salaries and int32 row ids) for filtering, and
+can export it as base64 typed arrays for the dashboard's clientside callbacks, or
+as named arrays to be stored and memory-mapped by 'array_store'.
+
+Build or refresh the snapshot with:
+
+    python datastore.py
+
+The snapshot folder defaults to 'Data' and can be changed with the
+DATAJOBS_SNAPSHOT_DIR environment variable (e.g. to serve a synthetic dataset).
+"""
+
+# Import required libraries
+import base64
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - optional dependency
+    feather = None
+
+# Settings
+
+BASE_DIR = Path(__file__).resolve().parent
+DATASET_CSV = BASE_DIR / 'Dataset_processed.csv'
+SNAPSHOT_DIR = Path(os.environ.get('DATAJOBS_SNAPSHOT_DIR', BASE_DIR / 'Data'))
+
+# Bump when the snapshot layout (columns, dtypes) changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_NAME = 'Dataset_processed'
+
+COLUMNS = ['Job', 'Company', 'Location', 'Salary']
+CATEGORICAL_COLUMNS = ['Job', 'Company', 'Location']
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_paths(snapshot_dir=SNAPSHOT_DIR, version=SNAPSHOT_VERSION):
+    """
+    Returns the (data, manifest) paths of a snapshot version.
+    """
+    snapshot_dir = Path(snapshot_dir)
+    stem = f'{SNAPSHOT_NAME}_v{version}'
+    return snapshot_dir / f'{stem}.arrow', snapshot_dir / f'{stem}.json'
+
+
+def stat_cache_path(snapshot_dir=SNAPSHOT_DIR, version=SNAPSHOT_VERSION):
+    """
+    Returns the path of the stat cache of a snapshot version, with the size and modification
+    time of the files whose checksum was verified.
+    """
+    return Path(snapshot_dir) / f'{SNAPSHOT_NAME}_v{version}_stats.json'
+
+
+def file_stat(path):
+    """
+    Returns the [size, modification time in ns] of a file.
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_stat_cache(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns the stat cache of a snapshot folder as a dictionary (empty when missing or unreadable).
+    """
+    try:
+        return json.loads(stat_cache_path(snapshot_dir).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def record_checksum(path, sha256, snapshot_dir=SNAPSHOT_DIR, stat=None):
+    """
+    Records in the stat cache that a file with the given stat (its current one by default)
+    has the SHA-256 sha256.
+    """
+    cache = read_stat_cache(snapshot_dir)
+    cache[Path(path).name] = {'sha256': sha256, 'stat': file_stat(path) if stat is None else stat}
+
+    # Temporary file per process and renamed, as several workers may record at once; in a
+    # read-only folder nothing is recorded and the file is hashed again on the next load
+    cache_path = stat_cache_path(snapshot_dir)
+    tmp_path = cache_path.with_suffix(f'.json.{os.getpid()}.tmp')
+    try:
+        tmp_path.write_text(json.dumps(cache, indent=2) + '\n', encoding='utf-8')
+        tmp_path.replace(cache_path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def checksum_matches(path, sha256, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns whether a file has the SHA-256 sha256. The file is only hashed when its size or
+    modification time differ from the ones recorded in the stat cache for that checksum.
+    """
+    stat = file_stat(path)
+    if read_stat_cache(snapshot_dir).get(Path(path).name) == {'sha256': sha256, 'stat': stat}:
+        return True
+    if file_checksum(path) != sha256:
+        return False
+    record_checksum(path, sha256, snapshot_dir, stat)
+    return True
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    """
+    Returns the SHA-256 hex digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prepare_frame(df):
+    """
+    Applies the dashboard's rename/drop step to the processed dataset.
+    """
+    return (df.rename(columns = {'Avg Salary': 'Salary'})
+              .drop(columns=['Original Job Title', 'Min Salary', 'Max Salary'], errors='ignore')
+              [COLUMNS]
+              .reset_index(drop=True)
+            )
+
+
+def read_csv(csv_path=DATASET_CSV):
+    """
+    Reads the processed dataset CSV and prepares it for the dashboard.
+    """
+    return prepare_frame(pd.read_csv(csv_path))
+
+
+def write_snapshot(df, snapshot_dir=SNAPSHOT_DIR, source=None):
+    """
+    Writes a prepared dataset as an Arrow snapshot with its manifest.
+
+    Parameters
+
+    df: Pandas Dataframe with the 'Job', 'Company', 'Location' and 'Salary' columns.
+    snapshot_dir: Directory where the snapshot is written (String or Path).
+    source: Optional path of the file the dataset was read from, recorded with its checksum (String or Path).
+
+    Returns
+
+    manifest: Dictionary with the snapshot metadata, as written to disk.
+    """
+    if feather is None:
+        raise ImportError("'pyarrow' is required to build the dataset snapshot")
+
+    data_path, manifest_path = snapshot_paths(snapshot_dir)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Uncompressed so the file can be memory-mapped on load; temporary files per process, as
+    # several workers may rebuild a stale snapshot at once
+    tmp_path = data_path.with_suffix(f'.arrow.{os.getpid()}.tmp')
+    feather.write_feather(df[COLUMNS].reset_index(drop=True), tmp_path, compression='uncompressed')
+    tmp_path.replace(data_path)
+
+    # Stat before hashing, so that a file changed meanwhile is hashed again on load
+    data_stat = file_stat(data_path)
+    source_stat = None if source is None else file_stat(source)
+
+    manifest = {'version': SNAPSHOT_VERSION,
+                'file': data_path.name,
+                'sha256': file_checksum(data_path),
+                'source': None if source is None else Path(source).name,
+                'source_sha256': None if source is None else file_checksum(source),
+                'rows': len(df),
+                'columns': COLUMNS,
+                }
+
+    record_checksum(data_path, manifest['sha256'], snapshot_dir, data_stat)
+    if source is not None:
+        record_checksum(source, manifest['source_sha256'], snapshot_dir, source_stat)
+
+    # Written last (the snapshot watchers poll it), and renamed so it is never read half written
+    tmp_path = manifest_path.with_suffix(f'.json.{os.getpid()}.tmp')
+    tmp_path.write_text(json.dumps(manifest, indent=2) + '\n', encoding='utf-8')
+    tmp_path.replace(manifest_path)
+
+    return manifest
+
+
+def build_snapshot(csv_path=DATASET_CSV, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Builds the Arrow snapshot and its manifest from the processed dataset CSV.
+
+    Parameters
+
+    csv_path: Path of 'Dataset_processed.csv' (String or Path).
+    snapshot_dir: Directory where the snapshot is written (String or Path).
+
+    Returns
+
+    manifest: Dictionary with the snapshot metadata, as written to disk.
+    """
+    return write_snapshot(read_csv(csv_path), snapshot_dir, source=csv_path)
+
+
+def read_snapshot(snapshot_dir=SNAPSHOT_DIR, verify=True):
+    """
+    Reads the Arrow snapshot, checking it against its manifest.
+
+    Returns
+
+    df: Pandas Dataframe with the 'Job', 'Company', 'Location' and 'Salary' columns.
+    manifest: Dictionary with the snapshot metadata.
+
+    Raises ValueError if the snapshot does not match its manifest.
+    """
+    if feather is None:
+        raise ImportError("'pyarrow' is required to read the dataset snapshot")
+
+    data_path, manifest_path = snapshot_paths(snapshot_dir)
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {manifest.get('version')} != {SNAPSHOT_VERSION}")
+
+    if verify and not checksum_matches(data_path, manifest['sha256'], snapshot_dir):
+        raise ValueError(f'Checksum mismatch for {data_path.name}')
+
+    df = feather.read_table(data_path, memory_map=True).to_pandas()
+
+    if list(df.columns) != COLUMNS or len(df) != manifest['rows']:
+        raise ValueError(f'Unexpected layout in {data_path.name}')
+
+    return df, manifest
+
+
+def is_stale(manifest, csv_path=DATASET_CSV, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Returns whether a snapshot was built from a CSV that has changed since (False when the
+    snapshot has no recorded source, e.g. a synthetic dataset, or the CSV is missing).
+    """
+    csv_path = Path(csv_path)
+    if not manifest.get('source_sha256') or manifest.get('source') != csv_path.name or not csv_path.exists():
+        return False
+    return not checksum_matches(csv_path, manifest['source_sha256'], snapshot_dir)
+
+
+def load_dataset(snapshot_dir=SNAPSHOT_DIR, csv_path=DATASET_CSV, verify=True):
+    """
+    Loads the dashboard dataset from the local snapshot, rebuilt first if the CSV it was
+    built from has changed, or from the bundled CSV when the snapshot cannot be used.
+
+    Parameters
+
+    snapshot_dir: Directory holding the Arrow snapshot and its manifest (String or Path).
+    csv_path: Fallback processed dataset CSV (String or Path).
+    verify: Whether to check the snapshot SHA-256 against the manifest, when its size or
+            modification time changed since it was last checked (Boolean).
+
+    Returns
+
+    df: Pandas Dataframe with the 'Job', 'Company', 'Location' and 'Salary' columns.
+    version: Identifier of the loaded data, i.e. the checksum of the file it came from (String).
+    """
+    try:
+        df, manifest = read_snapshot(snapshot_dir, verify=verify)
+        if is_stale(manifest, csv_path, snapshot_dir):
+            logger.warning('Dataset snapshot built from an older %s; rebuilding it', Path(csv_path).name)
+            build_snapshot(csv_path, snapshot_dir)
+            df, manifest = read_snapshot(snapshot_dir, verify=verify)
+        return df, manifest['sha256']
+    except (ImportError, OSError, ValueError, KeyError) as error:
+        logger.warning('Dataset snapshot unavailable (%s); reading %s', error, Path(csv_path).name)
+
+    return read_csv(csv_path), file_checksum(csv_path)
+
+
+class EncodedFrame:
+    """
+    Dictionary-encoded, column-oriented copy of the dashboard dataset.
+
+    'Job', 'Company' and 'Location' are stored as integer codes into a fixed list of
+    categories (-1 for missing values), 'Salary' as float32 (NaN when not disclosed)
+    and every row is identified by its int32 position ('row_ids'). Filtering is done
+    with code lookup tables, so no Python strings are hashed per row.
+
+    Parameters
+
+    df: Pandas Dataframe with the 'Job', 'Company', 'Location' and 'Salary' columns.
+    category_orders: Optional dictionary with the category order of some columns, e.g. {'Job': category_order}.
+                     Values not listed are appended in alphabetical order.
+    """
+
+    def __init__(self, df, category_orders=None):
+        category_orders = category_orders or {}
+
+        self.categories = {}
+        self.codes = {}
+        for column in CATEGORICAL_COLUMNS:
+            values = df[column]
+            order = list(category_orders.get(column, []))
+            listed = set(order)
+            order += sorted(v for v in values.dropna().unique() if v not in listed)
+
+            categorical = pd.Categorical(values, categories=order)
+            self.categories[column] = categorical.categories
+            self.codes[column] = categorical.codes
+
+        self.salary = df['Salary'].to_numpy(dtype=np.float32)
+        self.row_ids = np.arange(len(df), dtype=np.int32)
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        """
+        Returns an EncodedFrame over the arrays and metadata returned by 'arrays', e.g.
+        read-only memory-mapped arrays (see array_store.py), without copying them.
+        """
+        data = cls.__new__(cls)
+        data.categories = {column: pd.Index(metadata['categories'][column], dtype=object)
+                           for column in CATEGORICAL_COLUMNS}
+        data.codes = {column: arrays[f'codes.{column}'] for column in CATEGORICAL_COLUMNS}
+        data.salary = arrays['salary']
+        data.row_ids = arrays['row_ids']
+        return data
+
+    def arrays(self):
+        """
+        Returns the encoded columns by name and the JSON-compatible metadata needed to
+        rebuild the frame with 'from_arrays'.
+        """
+        arrays = {f'codes.{column}': self.codes[column] for column in CATEGORICAL_COLUMNS}
+        arrays['salary'] = self.salary
+        arrays['row_ids'] = self.row_ids
+        metadata = {'categories': {column: self.categories[column].tolist() for column in CATEGORICAL_COLUMNS}}
+        return arrays, metadata
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    def codes_for(self, column, values):
+        """
+        Returns the codes of the given labels of a column, ignoring unknown labels.
+        """
+        codes = self.categories[column].get_indexer(pd.Index(list(values), dtype=object))
+        return codes[codes >= 0]
+
+    def lookup(self, column, values):
+        """
+        Returns a boolean lookup table indexed by code, True for the given labels.
+        """
+        table = np.zeros(len(self.categories[column]), dtype=bool)
+        table[self.codes_for(column, values)] = True
+        return table
+
+    def mask(self, column, values):
+        """
+        Returns a boolean row mask selecting the rows whose label is one of the given values.
+        """
+        codes = self.codes[column]
+        return self.lookup(column, values)[codes] & (codes >= 0)
+
+    def frame(self, rows=None):
+        """
+        Returns the selected rows (all of them by default) as a Pandas Dataframe with
+        categorical 'Job', 'Company' and 'Location' columns, indexed by row id.
+        """
+        if rows is None:
+            rows = self.row_ids
+
+        columns = {column: pd.Categorical.from_codes(self.codes[column][rows], self.categories[column])
+                   for column in CATEGORICAL_COLUMNS}
+        # Aggregations on the returned frame are done in double precision
+        columns['Salary'] = self.salary[rows].astype(np.float64)
+
+        return pd.DataFrame(columns, index=pd.Index(self.row_ids[rows], name='Row'))[COLUMNS]
+
+    def client_columns(self, label_columns=CATEGORICAL_COLUMNS):
+        """
+        Returns the categories, codes and salaries as a JSON-compatible dictionary for the
+        browser, with each array as base64 little-endian bytes (read with JavaScript typed arrays).
+
+        Parameters
+
+        label_columns: Columns whose categories are included; those of the other columns (e.g. every
+                       Company) can be sent to the browser separately, when needed (List).
+
+        Returns
+
+        columns: Dictionary with 'rows' (Integer), 'categories' (lists of labels by column, for the
+                 label columns), 'codes' (encoded arrays by column) and 'salary' (encoded float32 array,
+                 NaN when not disclosed). An encoded array is a dictionary with its 'dtype' and 'data'.
+        """
+        def encode(array):
+            array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+            return {'dtype': array.dtype.name,
+                    'data': base64.b64encode(array.tobytes()).decode('ascii'),
+                    }
+
+        return {'rows': len(self),
+                'categories': {column: self.categories[column].tolist() for column in label_columns},
+                'codes': {column: encode(self.codes[column]) for column in CATEGORICAL_COLUMNS},
+                'salary': encode(self.salary),
+                }
+
+    def memory_usage(self):
+        """
+        Returns the number of bytes held by the encoded columns.
+        """
+        arrays = list(self.codes.values()) + [self.salary, self.row_ids]
+        return sum(a.nbytes for a in arrays)
+
+
+if __name__ == '__main__':
+    manifest = build_snapshot()
+    print(json.dumps(manifest, indent=2))
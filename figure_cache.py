@@ -0,0 +1,133 @@
+### DATA JOBS IN MEXICO: FIGURE CACHE
+
+"""
+Bounded LRU/TTL cache for the dashboard figures, keyed by the normalized filter state.
+
+Identical selections (in any order, with or without a redundant 'All') map to the
+same key, so a selection rendered for one user is served from memory to the next.
+Entries belong to a dataset version and the whole cache is dropped when the version
+changes.
+"""
+
+# Import required libraries
+import threading
+import time
+from collections import OrderedDict
+
+from filter_engine import normalize_selection
+
+
+def filter_key(job, location, company, salary=None):
+    """
+    Returns the normalized, hashable filter state used as cache key.
+
+    Parameters
+
+    job, location, company: Dropdown values (List of strings, a single label, 'All' or None).
+    salary: (low, high) salary range when the salary filter is enabled, None otherwise.
+    """
+    salary_key = None if salary is None else (float(salary[0]), float(salary[1]))
+    return (normalize_selection(job),
+            normalize_selection(location),
+            normalize_selection(company),
+            salary_key)
+
+
+class FigureCache:
+    """
+    Thread-safe LRU cache with time-to-live and hit/miss/eviction counters.
+
+    Parameters
+
+    maxsize: Maximum number of cached entries (Integer).
+    ttl: Seconds an entry stays valid, or None to keep entries until evicted (Float).
+    version: Identifier of the dataset the cached values were built from (String).
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, version=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value of a key, or default on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries above maxsize.
+        """
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value of a key, computing and storing it with compute() on a miss.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def set_version(self, version):
+        """
+        Sets the dataset version, dropping every entry if it changed.
+        """
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def clear(self):
+        """
+        Drops every entry, keeping the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns the cache counters as a dictionary.
+        """
+        with self._lock:
+            return {'version': self.version,
+                    'size': len(self._entries),
+                    'maxsize': self.maxsize,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'expirations': self.expirations,
+                    }
+
+
+_MISSING = object()
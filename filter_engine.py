@@ -0,0 +1,275 @@
+### DATA JOBS IN MEXICO: FILTER ENGINE
+
+"""
+Row selection engine for the Data Jobs dataset, independent of Dash.
+
+For each of the 'Job', 'Location' and 'Company' columns, the engine precomputes an
+inverted index: the sorted row ids of every value (postings), plus a packed row
+bitmap for the values frequent enough that a bitmap is smaller than their posting
+list. A query is answered from the postings of the selected values when the most
+selective column is small, so its cost is proportional to the selected postings,
+and by bitmap OR (within a column) / AND (across columns) otherwise.
+
+Salary ranges are answered from sorted salary indexes (overall and per value of
+each column): a range is a contiguous slice found by binary search, and a query
+starts from the smallest of those slices, so its cost does not grow with the rows
+outside the range.
+
+Example
+
+    engine = FilterEngine(EncodedFrame(df))
+    rows = engine.query(job=['Data Analyst'], location='All', company=['Banamex'], salary=(20000, 40000))
+    dff = engine.data.frame(rows)
+"""
+
+# Import required libraries
+import numpy as np
+
+from datastore import CATEGORICAL_COLUMNS
+from salary_index import SalaryIndex
+
+# Settings
+
+ALL = 'All'
+
+# A value gets a bitmap when its posting list (4 bytes per row) would be larger
+# than a bitmap of the whole table (1 bit per row)
+BITMAP_DENSITY = 1 / 32
+
+
+def normalize_selection(value):
+    """
+    Normalizes a dropdown value into a filter constraint.
+
+    Returns None when the value does not constrain the rows (None, 'All', or a list
+    containing 'All'); otherwise a sorted tuple with the unique selected labels,
+    which is empty when nothing is selected.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if ALL in value:
+        return None
+    return tuple(sorted(set(value)))
+
+
+class FilterEngine:
+    """
+    Precomputed inverted indexes over an 'EncodedFrame' answering multi-select and
+    salary range filters as sorted arrays of row ids.
+
+    Parameters
+
+    data: EncodedFrame with the dataset to filter.
+    columns: Categorical columns to index (List of strings).
+    """
+
+    def __init__(self, data, columns=CATEGORICAL_COLUMNS):
+        self.data = data
+        self.columns = list(columns)
+
+        n_rows = len(data)
+        self.bitmap_min_count = max(1, int(n_rows * BITMAP_DENSITY))
+
+        # Postings in CSR layout: rows of code c are postings[column][offsets[c]:offsets[c + 1]]
+        self.postings = {}
+        self.offsets = {}
+        self.counts = {}
+        self.bitmaps = {}
+
+        for column in self.columns:
+            codes = data.codes[column]
+            n_categories = len(data.categories[column])
+
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            order.flags.writeable = False
+            missing = int(np.count_nonzero(codes < 0))
+            counts = np.bincount(codes[codes >= 0], minlength=n_categories)
+
+            self.postings[column] = order[missing:]
+            self.offsets[column] = np.concatenate([[0], np.cumsum(counts)])
+            self.counts[column] = counts
+
+            self.bitmaps[column] = {}
+            for code in np.flatnonzero(counts >= self.bitmap_min_count):
+                mask = np.zeros(n_rows, dtype=bool)
+                mask[self.posting(column, code)] = True
+                self.bitmaps[column][int(code)] = np.packbits(mask)
+
+        # Sorted salaries overall and per value of each column
+        self.salary_index = SalaryIndex(data)
+        self.salary_indexes = {column: SalaryIndex(data, column) for column in self.columns}
+
+    @classmethod
+    def from_arrays(cls, data, arrays, columns=CATEGORICAL_COLUMNS):
+        """
+        Returns a FilterEngine over the arrays returned by 'arrays', e.g. read-only
+        memory-mapped arrays (see array_store.py), without building the indexes again.
+        """
+        def group(prefix):
+            return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+
+        engine = cls.__new__(cls)
+        engine.data = data
+        engine.columns = list(columns)
+        engine.bitmap_min_count = max(1, int(len(data) * BITMAP_DENSITY))
+
+        engine.postings = {column: arrays[f'postings.{column}'] for column in engine.columns}
+        engine.offsets = {column: arrays[f'offsets.{column}'] for column in engine.columns}
+        engine.counts = {column: arrays[f'counts.{column}'] for column in engine.columns}
+        # Bitmaps are the rows of one matrix per column
+        engine.bitmaps = {column: {int(code): bitmap for code, bitmap
+                                   in zip(arrays[f'bitmap_codes.{column}'], arrays[f'bitmaps.{column}'])}
+                          for column in engine.columns}
+
+        engine.salary_index = SalaryIndex.from_arrays(data, None, group('salary_index.'))
+        engine.salary_indexes = {column: SalaryIndex.from_arrays(data, column, group(f'salary_indexes.{column}.'))
+                                 for column in engine.columns}
+        return engine
+
+    def arrays(self):
+        """
+        Returns the postings, bitmaps and salary indexes by name, to rebuild the engine with 'from_arrays'.
+        """
+        arrays = {}
+        for column in self.columns:
+            arrays[f'postings.{column}'] = self.postings[column]
+            arrays[f'offsets.{column}'] = self.offsets[column]
+            arrays[f'counts.{column}'] = self.counts[column]
+
+            codes = sorted(self.bitmaps[column])
+            arrays[f'bitmap_codes.{column}'] = np.array(codes, dtype=np.int64)
+            arrays[f'bitmaps.{column}'] = (np.stack([self.bitmaps[column][code] for code in codes]) if codes
+                                           else np.zeros((0, (len(self) + 7) // 8), dtype=np.uint8))
+
+        for name, array in self.salary_index.arrays().items():
+            arrays[f'salary_index.{name}'] = array
+        for column, index in self.salary_indexes.items():
+            for name, array in index.arrays().items():
+                arrays[f'salary_indexes.{column}.{name}'] = array
+
+        return arrays
+
+    def __len__(self):
+        return len(self.data)
+
+    def posting(self, column, code):
+        """
+        Returns the sorted row ids holding a given code of a column.
+        """
+        offsets = self.offsets[column]
+        return self.postings[column][offsets[code]:offsets[code + 1]]
+
+    def constraints(self, job=None, location=None, company=None):
+        """
+        Returns the active constraints as (estimated rows, column, codes) tuples,
+        most selective first.
+        """
+        constraints = []
+        for column, value in (('Job', job), ('Location', location), ('Company', company)):
+            selection = normalize_selection(value)
+            if selection is None:
+                continue
+            codes = self.data.codes_for(column, selection)
+            constraints.append((int(self.counts[column][codes].sum()), column, codes))
+
+        return sorted(constraints, key=lambda c: c[0])
+
+    def union_rows(self, column, codes):
+        """
+        Returns the sorted row ids matching any of the given codes of a column.
+        """
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int32)
+        if len(codes) == 1:
+            return self.posting(column, codes[0])
+        # Postings of different codes are disjoint, so a sort is enough
+        rows = np.concatenate([self.posting(column, code) for code in codes])
+        rows.sort()
+        return rows
+
+    def union_bitmap(self, column, codes):
+        """
+        Returns the packed bitmap of the rows matching any of the given codes of a column.
+        """
+        bitmap = np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        for code in codes:
+            code_bitmap = self.bitmaps[column].get(int(code))
+            if code_bitmap is not None:
+                bitmap |= code_bitmap
+            else:
+                rows = self.posting(column, code)
+                np.bitwise_or.at(bitmap, rows >> 3, (128 >> (rows & 7)).astype(np.uint8))
+        return bitmap
+
+    def check_constraints(self, rows, constraints):
+        """
+        Returns the row ids that also match the given constraints, through their code lookup tables.
+        """
+        for _, column, codes in constraints:
+            lookup = np.zeros(len(self.data.categories[column]), dtype=bool)
+            lookup[codes] = True
+            rows = rows[lookup[self.data.codes[column][rows]]]
+        return rows
+
+    def salary_rows(self, constraints, salary):
+        """
+        Returns the sorted row ids within an inclusive salary range that match all the constraints.
+
+        The candidates are the smallest of the salary range slices: of the whole table or of
+        the selected values of one of the constrained columns. The other constraints are then
+        checked on the candidates only.
+        """
+        low, high = salary
+        index, codes, rest = self.salary_index, [0], constraints
+        size = index.count(codes, low, high)
+
+        for position, (_, column, column_codes) in enumerate(constraints):
+            column_size = self.salary_indexes[column].count(column_codes, low, high)
+            if column_size < size:
+                index, codes, size = self.salary_indexes[column], column_codes, column_size
+                rest = constraints[:position] + constraints[position + 1:]
+
+        rows = np.sort(index.range_rows(codes, low, high))
+        return self.check_constraints(rows, rest)
+
+    def query(self, job=None, location=None, company=None, salary=None):
+        """
+        Returns the sorted row ids matching all the filters.
+
+        Parameters
+
+        job, location, company: Selected labels (List of strings), a single label, 'All' or None.
+        salary: Optional (low, high) inclusive salary range; rows without salary never match it.
+
+        Returns
+
+        rows: NumPy int32 array with the matching row ids, in ascending order (read-only
+              when it is a view of the indexes).
+        """
+        constraints = self.constraints(job, location, company)
+
+        if salary is not None:
+            rows = self.salary_rows(constraints, salary)
+        elif not constraints:
+            rows = self.data.row_ids
+        elif constraints[0][0] < self.bitmap_min_count or len(constraints) == 1:
+            # Sparse path: start from the smallest candidate set and check the
+            # other constraints through their code lookup tables
+            _, column, codes = constraints[0]
+            rows = self.check_constraints(self.union_rows(column, codes), constraints[1:])
+        else:
+            # Dense path: bitmap OR within each column, AND across columns
+            bitmap = self.union_bitmap(constraints[0][1], constraints[0][2])
+            for _, column, codes in constraints[1:]:
+                bitmap &= self.union_bitmap(column, codes)
+            rows = np.flatnonzero(np.unpackbits(bitmap, count=len(self))).astype(np.int32)
+
+        return rows
+
+    def count(self, job=None, location=None, company=None, salary=None):
+        """
+        Returns the number of rows matching all the filters.
+        """
+        return len(self.query(job, location, company, salary))
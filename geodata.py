@@ -0,0 +1,217 @@
+### DATA JOBS IN MEXICO: STATE POLYGONS
+
+"""
+Bundled, pre-simplified GeoJSON of the Mexican states for the dashboard choropleth.
+
+The simplified files live in the 'Data' folder ('states_mx_<level>.json') and each
+one is read and parsed at most once per process. Feature ids are the two-letter
+state codes used by the dashboard (e.g. 'DF', 'JC', 'NL').
+
+The bundled levels were built from the INEGI Marco Geoestadístico state boundaries,
+reprojected to WGS 84. To rebuild them from a full-resolution states GeoJSON with
+the same feature ids, run:
+
+    python geodata.py path/to/states_mx.json
+"""
+
+# Import required libraries
+import functools
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Settings
+
+GEO_DIR = Path(__file__).resolve().parent / 'Data'
+
+# Douglas-Peucker tolerance in degrees for each level, from finest to coarsest
+RESOLUTIONS = {'high': 0.005,
+               'medium': 0.02,
+               'low': 0.05,
+               }
+
+# Smallest figure size (in pixels) at which each level is still worth sending
+RESOLUTION_MIN_PIXELS = {'high': 900,
+                         'medium': 500,
+                         'low': 0,
+                         }
+
+
+def geojson_path(resolution):
+    """
+    Returns the path of the bundled GeoJSON for a resolution level.
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    return GEO_DIR / f'states_mx_{resolution}.json'
+
+
+@functools.lru_cache(maxsize=None)
+def load_states(resolution='low'):
+    """
+    Returns the parsed states GeoJSON for a resolution level ('high', 'medium' or 'low').
+
+    The result is cached for the life of the process and shared between callers,
+    so it must not be modified.
+    """
+    with open(geojson_path(resolution), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def resolution_for_size(pixels):
+    """
+    Returns the coarsest resolution level suitable for a map drawn at the given size
+    (the larger of the figure width and height, in pixels, times the zoom factor).
+    """
+    for resolution, min_pixels in RESOLUTION_MIN_PIXELS.items():
+        if pixels >= min_pixels:
+            return resolution
+    return 'low'
+
+
+# Simplification helpers
+
+def simplify_line(points, tolerance):
+    """
+    Douglas-Peucker simplification of a (n, 2) coordinate array. Keeps both end points.
+    """
+    n = len(points)
+    if n < 3:
+        return points
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = np.hypot(*segment)
+
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return points[keep]
+
+
+def ring_area(ring):
+    """
+    Returns the absolute planar area of a closed ring (shoelace formula).
+    """
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def simplify_ring(ring, tolerance, decimals):
+    """
+    Simplifies a closed ring. Returns None when the ring collapses below the tolerance.
+    """
+    ring = np.asarray(ring, dtype=float)[:, :2]
+
+    # A closed ring has identical end points, so split it in two halves around the
+    # farthest vertex from the start to keep Douglas-Peucker well defined
+    far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    if far == 0:
+        return None
+    simplified = np.vstack([simplify_line(ring[:far + 1], tolerance)[:-1],
+                            simplify_line(ring[far:], tolerance)])
+
+    if len(simplified) < 4 or ring_area(simplified) < tolerance ** 2:
+        return None
+
+    return np.round(simplified, decimals).tolist()
+
+
+def simplify_polygon(rings, tolerance, decimals):
+    """
+    Simplifies the exterior ring and holes of a polygon. Returns None if the exterior collapses.
+    """
+    exterior = simplify_ring(rings[0], tolerance, decimals)
+    if exterior is None:
+        return None
+    holes = [hole for hole in (simplify_ring(r, tolerance, decimals) for r in rings[1:]) if hole]
+    return [exterior] + holes
+
+
+def simplify_geometry(geometry, tolerance, decimals):
+    """
+    Simplifies a Polygon or MultiPolygon GeoJSON geometry, dropping islands below the tolerance.
+    """
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+    simplified = [p for p in (simplify_polygon(p, tolerance, decimals) for p in polygons) if p]
+
+    # Always keep the largest polygon so that no state disappears from the map
+    if not simplified:
+        largest = max(polygons, key=lambda p: ring_area(np.asarray(p[0], dtype=float)[:, :2]))
+        simplified = [[np.round(np.asarray(largest[0], dtype=float)[:, :2], decimals).tolist()]]
+
+    if len(simplified) == 1:
+        return {'type': 'Polygon', 'coordinates': simplified[0]}
+    return {'type': 'MultiPolygon', 'coordinates': simplified}
+
+
+def build_levels(source_path, geo_dir=GEO_DIR):
+    """
+    Writes one simplified GeoJSON per resolution level from a full-resolution states GeoJSON.
+
+    Parameters
+
+    source_path: Path of a states FeatureCollection whose feature ids are the two-letter state codes (String or Path).
+    geo_dir: Directory where the simplified files are written (String or Path).
+
+    Returns
+
+    sizes: Dictionary with the size in bytes of each written level.
+    """
+    with open(source_path, encoding='utf-8') as f:
+        source = json.load(f)
+
+    sizes = {}
+    for resolution, tolerance in RESOLUTIONS.items():
+        # Round coordinates to about a tenth of the tolerance
+        decimals = int(np.ceil(-np.log10(tolerance))) + 1
+
+        features = [{'type': 'Feature',
+                     'id': feature['id'],
+                     'properties': {'name': feature.get('properties', {}).get('name', feature['id'])},
+                     'geometry': simplify_geometry(feature['geometry'], tolerance, decimals),
+                     }
+                    for feature in source['features']]
+
+        path = Path(geo_dir) / geojson_path(resolution).name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps({'type': 'FeatureCollection', 'features': features},
+                          ensure_ascii=False, separators=(',', ':'))
+        path.write_text(text, encoding='utf-8')
+        sizes[resolution] = len(text.encode('utf-8'))
+
+    return sizes
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        sys.exit('Usage: python geodata.py path/to/states_mx.json')
+    for resolution, size in build_levels(sys.argv[1]).items():
+        print(f'{resolution}: {size / 1024:.1f} KiB')
@@ -0,0 +1,72 @@
+### DATA JOBS IN MEXICO: GUNICORN SETTINGS
+
+"""
+Gunicorn settings for serving the dashboard with several worker processes:
+
+    gunicorn -c gunicorn.conf.py
+
+The app is preloaded: 'wsgi.py' (and so the dataset snapshot, indexes and cube, and the
+layout with the figure templates it warms up) is loaded once in the master process before
+the workers are forked, and the workers share that memory copy-on-write instead of each
+one reading the dataset and building the figures again.
+The garbage collector is frozen before forking, so that collections in the workers do
+not write to (and copy) the pages of the preloaded objects.
+
+Settings can be overridden with environment variables:
+
+- DATAJOBS_BIND: address to listen on ('0.0.0.0:8050' by default)
+- DATAJOBS_WORKERS: number of worker processes (one per CPU core by default)
+- DATAJOBS_THREADS: threads per worker (2 by default)
+
+Caches and metrics live in each worker: a filter state is computed once per worker,
+and /metrics reports the worker that answers the scrape. Each worker also watches the
+dataset snapshot and swaps in a new one on its own (see snapshot_manager.py).
+"""
+
+# Import required libraries
+import gc
+import multiprocessing
+import os
+import random
+import sys
+
+# Settings
+
+wsgi_app = 'wsgi:server'
+
+bind = os.environ.get('DATAJOBS_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('DATAJOBS_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('DATAJOBS_THREADS', 2))
+worker_class = 'gthread'
+
+# Build the dashboard once in the master process, before forking the workers
+preload_app = True
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Restart workers from time to time, spread out so that they do not restart together
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    """
+    Moves the preloaded objects to the permanent generation, which the garbage collector never scans.
+    """
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Reseeds the random generator of a new worker (used to sample the metrics) and starts
+    its dataset snapshot watcher (threads of the master do not survive the fork).
+    """
+    random.seed()
+    dashboard = sys.modules.get('dashboard')
+    if dashboard is not None:
+        dashboard.snapshots.watch()
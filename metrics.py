@@ -0,0 +1,226 @@
+### DATA JOBS IN MEXICO: METRICS
+
+"""
+Sampled timing and size histograms for the dashboard server, in the Prometheus text
+exposition format (no client library needed).
+
+Observations are only recorded for a random share of the calls given by the sample
+rate (DATAJOBS_METRICS_SAMPLE_RATE, between 0 and 1, 0 by default). With sampling off,
+a timer is a shared no-op context manager, so the instrumented code paths cost a
+single comparison.
+
+Example
+
+    registry = Registry(sample_rate=0.1)
+    latency = registry.histogram('filter_seconds', 'Time spent filtering', ['source'])
+    with registry.timer(latency, source='cube'):
+        ...
+    text = registry.exposition()
+"""
+
+# Import required libraries
+import contextlib
+import math
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+
+# Settings
+
+SAMPLE_RATE = float(os.environ.get('DATAJOBS_METRICS_SAMPLE_RATE', 0))
+
+# Upper bounds of the histogram buckets, in seconds and in bytes
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+def format_labels(labels):
+    """
+    Returns the Prometheus label set of a dictionary, e.g. '{figure="card_demand"}'.
+    """
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    """
+    Returns a sample value in the Prometheus text format.
+    """
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative histogram with one series per label set.
+
+    Parameters
+
+    name: Metric name (String).
+    documentation: Help text (String).
+    labelnames: Names of the labels of the series (List of strings).
+    buckets: Upper bounds of the buckets, in ascending order (Tuple of numbers).
+    """
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+
+        # Label values -> [bucket counts (last one for +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Records an observation in the series of the given labels.
+        """
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def exposition(self):
+        """
+        Returns the lines of the histogram in the Prometheus text format.
+        """
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in sorted(self._series.items())]
+
+        for key, counts, total in series:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': format_value(bound)})} {cumulative}")
+            lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(total)}')
+            lines.append(f'{self.name}_count{format_labels(labels)} {cumulative}')
+
+        return lines
+
+
+class _Timer:
+    """
+    Context manager observing its elapsed time in a histogram.
+    """
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    """
+    Set of histograms and collectors exposed together, with a shared sample rate.
+
+    Parameters
+
+    sample_rate: Share of the calls whose observations are recorded, between 0 (off) and 1 (Float).
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE):
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.histograms = []
+        self.collectors = []
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def histogram(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        """
+        Creates and registers a histogram.
+        """
+        histogram = Histogram(name, documentation, labelnames, buckets)
+        self.histograms.append(histogram)
+        return histogram
+
+    def register_collector(self, collect):
+        """
+        Registers a function called on every exposition, returning a list of
+        (name, type, documentation, [(labels, value), ...]) metric families,
+        e.g. counters and gauges read from the caches.
+        """
+        self.collectors.append(collect)
+        return collect
+
+    def sampled(self):
+        """
+        Returns whether the current call should be observed.
+        """
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def timer(self, histogram, **labels):
+        """
+        Returns a context manager observing the time spent in its block in a histogram,
+        or a no-op one when the call is not sampled.
+        """
+        if not self.sampled():
+            return _NULL_TIMER
+        return _Timer(histogram, labels)
+
+    def exposition(self):
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        lines = []
+        for histogram in self.histograms:
+            lines += histogram.exposition()
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines += [f'{name}{format_labels(labels)} {format_value(value)}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+
+def cache_collector(caches, prefix='dashboard_cache'):
+    """
+    Returns a collector of the statistics of named 'FigureCache' instances.
+
+    Parameters
+
+    caches: Dictionary of caches by name, used as the 'cache' label.
+    prefix: Prefix of the metric names (String).
+    """
+    def collect():
+        stats = {name: cache.stats() for name, cache in caches.items()}
+        families = [(f'{prefix}_entries', 'gauge', 'Number of cached entries.', 'size'),
+                    (f'{prefix}_max_entries', 'gauge', 'Maximum number of cached entries.', 'maxsize'),
+                    (f'{prefix}_hits_total', 'counter', 'Cache hits.', 'hits'),
+                    (f'{prefix}_misses_total', 'counter', 'Cache misses.', 'misses'),
+                    (f'{prefix}_evictions_total', 'counter', 'Entries evicted above the maximum size.', 'evictions'),
+                    (f'{prefix}_expirations_total', 'counter', 'Entries dropped after their time to live.', 'expirations'),
+                    ]
+        return [(name, kind, documentation, [({'cache': cache}, stats[cache][field]) for cache in stats])
+                for name, kind, documentation, field in families]
+
+    return collect
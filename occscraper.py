@@ -0,0 +1,576 @@
+### DATA JOBS IN MEXICO: OCC SCRAPER
+
+"""
+Web scraper of the data job vacancies of the OCC website (occ.com.mx), extracted from
+'1_DataJobsMX_Nov2023_DataCollection.ipynb'.
+
+The notebook drove a single Firefox instance over every (job, page) URL one after the
+other, so a run was mostly spent waiting for pages. Here the result pages are fetched
+by an asyncio engine ('Fetcher'):
+
+- at most 'concurrency' pages are fetched at the same time
+- requests to the same host are spaced by a per-host rate limit (requests per second)
+- failed fetches (connection errors, timeouts, 429 and 5xx responses) are retried with
+  exponential backoff and jitter, honouring Retry-After; pages still failing are skipped
+  and listed in 'Fetcher.failures', like the notebook skipped them
+- pages are fetched through a pluggable transport: 'HTTPTransport', a plain HTTP client
+  (aiohttp when installed, urllib in worker threads otherwise) for server-rendered pages,
+  or 'BrowserPoolTransport', a pool of Selenium browser drivers for pages rendered by
+  JavaScript, as the notebook did with Firefox
+- fetched pages can be kept in an on-disk 'PageCache' (see page_cache.py), and a scrape
+  replayed from it without any request ('replay=True'), e.g. to iterate on the extraction;
+  the cache is read and written in a worker thread, off the event loop
+
+The vacancies are then extracted from every page by a 'VacancyExtractor' (see
+vacancy_extractor.py), with the class identifiers of the notebook. Those identifiers
+are set dynamically by the website and change over time, so inspect the current ones
+before a new run (see the notebook).
+
+The vacancies of every page are handed to a 'ScrapeCheckpoint' (see scrape_checkpoint.py)
+as soon as they are extracted: the vacancies found again by the overlapping search terms
+are dropped, and with an output CSV they are appended to it in batches, with a journal of
+the completed pages to resume an interrupted scrape from.
+
+Example
+
+    from occscraper import occscraper
+    df = occscraper(jobs_list, number_pages, vacancy_class, jobname_class, salary_class,
+                    company_class, location_class, concurrency=8, output='Dataset_raw.csv', resume=True)
+"""
+
+# Import required libraries
+import asyncio
+import concurrent.futures
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+from page_cache import PageCache, Response
+from scrape_checkpoint import ScrapeCheckpoint
+from vacancy_extractor import VacancyExtractor
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.firefox.service import Service
+except ImportError:  # pragma: no cover - optional dependency
+    webdriver = None
+
+try:
+    from webdriver_manager.firefox import GeckoDriverManager
+except ImportError:  # pragma: no cover - optional dependency
+    GeckoDriverManager = None
+
+# Settings
+
+# Base url of the OCC searcher
+BASE_URL = 'https://www.occ.com.mx/empleos/de-'
+BASE_PAGE_URL = '?page='
+
+
+# Pages fetched at the same time, and requests per second to the same host
+CONCURRENCY = 8
+HOST_RATE = 4.0
+
+# Retries of a failed fetch, waiting BACKOFF * 2 ** attempt seconds (with jitter) before each
+RETRIES = 3
+BACKOFF = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Seconds to fetch a page
+TIMEOUT = 30
+
+HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:120.0) Gecko/20100101 Firefox/120.0',
+           'Accept-Language': 'es-MX,es;q=0.9,en;q=0.8'}
+
+# OCC Website class identifiers as of November 2023, as [tag, class regular expression] pairs
+VACANCY_CLASS = [['div', r'card-0-2-520 flat-0-2-522 card-0-2-558'],
+                 ['div', r'card-0-2-520 flat-0-2-522 card-0-2-558 standout-0-2-559']]
+JOBNAME_CLASS = [['h2', r'text-0-2-83 subheading-0-2-87 highEmphasis-0-2-104 job-0-2-561 longWord-0-2-573'],
+                 ['h2', r'text-0-2-83 subheading-0-2-87 midEmphasis-0-2-105 job-0-2-561 longWord-0-2-573'],
+                 ['h2', r'text-0-2-83 subheading-0-2-87 highEmphasis-0-2-104 job-0-2-561 longWord-0-2-573']]
+SALARY_CLASS = [['span', r'text-0-2-83 standard-0-2-90 highEmphasis-0-2-104 salary.*'],
+                ['span', r'text-0-2-83 standard-0-2-90 midEmphasis-0-2-104 salary.*'],
+                ['span', r'text-0-2-83 standard-0-2-90 highEmphasis-0-2-104 salary-0-2-564']]
+COMPANY_CLASS = [['label', r'text-0-2-83 standard-0-2-90 highEmphasis-0-2-104 strong-0-2-93 linkContainer.*'],
+                 ['label', r'text-0-2-83 standard-0-2-90 midEmphasis-0-2-104 strong-0-2-93 linkContainer.*'],
+                 ['span', r'locContainer-0-2-604']]
+LOCATION_CLASS = [['p', r'text-0-2-83 small-0-2-91 highEmphasis-0-2-104 zonesLinks.*'],
+                  ['p', r'text-0-2-83 small-0-2-91 midEmphasis-0-2-104 zonesLinks.*'],
+                  ['a', r'link-0-2-586 metalink-0-2-587 linkNoMarginRight-0-2-588']]
+
+
+def job_url(job, base_url=BASE_URL):
+    """
+    Returns the url of the OCC search results of a job name, e.g. 'data analyst' -> '.../de-data-analyst/'.
+    """
+    return base_url + job.strip().lower().replace(' ', '-') + '/'
+
+
+def page_urls(jobs_list, number_pages, base_url=BASE_URL):
+    """
+    Returns the (job, page number, url) of every results page to scrape, in the notebook order.
+    """
+    pages = []
+    for job in jobs_list:
+        url = job_url(job, base_url)
+        for page in range(1, number_pages + 1):
+            pages.append((job, page, url if page == 1 else url + BASE_PAGE_URL + str(page)))
+    return pages
+
+
+def extract_vacancies(html, vacancy_class, jobname_class, salary_class, company_class, location_class):
+    """
+    Returns the [job, salary, company, location] of every vacancy of a results page. To extract
+    several pages, create a VacancyExtractor once instead (see vacancy_extractor.py).
+
+    Parameters
+
+    html: HTML text of a results page (String).
+    vacancy_class: [tag, class] pairs of the vacancy cards (List).
+    jobname_class, salary_class, company_class, location_class: Three [tag, class regular expression]
+                                                                pairs of each field (List).
+    """
+    return VacancyExtractor(vacancy_class, jobname_class, salary_class, company_class, location_class).extract(html)
+
+
+class FetchError(Exception):
+    """
+    Raised when a page cannot be fetched after all the retries.
+    """
+
+
+class HostRateLimiter:
+    """
+    Spaces the requests to each host by at least 1 / rate seconds.
+
+    Parameters
+
+    rate: Requests per second to the same host, or None for no limit (Float).
+    """
+
+    def __init__(self, rate=HOST_RATE):
+        self.rate = rate
+        # Host -> monotonic time of its next allowed request, and lock of its waiting requests
+        self._next = {}
+        self._locks = {}
+
+    async def wait(self, url, slot=None):
+        """
+        Waits until a request to the host of the url is allowed, then acquires the slot (an
+        asyncio.Semaphore of the concurrency limit), if given, for the caller to release.
+
+        The requests to a host wait in turn, and take a slot only once the interval of the
+        host has elapsed, so a request waiting for its host does not hold a slot that a
+        request to another host could use. The interval counts from the moment the slot
+        is acquired.
+        """
+        if not self.rate:
+            if slot is not None:
+                await slot.acquire()
+            return
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self._locks:
+            self._locks[host] = asyncio.Lock()
+        async with self._locks[host]:
+            delay = self._next.get(host, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if slot is not None:
+                await slot.acquire()
+            self._next[host] = time.monotonic() + 1 / self.rate
+
+
+class HTTPTransport:
+    """
+    Plain HTTP client transport: aiohttp when installed, urllib in worker threads otherwise.
+
+    Parameters
+
+    headers: Request headers (Dictionary).
+    timeout: Seconds to fetch a page (Float).
+    max_connections: Maximum number of simultaneous connections (Integer).
+    """
+
+    def __init__(self, headers=HEADERS, timeout=TIMEOUT, max_connections=32):
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = None
+        self._executor = None
+
+    async def fetch(self, url):
+        """
+        Returns the Response of a GET request.
+        """
+        if aiohttp is not None:
+            if self._session is None:
+                self._session = aiohttp.ClientSession(headers=self.headers,
+                                                      timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                      connector=aiohttp.TCPConnector(limit=self.max_connections))
+            async with self._session.get(url) as response:
+                return Response(str(response.url), response.status, await response.text(), dict(response.headers))
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_connections,
+                                                                   thread_name_prefix='occ-fetch')
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, url)
+
+    def get(self, url):
+        """
+        Returns the Response of a blocking GET request with urllib.
+        """
+        request = urllib.request.Request(url, headers=self.headers)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                charset = response.headers.get_content_charset() or 'utf-8'
+                return Response(response.url, response.status, response.read().decode(charset, 'replace'),
+                                dict(response.headers))
+        except urllib.error.HTTPError as error:
+            return Response(url, error.code, error.read().decode('utf-8', 'replace'), dict(error.headers))
+
+    async def close(self):
+        """
+        Closes the HTTP session or worker threads.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def firefox_driver(implicit_wait=4):
+    """
+    Returns a new Firefox Selenium driver, as used in the notebook.
+    """
+    if webdriver is None or GeckoDriverManager is None:
+        raise ImportError("'selenium' and 'webdriver_manager' are required to scrape with a browser")
+    service = Service(executable_path=GeckoDriverManager().install())
+    driver = webdriver.Firefox(service=service)
+    driver.implicitly_wait(implicit_wait)
+    return driver
+
+
+class BrowserPoolTransport:
+    """
+    Transport fetching pages with a pool of browser drivers, for pages rendered by JavaScript.
+    Each driver loads one page at a time, in a worker thread. A driver that fails to load
+    a page (e.g. crashed or timed out) is quit, and a new one is started in its place.
+
+    Parameters
+
+    size: Number of browser drivers (Integer).
+    driver_factory: Function returning a new Selenium driver (Firefox by default).
+    """
+
+    def __init__(self, size=2, driver_factory=firefox_driver):
+        self.size = size
+        self.driver_factory = driver_factory
+        self.drivers = []
+        self._idle = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=size, thread_name_prefix='occ-browser')
+
+    async def fetch(self, url):
+        """
+        Returns the Response of a page loaded by the last idle driver (started on first use).
+        """
+        loop = asyncio.get_running_loop()
+        if self._idle is None:
+            # Idle drivers, on top of one None per driver not started yet
+            self._idle = asyncio.LifoQueue()
+            for _ in range(self.size):
+                self._idle.put_nowait(None)
+
+        driver = await self._idle.get()
+        if driver is None:
+            try:
+                driver = await loop.run_in_executor(self._executor, self.driver_factory)
+            except BaseException:
+                self._idle.put_nowait(None)
+                raise
+            self.drivers.append(driver)
+
+        try:
+            text = await loop.run_in_executor(self._executor, self.get, driver, url)
+        except BaseException:
+            # Not awaited: quitting a hung driver may hang too
+            self.drivers.remove(driver)
+            self._idle.put_nowait(None)
+            loop.run_in_executor(self._executor, self.quit, driver)
+            raise
+        self._idle.put_nowait(driver)
+        return Response(url, 200, text, {})
+
+    @staticmethod
+    def get(driver, url):
+        """
+        Returns the page source of an url loaded by a driver.
+        """
+        driver.get(url)
+        return driver.page_source
+
+    @staticmethod
+    def quit(driver):
+        """
+        Quits a driver, ignoring the errors of a driver that already crashed.
+        """
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    async def close(self):
+        """
+        Quits every driver.
+        """
+        loop = asyncio.get_running_loop()
+        for driver in self.drivers:
+            await loop.run_in_executor(self._executor, self.quit, driver)
+        self.drivers = []
+        self._idle = None
+        self._executor.shutdown(wait=False)
+
+
+class Fetcher:
+    """
+    Asynchronous page fetcher with bounded concurrency, per-host rate limiting and retries.
+
+    Parameters
+
+    transport: Transport with an async 'fetch(url)' method returning a Response (HTTPTransport by default).
+    concurrency: Maximum number of pages fetched at the same time (Integer).
+    rate: Requests per second to the same host, or None for no limit (Float).
+    retries: Retries of a failed fetch (Integer).
+    backoff: Seconds before the first retry, doubled on each retry (Float).
+    cache: Optional PageCache the pages are read from and stored to.
+    replay: Whether to only read the pages from the cache, whatever their age, without fetching them (Boolean).
+    """
+
+    def __init__(self, transport=None, concurrency=CONCURRENCY, rate=HOST_RATE, retries=RETRIES, backoff=BACKOFF,
+                 cache=None, replay=False):
+        if replay and cache is None:
+            raise ValueError('The replay mode requires a page cache')
+        self.transport = transport if transport is not None else HTTPTransport(max_connections=concurrency)
+        self.concurrency = concurrency
+        self.limiter = HostRateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.replay = replay
+
+        self.cached = 0
+        self.requests = 0
+        self.retried = 0
+        self.failures = []
+        self._semaphore = None
+        # The page cache reads, writes and compresses files, and may evict many of them: it runs
+        # in its own thread (one, so that its counters and size are only updated by one thread)
+        self._cache_executor = None
+
+    async def run_cache(self, method, *args, **kwargs):
+        """
+        Returns the result of a PageCache method run in the cache thread.
+        """
+        if self._cache_executor is None:
+            self._cache_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                         thread_name_prefix='occ-cache')
+        return await asyncio.get_running_loop().run_in_executor(self._cache_executor,
+                                                                lambda: method(*args, **kwargs))
+
+    def retry_delay(self, attempt, response=None):
+        """
+        Returns the seconds to wait before a retry: the Retry-After header of the response,
+        or an exponential backoff with jitter.
+        """
+        retry_after = (response.headers.get('Retry-After') if response is not None else None) or ''
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def fetch(self, url):
+        """
+        Returns the Response of an url from the cache, or fetched (and cached), retrying failed fetches.
+
+        Raises FetchError when the page cannot be fetched, or is not cached in replay mode.
+        """
+        if self.cache is not None:
+            response = await self.run_cache(self.cache.get, url, expired=self.replay)
+            if response is not None:
+                self.cached += 1
+                return response
+            if self.replay:
+                raise FetchError(f'{url}: not in the page cache (replay mode)')
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        for attempt in range(self.retries + 1):
+            response, error = None, None
+            await self.limiter.wait(url, self._semaphore)
+            try:
+                self.requests += 1
+                response = await self.transport.fetch(url)
+            except Exception as exception:
+                # Connection errors and timeouts, and errors of the transport libraries
+                # (e.g. aiohttp.ClientError, selenium's WebDriverException)
+                error = f'{type(exception).__name__}: {exception}'
+            finally:
+                self._semaphore.release()
+
+            if response is not None:
+                if response.status == 200:
+                    if self.cache is not None:
+                        await self.run_cache(self.cache.put, url, response)
+                    return response
+                error = f'HTTP {response.status}'
+                if response.status not in RETRY_STATUSES:
+                    break
+
+            if attempt < self.retries:
+                self.retried += 1
+                await asyncio.sleep(self.retry_delay(attempt, response))
+
+        raise FetchError(f'{url}: {error}')
+
+    async def fetch_or_skip(self, url):
+        """
+        Returns the Response of an url, or None (listed in 'failures') if it cannot be fetched.
+        """
+        try:
+            return await self.fetch(url)
+        except FetchError as error:
+            self.failures.append(str(error))
+            return None
+
+    async def fetch_all(self, urls):
+        """
+        Returns the Response of every url in order, or None for the pages that could not be fetched.
+        """
+        return await asyncio.gather(*(self.fetch_or_skip(url) for url in urls))
+
+    async def close(self):
+        """
+        Closes the transport and the cache thread.
+        """
+        await self.transport.close()
+        if self._cache_executor is not None:
+            self._cache_executor.shutdown(wait=True)
+            self._cache_executor = None
+
+
+async def scrape(jobs_list, number_pages, vacancy_class=VACANCY_CLASS, jobname_class=JOBNAME_CLASS,
+                 salary_class=SALARY_CLASS, company_class=COMPANY_CLASS, location_class=LOCATION_CLASS,
+                 fetcher=None, checkpoint=None, base_url=BASE_URL, verbose=True):
+    """
+    Coroutine scraping the results pages of every job and returning the vacancies as a
+    Dataframe (see 'occscraper'). Vacancies keep the order of the jobs and pages.
+
+    Every page is recorded in the ScrapeCheckpoint as soon as its vacancies are extracted,
+    and the pages it already completed are skipped.
+    """
+    fetcher = fetcher if fetcher is not None else Fetcher()
+    checkpoint = checkpoint if checkpoint is not None else ScrapeCheckpoint()
+    pages = page_urls(jobs_list, number_pages, base_url)
+    extractor = VacancyExtractor(vacancy_class, jobname_class, salary_class, company_class, location_class)
+    loop = asyncio.get_running_loop()
+
+    async def scrape_page(job, page, url):
+        response = await fetcher.fetch_or_skip(url)
+        if response is None:
+            return
+        # Extracted in a worker thread, so that the event loop keeps fetching meanwhile
+        vacancies = await loop.run_in_executor(None, extractor.extract, response.text)
+        checkpoint.add(job, page, url, vacancies)
+
+    async def scrape_job(position, job):
+        await asyncio.gather(*(scrape_page(job, page, url) for page_job, page, url in pages
+                               if page_job == job and url not in checkpoint.completed))
+        if verbose:
+            print('Successfully retrieved data for:', job.title(),
+                  ' ({} out of {})'.format(position + 1, len(jobs_list)))
+
+    start = time.perf_counter()
+    if verbose and checkpoint.resumed:
+        print(f'Resuming: {checkpoint.resumed} pages already scraped')
+    try:
+        await asyncio.gather(*(scrape_job(position, job) for position, job in enumerate(jobs_list)))
+    finally:
+        await fetcher.close()
+        checkpoint.close()
+
+    df = checkpoint.dataframe([url for _, _, url in pages])
+    if verbose:
+        print(f'Job done! {len(pages)} pages in {time.perf_counter() - start:.1f} s '
+              f'({fetcher.cached} from cache, {fetcher.retried} retries, {len(fetcher.failures)} pages skipped, '
+              f'{checkpoint.duplicates} duplicated vacancies dropped)\n')
+
+    return df
+
+
+def run(coroutine):
+    """
+    Runs a coroutine to completion, also from a running event loop (e.g. a Jupyter notebook).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def occscraper(jobs_list, number_pages, vacancy_class=VACANCY_CLASS, jobname_class=JOBNAME_CLASS,
+               salary_class=SALARY_CLASS, company_class=COMPANY_CLASS, location_class=LOCATION_CLASS,
+               concurrency=CONCURRENCY, rate=HOST_RATE, retries=RETRIES, transport=None, output=None,
+               resume=False, deduplicate=True, cache=None, replay=False, base_url=BASE_URL, verbose=True):
+    """
+    This function scrapes job data from the OCC Website (occ.com.mx): Position Name, Salary, Company and Location.
+
+    IMPORTANT NOTE: OCC Website dynamically sets the class identifiers for its page elements, so INSPECT
+    what are the CURRENT class identifiers before running it (see the notebook).
+
+    Parameters
+
+    jobs_list: List with the name of the Data Jobs in both English and Spanish and avoiding empty words (Python list of strings).
+    number_pages: Number of pages to scrap from the website (Integer).
+    vacancy_class: [tag, class] pairs of the vacancies (List).
+    jobname_class: Three [tag, class regular expression] pairs for the name of the position (List).
+    salary_class: Three [tag, class regular expression] pairs for the salary of the position (List).
+    company_class: Three [tag, class regular expression] pairs for the company offering the position (List).
+    location_class: Three [tag, class regular expression] pairs for the geographical location of the position (List).
+    concurrency: Maximum number of pages fetched at the same time (Integer).
+    rate: Requests per second to the OCC website, or None for no limit (Float).
+    retries: Retries of a failed page (Integer).
+    transport: HTTPTransport (default) or BrowserPoolTransport, e.g. BrowserPoolTransport(size=4) to
+               render the pages with Firefox as the notebook did.
+    output: CSV file the vacancies are appended to in batches while scraping, with a checkpoint
+            of the completed pages next to it (e.g. 'Dataset_raw.csv'), or None (String).
+    resume: Whether to resume the interrupted scrape of the output, skipping its completed pages (Boolean).
+    deduplicate: Whether to drop the vacancies found again by another page or job (Boolean).
+    cache: PageCache, or folder of a PageCache, to read the pages from and store them to, or None (String or Path).
+    replay: Whether to only read the pages from the cache (by default PageCache()), without fetching
+            any, e.g. to iterate on the class identifiers (Boolean).
+    base_url: Base url of the searcher, e.g. a local stand-in server (String).
+    verbose: Whether to print the progress (Boolean).
+
+    Returns
+
+    df: Pandas Dataframe with the results in a tabular form from the web scraping.
+    """
+    if cache is None and replay:
+        cache = PageCache()
+    elif cache is not None and not isinstance(cache, PageCache):
+        cache = PageCache(cache)
+    fetcher = Fetcher(transport, concurrency=concurrency, rate=rate, retries=retries, cache=cache, replay=replay)
+    checkpoint = ScrapeCheckpoint(output, resume=resume, deduplicate=deduplicate)
+    return run(scrape(jobs_list, number_pages, vacancy_class, jobname_class, salary_class, company_class,
+                      location_class, fetcher=fetcher, checkpoint=checkpoint, base_url=base_url, verbose=verbose))
@@ -0,0 +1,169 @@
+### DATA JOBS IN MEXICO: DROPDOWN OPTIONS
+
+"""
+Searchable, dependent options of the dashboard dropdowns.
+
+Instead of embedding every label of a column in the layout, the dropdowns get a
+capped page of options at a time, for what the user typed and for the current
+selections of the other filters:
+
+- a prefix index finds the labels having a word starting with the typed text
+  (case and accent insensitive: 'mex' finds 'Ciudad de México'); it is a sorted
+  array of the normalized label suffixes starting at a word, searched by bisection
+- the option counts are the number of postings of each label among the rows
+  matching the other filters (e.g. the Company counts for the selected Jobs and
+  Locations), computed from the inverted indexes of the filter engine; labels
+  without postings are left out
+- options are sorted by count and returned in pages of at most OPTIONS_LIMIT
+
+Example
+
+    options = OptionIndex(engine, 'Company')
+    counts = options.counts(job=['Data Analyst'], location=['Jalisco'])
+    page = options.page(counts, search='ban', offset=0, limit=50)
+"""
+
+# Import required libraries
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+# Settings
+
+# Options returned per page by default, and at most
+OPTIONS_LIMIT = 100
+MAX_OPTIONS_LIMIT = 1000
+
+# Filter engine argument of each column
+COLUMN_ARGUMENTS = {'Job': 'job', 'Location': 'location', 'Company': 'company'}
+
+
+def normalize_text(text):
+    """
+    Returns a text without accents, in lower case, for searching.
+    """
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def word_starts(text):
+    """
+    Returns the positions of the words of a text (alphanumeric characters after any other character).
+    """
+    return [i for i, c in enumerate(text) if c.isalnum() and (i == 0 or not text[i - 1].isalnum())]
+
+
+class PrefixIndex:
+    """
+    Index of labels by the prefixes of their words.
+
+    Parameters
+
+    labels: Labels to index, identified by their position (List or Index of strings).
+    """
+
+    def __init__(self, labels):
+        keys = []
+        for code, label in enumerate(labels):
+            text = normalize_text(label)
+            keys += [(text[start:], code) for start in word_starts(text)]
+        keys.sort()
+
+        self.keys = [key for key, _ in keys]
+        self.codes = np.array([code for _, code in keys], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix):
+        """
+        Returns the sorted codes of the labels having a word starting with the prefix.
+        """
+        prefix = normalize_text(prefix)
+        first = bisect_left(self.keys, prefix)
+        last = bisect_left(self.keys, prefix + '\U0010ffff', lo=first)
+        return np.unique(self.codes[first:last])
+
+
+class OptionIndex:
+    """
+    Dropdown options of a categorical column of a 'FilterEngine', with counts dependent
+    on the other filters and search by prefix.
+
+    Parameters
+
+    engine: FilterEngine of the dataset.
+    column: Categorical column of the dropdown ('Job', 'Location' or 'Company').
+    """
+
+    def __init__(self, engine, column):
+        self.engine = engine
+        self.column = column
+        self.labels = engine.data.categories[column]
+
+        self._prefix_index = None
+        self._label_rank = None
+
+    @property
+    def prefix_index(self):
+        """
+        Prefix index of the labels, built on first search.
+        """
+        if self._prefix_index is None:
+            self._prefix_index = PrefixIndex(self.labels)
+        return self._prefix_index
+
+    @property
+    def label_rank(self):
+        """
+        Alphabetical rank of each label, to break count ties, computed on first use.
+        """
+        if self._label_rank is None:
+            self._label_rank = np.argsort(np.argsort(np.array(self.labels, dtype=object), kind='stable'))
+        return self._label_rank
+
+    def counts(self, job=None, location=None, company=None, salary=None):
+        """
+        Returns the number of postings of every label among the rows matching the filters
+        of the other columns (the filter of the option column itself is ignored).
+        """
+        filters = {'job': job, 'location': location, 'company': company}
+        filters[COLUMN_ARGUMENTS[self.column]] = None
+
+        if salary is None and all(value is None for value in filters.values()):
+            return self.engine.counts[self.column]
+
+        codes = self.engine.data.codes[self.column][self.engine.query(salary=salary, **filters)]
+        return np.bincount(codes[codes >= 0], minlength=len(self.labels))
+
+    def page(self, counts, search=None, offset=0, limit=OPTIONS_LIMIT):
+        """
+        Returns a page of the labels with postings, optionally matching a search, by
+        descending count (then alphabetically).
+
+        Parameters
+
+        counts: Number of postings per label, as returned by 'counts'.
+        search: Optional text typed in the dropdown (String).
+        offset: Position of the first option of the page (Integer).
+        limit: Number of options of the page, at most MAX_OPTIONS_LIMIT (Integer).
+
+        Returns
+
+        page: Dictionary with the 'total' number of matching labels, the 'offset' and 'limit'
+              of the page and its 'options', a list of {'label', 'value', 'count'} dictionaries.
+        """
+        limit = min(max(int(limit), 0), MAX_OPTIONS_LIMIT)
+        offset = max(int(offset), 0)
+
+        codes = self.prefix_index.search(search) if search else np.arange(len(self.labels))
+        codes = codes[counts[codes] > 0]
+        codes = codes[np.lexsort((self.label_rank[codes], -counts[codes]))]
+
+        return {'total': len(codes),
+                'offset': offset,
+                'limit': limit,
+                'options': [{'label': self.labels[code], 'value': self.labels[code], 'count': int(counts[code])}
+                            for code in codes[offset:offset + limit]],
+                }
@@ -0,0 +1,240 @@
+### DATA JOBS IN MEXICO: PAGE CACHE
+
+"""
+On-disk cache of the pages fetched by the scraper.
+
+Re-running a scrape to change the extraction used to fetch every results page again
+from the OCC website. The 'PageCache' keeps the fetched pages on disk instead:
+
+- pages are keyed by their normalized url (lower case scheme and host, no default
+  port nor fragment, sorted query parameters), so equivalent urls share an entry
+- the page bodies are content-addressed: stored compressed under the SHA-256 of their
+  text, which is checked when read back, and shared by the urls with the same page
+- the entry of an url records the hash of its body, the final url, a few headers and
+  when it was fetched; entries older than the TTL are fetched again
+- the cache is bounded in size: when the bodies exceed 'max_bytes', the least recently
+  used ones (and their entries) are evicted down to EVICTION_TARGET of the bound
+
+With 'Fetcher(cache=PageCache(), replay=True)' (or 'occscraper(..., replay=True)')
+the pages are only read from the cache, whatever their age, and never fetched: pages
+missing from it are skipped. A scrape can then be replayed in seconds, e.g. to iterate
+on the class identifiers of the extraction, without requests to the website.
+
+Files are written to a temporary file and renamed, so a crashed or concurrent writer
+never leaves a partial entry. The cache folder is set by DATAJOBS_PAGE_CACHE (the
+temporary folder by default), the TTL in seconds by DATAJOBS_PAGE_CACHE_TTL.
+
+Example
+
+    cache = PageCache(ttl=24 * 3600, max_bytes=256 * 2 ** 20)
+    response = cache.get(url)  # Response or None
+    cache.put(url, response)
+"""
+
+# Import required libraries
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+# Settings
+
+CACHE_DIR = Path(os.environ.get('DATAJOBS_PAGE_CACHE', Path(tempfile.gettempdir()) / 'datajobs-page-cache'))
+
+# Seconds a cached page is used for (a week by default), None for no expiry
+CACHE_TTL = float(os.environ.get('DATAJOBS_PAGE_CACHE_TTL', 7 * 24 * 3600))
+
+# Bytes of compressed page bodies kept at most, and share of it kept after an eviction
+MAX_BYTES = 512 * 2 ** 20
+EVICTION_TARGET = 0.9
+
+# Response headers kept with the pages
+CACHED_HEADERS = ['Content-Type', 'Date', 'ETag', 'Last-Modified']
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Fetched page: final url, HTTP status, HTML text and response headers
+Response = namedtuple('Response', ['url', 'status', 'text', 'headers'])
+
+
+def normalize_url(url):
+    """
+    Returns the normalized form of an url, e.g. 'HTTPS://www.OCC.com.mx:443/a%7eb?z=1&a=2#top'
+    -> 'https://www.occ.com.mx/a~b?a=2&z=1'.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or '').lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc += f':{parts.port}'
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=") or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def write_atomic(path, content):
+    """
+    Writes bytes to a file through a temporary file renamed over it.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix='.tmp-', delete=False) as tmp:
+        tmp.write(content)
+    os.replace(tmp.name, path)
+
+
+class PageCache:
+    """
+    Content-addressed on-disk cache of fetched pages, with a TTL and size-bounded LRU eviction.
+
+    Parameters
+
+    directory: Folder of the cache (String or Path).
+    ttl: Seconds a cached page is used for, or None for no expiry (Float).
+    max_bytes: Bytes of compressed page bodies kept at most (Integer).
+    """
+
+    def __init__(self, directory=CACHE_DIR, ttl=CACHE_TTL, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._size = None
+
+    def key(self, url):
+        """
+        Returns the key of the entry of an url (SHA-256 of its normalized form).
+        """
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return self.directory / 'entries' / key[:2] / f'{key}.json'
+
+    def _body_path(self, digest):
+        return self.directory / 'bodies' / digest[:2] / f'{digest}.z'
+
+    def read_entry(self, url):
+        """
+        Returns the entry of an url as a dictionary, or None if not cached.
+        """
+        try:
+            return json.loads(self._entry_path(self.key(url)).read_bytes())
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url, expired=False):
+        """
+        Returns the cached Response of an url, or None if not cached, expired (unless
+        'expired' is True) or corrupted.
+        """
+        entry = self.read_entry(url)
+        if entry is None or (not expired and self.ttl is not None and time.time() - entry['fetched_at'] > self.ttl):
+            self.misses += 1
+            return None
+
+        path = self._body_path(entry['sha256'])
+        try:
+            content = zlib.decompress(path.read_bytes())
+        except (OSError, zlib.error):
+            content = None
+        if content is None or hashlib.sha256(content).hexdigest() != entry['sha256']:
+            self.misses += 1
+            self._entry_path(self.key(url)).unlink(missing_ok=True)
+            return None
+
+        # The modification time of a body is its last use, for the eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return Response(entry['url'], 200, content.decode('utf-8'), entry['headers'])
+
+    def put(self, url, response):
+        """
+        Stores the Response of an url (successful responses only), evicting the least recently
+        used pages if the cache exceeds its size bound.
+        """
+        if response.status != 200:
+            return
+        content = response.text.encode('utf-8')
+        digest = hashlib.sha256(content).hexdigest()
+
+        path = self._body_path(digest)
+        if path.exists():
+            os.utime(path)
+        else:
+            compressed = zlib.compress(content, 6)
+            write_atomic(path, compressed)
+            if self._size is not None:
+                self._size += len(compressed)
+
+        entry = {'url': response.url,
+                 'sha256': digest,
+                 'fetched_at': time.time(),
+                 'headers': {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+                 }
+        write_atomic(self._entry_path(self.key(url)), json.dumps(entry).encode('utf-8'))
+        self.stored += 1
+
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    def size(self):
+        """
+        Returns the bytes of the page bodies in the cache (scanned once, then kept up to date).
+        """
+        if self._size is None:
+            self._size = sum(path.stat().st_size for path in self.directory.glob('bodies/*/*.z'))
+        return self._size
+
+    def evict(self, target=None):
+        """
+        Removes the least recently used page bodies, and the entries pointing to them, until
+        the cache holds at most 'target' bytes (EVICTION_TARGET of max_bytes by default).
+        """
+        target = self.max_bytes * EVICTION_TARGET if target is None else target
+        bodies = []
+        for path in self.directory.glob('bodies/*/*.z'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            bodies.append((stat.st_mtime, stat.st_size, path))
+        bodies.sort()
+
+        size = sum(body_size for _, body_size, _ in bodies)
+        removed = set()
+        for _, body_size, path in bodies:
+            if size <= target:
+                break
+            path.unlink(missing_ok=True)
+            removed.add(path.stem)
+            size -= body_size
+        self._size = size
+
+        if removed:
+            for path in self.directory.glob('entries/*/*.json'):
+                try:
+                    digest = json.loads(path.read_bytes())['sha256']
+                except (OSError, ValueError, KeyError):
+                    digest = None
+                if digest is None or digest in removed:
+                    path.unlink(missing_ok=True)
+            self.evicted += len(removed)
+        return len(removed)
+
+    def stats(self):
+        """
+        Returns the hits, misses, stored and evicted pages and the size of the cache as a dictionary.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'stored': self.stored, 'evicted': self.evicted,
+                'bytes': self.size()}
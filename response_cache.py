@@ -0,0 +1,218 @@
+### DATA JOBS IN MEXICO: RESPONSE CACHE
+
+"""
+HTTP response layer of the dashboard server: cached, compressed responses with ETags.
+
+Identical callback inputs produce byte-identical responses, so the serialized response
+of a callback request ('_dash-update-component') is cached under a hash of its
+normalized inputs (output, input and state values) and served again without running
+the callback. The layout and dependencies ('_dash-layout', '_dash-dependencies') are
+cached by path, and so are the labels of the clientside data ('/client-labels/<name>').
+
+Every cached response gets a weak ETag (a hash of its body); a request whose
+If-None-Match header carries it is answered with '304 Not Modified' and no body.
+Responses above a minimum size are compressed with brotli (when installed) or gzip,
+as accepted by the client, and the compressed variants are kept with the cached
+entry, so the most requested states (e.g. the default 'All' view) are compressed
+once. Entries belong to a dataset version, like the figure cache; when the version
+can change while the server runs (see snapshot_manager.py), the keys also include the
+version the request is served from, so that a response computed from the previous
+version is never served for the new one.
+
+Example
+
+    response_cache = ResponseCache(maxsize=512, version=dataset_version)
+    response_cache.init_app(app.server)
+"""
+
+# Import required libraries
+import gzip
+import hashlib
+import json
+import threading
+
+import flask
+
+from figure_cache import FigureCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Settings
+
+# Paths whose responses are cached: callback requests by their inputs, the others by path
+# (the labels of the clientside data by path and query, which holds their dataset version)
+CALLBACK_PATH = '/_dash-update-component'
+STATIC_PATHS = ('/_dash-layout', '/_dash-dependencies')
+LABELS_PATH = '/client-labels/'
+
+# Responses smaller than this (in bytes) are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Content encodings in order of preference
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(body, encoding):
+    """
+    Returns a response body compressed with a content encoding ('br' or 'gzip').
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    # mtime=0 makes the output depend only on the body
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def callback_key(payload):
+    """
+    Returns a hash of the output, input and state values of a callback request body.
+    """
+    normalized = {name: payload.get(name) for name in ('output', 'inputs', 'state')}
+    text = json.dumps(normalized, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class CachedResponse:
+    """
+    Serialized response body with its ETag and compressed variants.
+
+    Parameters
+
+    body: Uncompressed response body (Bytes).
+    content_type: Content-Type header of the response (String).
+    """
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self.etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+
+        # Content encoding -> compressed body
+        self._variants = {}
+        self._lock = threading.Lock()
+
+    def variant(self, encoding):
+        """
+        Returns the body compressed with an encoding, compressing it on first use.
+        """
+        with self._lock:
+            compressed = self._variants.get(encoding)
+            if compressed is None:
+                compressed = self._variants[encoding] = compress(self.body, encoding)
+            return compressed
+
+
+class ResponseCache:
+    """
+    Cache of the serialized dashboard responses, serving them with ETags and compression.
+
+    Parameters
+
+    maxsize: Maximum number of cached responses (Integer).
+    ttl: Seconds a response stays cached, or None to keep it until evicted (Float).
+    version: Identifier of the dataset the responses were built from (String).
+    min_size: Minimum body size in bytes to compress a response (Integer).
+    request_version: Optional function returning the dataset version of the current request.
+    """
+
+    def __init__(self, maxsize=512, ttl=3600, version=None, min_size=MIN_COMPRESS_SIZE, request_version=None):
+        self.cache = FigureCache(maxsize=maxsize, ttl=ttl, version=version)
+        self.min_size = min_size
+        self.request_version = request_version
+
+    def stats(self):
+        """
+        Returns the counters of the underlying cache.
+        """
+        return self.cache.stats()
+
+    def set_version(self, version):
+        """
+        Sets the dataset version, dropping every cached response if it changed.
+        """
+        self.cache.set_version(version)
+
+    def request_key(self, request):
+        """
+        Returns the cache key of a request, or None if its response is not cached.
+        """
+        version = None if self.request_version is None else self.request_version()
+        if request.method == 'POST' and request.path.endswith(CALLBACK_PATH):
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return None
+            return ('callback', version, callback_key(payload))
+        if request.method == 'GET' and (request.path.endswith(STATIC_PATHS) or LABELS_PATH in request.path):
+            return ('path', version, request.full_path)
+        return None
+
+    def respond(self, entry, response=None):
+        """
+        Returns the response of a cached entry for the current request: '304 Not Modified'
+        when the client has its ETag, otherwise the body in the best accepted encoding.
+        """
+        request = flask.request
+        if response is None:
+            response = flask.Response(content_type=entry.content_type)
+
+        if request.if_none_match.contains_weak(entry.etag):
+            response = flask.Response(status=304)
+        else:
+            encoding = None
+            if len(entry.body) >= self.min_size:
+                encoding = request.accept_encodings.best_match(ENCODINGS)
+            if encoding is not None:
+                response.set_data(entry.variant(encoding))
+                response.headers['Content-Encoding'] = encoding
+            else:
+                response.set_data(entry.body)
+
+        response.set_etag(entry.etag, weak=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        if request.method == 'GET':
+            # Browsers revalidate the layout with its ETag instead of reusing it blindly
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def before_request(self):
+        """
+        Serves the cached response of the request, if any (Flask before_request hook).
+        """
+        key = self.request_key(flask.request)
+        if key is None:
+            return None
+        flask.g.response_cache_key = key
+
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        flask.g.response_cache_hit = True
+        return self.respond(entry)
+
+    def after_request(self, response):
+        """
+        Caches and compresses the response of a cacheable request (Flask after_request hook).
+        """
+        key = flask.g.pop('response_cache_key', None)
+        if key is None or flask.g.pop('response_cache_hit', False):
+            return response
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        entry = CachedResponse(response.get_data(), response.content_type)
+        self.cache.set(key, entry)
+        return self.respond(entry, response)
+
+    def init_app(self, server):
+        """
+        Registers the hooks of the cache on a Flask server (e.g. app.server of a Dash app).
+        """
+        server.before_request(self.before_request)
+        server.after_request(self.after_request)
+        return self
@@ -0,0 +1,117 @@
+### DATA JOBS IN MEXICO: SALARY INDEX
+
+"""
+Disclosed salaries of the Data Jobs dataset sorted in ascending order, with their
+row ids, overall or per category of a column.
+
+A salary range is a contiguous slice of every group, found by binary search, so
+the filter engine resolves salary ranges in logarithmic time. Selecting the rows of
+a filter state from a sorted group keeps the salaries sorted, so quantiles and box
+statistics of any selection are read by position, without sorting the salaries on
+every request.
+"""
+
+# Import required libraries
+import numpy as np
+
+
+class SalaryIndex:
+    """
+    Disclosed salaries of an 'EncodedFrame' sorted in ascending order, grouped by the
+    codes of a column (a single group 0 when no column is given). Postings without
+    salary, and without label when grouping, are left out.
+
+    Parameters
+
+    data: EncodedFrame with the dataset to index.
+    column: Optional categorical column to group the salaries by (String).
+    """
+
+    def __init__(self, data, column=None):
+        self.data = data
+        self.column = column
+
+        salary = data.salary
+        rows = np.flatnonzero(~np.isnan(salary)).astype(np.int32)
+
+        if column is None:
+            n_groups = 1
+            codes = np.zeros(len(rows), dtype=np.int64)
+        else:
+            n_groups = len(data.categories[column])
+            codes = data.codes[column][rows].astype(np.int64)
+            labelled = codes >= 0
+            rows, codes = rows[labelled], codes[labelled]
+
+        # Sorted by group, then by salary; rows of group g are rows[offsets[g]:offsets[g + 1]]
+        order = np.lexsort((salary[rows], codes))
+        self.rows = rows[order]
+        self.values = salary[self.rows]
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_groups))])
+
+        self.rows.flags.writeable = False
+        self.values.flags.writeable = False
+
+    @classmethod
+    def from_arrays(cls, data, column, arrays):
+        """
+        Returns a SalaryIndex over the arrays returned by 'arrays', without sorting again.
+        """
+        index = cls.__new__(cls)
+        index.data = data
+        index.column = column
+        index.rows = arrays['rows']
+        index.values = arrays['values']
+        index.offsets = arrays['offsets']
+        return index
+
+    def arrays(self):
+        """
+        Returns the sorted row ids, salaries and group offsets by name.
+        """
+        return {'rows': self.rows, 'values': self.values, 'offsets': self.offsets}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def group(self, code=0):
+        """
+        Returns the sorted salaries of a group and their row ids.
+        """
+        first, last = self.offsets[code], self.offsets[code + 1]
+        return self.values[first:last], self.rows[first:last]
+
+    def bounds(self, code, low, high):
+        """
+        Returns the (first, last) positions of the salaries of a group within an inclusive
+        range, so that they are values[first:last] and their row ids rows[first:last].
+        """
+        values, _ = self.group(code)
+        # Same precision as comparing the salary column with the bounds
+        low, high = values.dtype.type(low), values.dtype.type(high)
+        offset = self.offsets[code]
+        return (offset + int(np.searchsorted(values, low, side='left')),
+                offset + int(np.searchsorted(values, high, side='right')))
+
+    def count(self, codes, low, high):
+        """
+        Returns the number of salaries of the given groups within an inclusive range.
+        """
+        return sum(last - first for first, last in (self.bounds(code, low, high) for code in codes))
+
+    def range_rows(self, codes, low, high):
+        """
+        Returns the row ids of the given groups with a salary within an inclusive range,
+        sorted by group and salary (not by row id).
+        """
+        slices = [self.rows[first:last] for first, last in (self.bounds(code, low, high) for code in codes)]
+        if not slices:
+            return np.empty(0, dtype=np.int32)
+        return slices[0] if len(slices) == 1 else np.concatenate(slices)
+
+    def select(self, code, mask):
+        """
+        Returns the sorted salaries of a group for the rows selected by a boolean row mask.
+        """
+        values, rows = self.group(code)
+        return values[mask[rows]]
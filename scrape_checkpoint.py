@@ -0,0 +1,221 @@
+### DATA JOBS IN MEXICO: SCRAPE CHECKPOINT
+
+"""
+Incremental, resumable storage of the scraped vacancies.
+
+The search terms of the notebook overlap ('data analyst' / 'analista datos', 'bi analyst'
+/ 'business intelligence'), so the same vacancy is found several times, and a scrape
+used to keep every vacancy in memory until the end. The 'ScrapeCheckpoint' receives
+the vacancies of every page as soon as it is extracted instead:
+
+- vacancies are deduplicated as they come, by a content hash of their job title,
+  company, location and salary (with the whitespace collapsed)
+- every completed page is appended, with its vacancies, to a journal next to the
+  output CSV ('Dataset_raw.csv.checkpoint'), one JSON line per page
+- the new vacancies are appended to the output CSV in batches of BATCH_SIZE rows; the
+  journal records the CSV size after each batch
+- when resuming, the completed pages of the journal are skipped, the CSV is truncated
+  to its last recorded batch and the new vacancies of the journal not in it are
+  appended again, so a crash at any point neither loses nor duplicates vacancies
+
+Pages that could not be fetched are not marked as completed, and are retried when
+resuming. The rows of the CSV are in the order the pages completed; the Dataframe of
+the scrape keeps the order of the jobs and pages (the same rows, deduplicated in that
+order). Without an output CSV, the checkpoint only deduplicates the vacancies in memory.
+
+Example
+
+    checkpoint = ScrapeCheckpoint('Dataset_raw.csv', resume=True)
+    df = occscraper(jobs_list, number_pages, checkpoint=checkpoint)
+"""
+
+# Import required libraries
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Settings
+
+COLUMNS = ['Job', 'Salary', 'Company', 'Location']
+
+# Fields of the content hash of a vacancy, as positions of COLUMNS (title, company, location, salary)
+HASH_FIELDS = [0, 2, 3, 1]
+
+# Rows appended to the output CSV at a time
+BATCH_SIZE = 200
+
+# Suffix of the journal of the completed pages, next to the output CSV
+JOURNAL_SUFFIX = '.checkpoint'
+
+
+def vacancy_hash(vacancy):
+    """
+    Returns the content hash of a [job, salary, company, location] vacancy (Hexadecimal string).
+    """
+    fields = [' '.join(vacancy[i].split()) if isinstance(vacancy[i], str) else None for i in HASH_FIELDS]
+    content = json.dumps(fields, ensure_ascii=False).encode('utf-8')
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def to_json(vacancy):
+    """
+    Returns a vacancy with its missing fields (NaN) as None, for JSON.
+    """
+    return [value if isinstance(value, str) else None for value in vacancy]
+
+
+def from_json(vacancy):
+    """
+    Returns a vacancy read from JSON, with its missing fields as NaN.
+    """
+    return [np.nan if value is None else value for value in vacancy]
+
+
+class ScrapeCheckpoint:
+    """
+    Deduplicated vacancies of a scrape, checkpointed to a journal and appended to a CSV in batches.
+
+    Parameters
+
+    output: Output CSV (e.g. 'Dataset_raw.csv'), or None to keep the vacancies in memory only (String or Path).
+    resume: Whether to resume the scrape of the journal of the output, if any; otherwise the
+            output and its journal are started over (Boolean).
+    batch_size: Rows appended to the output at a time (Integer).
+    deduplicate: Whether to drop the vacancies already scraped (Boolean).
+    """
+
+    def __init__(self, output=None, resume=False, batch_size=BATCH_SIZE, deduplicate=True):
+        self.output = Path(output) if output is not None else None
+        self.journal_path = self.output.with_name(self.output.name + JOURNAL_SUFFIX) if output is not None else None
+        self.batch_size = batch_size
+        self.deduplicate = deduplicate
+
+        # url -> vacancies of every completed page, the hashes of the vacancies and the new ones
+        self.pages = {}
+        self.seen = set()
+        self.rows = []
+        self.flushed = 0
+        self.duplicates = 0
+        self.resumed = 0
+
+        self._journal = None
+        if self.output is None:
+            return
+        if resume and self.journal_path.exists():
+            self._resume()
+        else:
+            self._start()
+
+    @property
+    def completed(self):
+        """
+        Urls of the completed pages.
+        """
+        return self.pages.keys()
+
+    def _start(self):
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(columns=COLUMNS).to_csv(self.output, index=False, encoding='utf-8')
+        self._journal = open(self.journal_path, 'w', encoding='utf-8')
+        self._write({'output': self.output.name, 'flushed': 0, 'size': self.output.stat().st_size})
+
+    def _resume(self):
+        records, valid = [], 0
+        with open(self.journal_path, 'rb') as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Last line cut by a crash
+                    break
+                valid += len(line)
+
+        size = 0
+        for record in records:
+            if 'url' in record:
+                self._add(record['url'], [from_json(vacancy) for vacancy in record['rows']])
+            else:
+                self.flushed, size = record['flushed'], record['size']
+        self.resumed = len(self.pages)
+
+        # Drops what was written to the output after the last recorded batch
+        if not self.output.exists() or self.output.stat().st_size < size:
+            raise ValueError(f'{self.output} is shorter than recorded in {self.journal_path}, '
+                             'start over with resume=False')
+        with open(self.output, 'r+b') as output:
+            output.truncate(size)
+
+        with open(self.journal_path, 'r+b') as journal:
+            journal.truncate(valid)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self.flush()
+
+    def _write(self, record):
+        self._journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._journal.flush()
+
+    def _add(self, url, vacancies):
+        new = []
+        for vacancy in vacancies:
+            if self.deduplicate:
+                key = vacancy_hash(vacancy)
+                if key in self.seen:
+                    self.duplicates += 1
+                    continue
+                self.seen.add(key)
+            new.append(vacancy)
+        self.pages[url] = vacancies
+        self.rows += new
+        return new
+
+    def add(self, job, page, url, vacancies):
+        """
+        Records the vacancies of a completed page, and returns the new ones (not scraped before).
+        """
+        new = self._add(url, vacancies)
+        if self._journal is not None:
+            self._write({'job': job, 'page': page, 'url': url, 'new': len(new),
+                         'rows': [to_json(vacancy) for vacancy in vacancies]})
+            if len(self.rows) - self.flushed >= self.batch_size:
+                self.flush()
+        return new
+
+    def flush(self):
+        """
+        Appends the vacancies not yet in the output CSV to it, and records its new size in the journal.
+        """
+        if self._journal is None or self.flushed == len(self.rows):
+            return
+        batch = pd.DataFrame(self.rows[self.flushed:], columns=COLUMNS)
+        batch.to_csv(self.output, mode='a', header=False, index=False, encoding='utf-8')
+        self.flushed = len(self.rows)
+        self._write({'flushed': self.flushed, 'size': self.output.stat().st_size})
+
+    def close(self):
+        """
+        Flushes the pending vacancies and closes the journal.
+        """
+        if self._journal is not None:
+            self.flush()
+            self._journal.close()
+            self._journal = None
+
+    def dataframe(self, urls=None):
+        """
+        Returns the vacancies of the completed pages as a Pandas Dataframe, deduplicated in the
+        order of the given urls (e.g. the pages of the scrape), or in the order the pages completed.
+        """
+        urls = self.pages if urls is None else [url for url in urls if url in self.pages]
+        vacancies, seen = [], set()
+        for url in urls:
+            for vacancy in self.pages[url]:
+                if self.deduplicate:
+                    key = vacancy_hash(vacancy)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                vacancies.append(vacancy)
+        return pd.DataFrame(vacancies, columns=COLUMNS)
@@ -0,0 +1,141 @@
+### DATA JOBS IN MEXICO: FIGURE SERIALIZATION
+
+"""
+Fast JSON encoding of the dashboard figure updates.
+
+Dash serializes callback responses with plotly's JSON encoder, which uses orjson when
+it is installed and the engine is 'orjson' or 'auto'. orjson writes contiguous numeric
+NumPy arrays natively, but any other value (object arrays of labels, NumPy scalars,
+non-contiguous arrays) makes plotly fall back to a slow cleaning pass over the whole
+response. 'prepare' converts a figure update into values orjson encodes directly:
+
+- label (object or string) arrays become lists of strings
+- numeric arrays stay NumPy arrays, made contiguous, or become base64 typed arrays
+  ({'dtype': 'f8', 'bdata': ..., 'shape': ...}) when the browser plotly.js supports
+  them (v2.28 and later)
+- NumPy scalars become Python numbers
+
+Typed arrays are enabled automatically from the plotly.js version bundled with Dash,
+and can be forced on or off with DATAJOBS_TYPED_ARRAYS=1 or 0.
+"""
+
+# Import required libraries
+import base64
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Settings
+
+# First plotly.js version decoding typed array specs in figure data
+TYPED_ARRAYS_MIN_VERSION = (2, 28)
+
+# plotly.js typed array dtypes by NumPy dtype (64-bit integers are not supported)
+TYPED_ARRAY_DTYPES = {'float64': 'f8', 'float32': 'f4',
+                      'int32': 'i4', 'uint32': 'u4',
+                      'int16': 'i2', 'uint16': 'u2',
+                      'int8': 'i1', 'uint8': 'u1',
+                      }
+
+
+def plotlyjs_version():
+    """
+    Returns the (major, minor) version of the plotly.js bundled with Dash, or None if unknown.
+    """
+    try:
+        from dash import dcc
+        with open(Path(dcc.__file__).parent / 'plotly.min.js', encoding='utf-8') as f:
+            header = f.read(200)
+    except (ImportError, OSError):
+        return None
+    match = re.search(r'plotly\.js v(\d+)\.(\d+)', header)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def typed_arrays_supported():
+    """
+    Returns whether numeric arrays are sent as typed arrays (see DATAJOBS_TYPED_ARRAYS).
+    """
+    setting = os.environ.get('DATAJOBS_TYPED_ARRAYS')
+    if setting is not None:
+        return setting not in ('', '0', 'false', 'False')
+    version = plotlyjs_version()
+    return version is not None and version >= TYPED_ARRAYS_MIN_VERSION
+
+
+TYPED_ARRAYS = typed_arrays_supported()
+
+
+def use_orjson():
+    """
+    Makes plotly (and so Dash) encode JSON with orjson when it is installed. Returns whether it is used.
+    """
+    if orjson is None:
+        return False
+    pio.json.config.default_engine = 'orjson'
+    return True
+
+
+def typed_array(array):
+    """
+    Returns a numeric array as a plotly.js typed array spec, or None if its dtype has no
+    typed array equivalent.
+    """
+    if array.dtype.kind in 'iu' and array.dtype.itemsize == 8:
+        # 64-bit integers are sent as 32-bit ones when they fit
+        info = np.iinfo(np.int32)
+        if array.size and (array.min() < info.min or array.max() > info.max):
+            return None
+        array = array.astype(np.int32)
+
+    dtype = TYPED_ARRAY_DTYPES.get(array.dtype.name)
+    if dtype is None:
+        return None
+
+    spec = {'dtype': dtype,
+            'bdata': base64.b64encode(np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<')).tobytes()).decode('ascii'),
+            }
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(str(n) for n in array.shape)
+    return spec
+
+
+def prepare(value, typed_arrays=None):
+    """
+    Returns a figure update (nested dictionaries and lists) with its arrays converted for
+    fast encoding.
+
+    Parameters
+
+    value: Figure update, e.g. {'data': [{'x': array, ...}], 'layout': {...}}.
+    typed_arrays: Whether to send numeric arrays as typed arrays; TYPED_ARRAYS by default (Boolean).
+    """
+    if typed_arrays is None:
+        typed_arrays = TYPED_ARRAYS
+
+    if isinstance(value, dict):
+        return {name: prepare(item, typed_arrays) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [prepare(item, typed_arrays) for item in value]
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in 'iuf':
+            # Labels (and booleans) as nested lists of Python values; only object arrays
+            # can hold NumPy values needing conversion
+            items = value.tolist()
+            return prepare(items, typed_arrays) if value.dtype.kind == 'O' else items
+        if typed_arrays:
+            spec = typed_array(value)
+            if spec is not None:
+                return spec
+        return np.ascontiguousarray(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -0,0 +1,263 @@
+### DATA JOBS IN MEXICO: SNAPSHOT MANAGER
+
+"""
+Hot reload of the dashboard dataset.
+
+The dataset, its filter indexes and aggregate cube form an immutable 'Snapshot',
+identified by its version (the checksum of the snapshot file). The 'SnapshotManager'
+holds the current one and replaces it when a new snapshot is published (e.g. with
+'python datastore.py' after a new scrape), without restarting the server:
+
+- a background thread polls the snapshot manifest of the data folder every
+  DATAJOBS_WATCH_INTERVAL seconds (10 by default, 0 to disable), and an admin
+  endpoint (POST /admin/reload) triggers a reload on demand
+- the new snapshot is loaded and indexed in a background thread while the current
+  one keeps serving, then swapped in with a single reference assignment
+- every request is pinned to the snapshot current when it starts, so in-flight
+  requests finish against the old version, which is freed once they are done
+- objects derived from a snapshot (layout, figure templates, dropdown indexes) live
+  on it, and the listeners of the manager invalidate the caches by version
+
+A snapshot that cannot be read (e.g. published while the manager polls, or
+corrupted) is skipped and the current one kept; it is retried when the manifest
+changes again.
+
+The admin endpoints (GET /admin/snapshot and POST /admin/reload, with '?wait=1'
+to wait for the reload) are only available when DATAJOBS_ADMIN_TOKEN is set, and
+require an 'Authorization: Bearer <token>' header. With several worker processes,
+each worker reloads on its own: the admin endpoint reloads the worker answering
+it, and the others follow when their watcher sees the new manifest.
+
+Example
+
+    snapshots = SnapshotManager(build)  # build(df, version) -> Snapshot
+    snapshots.subscribe(lambda snapshot: figure_cache.set_version(snapshot.version))
+    snapshots.init_app(app.server)
+    data = snapshots.snapshot().data
+"""
+
+# Import required libraries
+import hmac
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import flask
+
+from datastore import SNAPSHOT_DIR, load_dataset, read_snapshot, snapshot_paths
+
+# Settings
+
+# Seconds between checks of the snapshot manifest (0 disables the watcher)
+WATCH_INTERVAL = float(os.environ.get('DATAJOBS_WATCH_INTERVAL', 10))
+
+# Token of the admin endpoints, disabled when not set
+ADMIN_TOKEN = os.environ.get('DATAJOBS_ADMIN_TOKEN')
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """
+    Immutable version of the dashboard dataset, with the objects derived from it.
+
+    Parameters
+
+    version: Identifier of the dataset, i.e. the checksum of the file it came from (String).
+    data: EncodedFrame of the dataset.
+    engine: FilterEngine of the dataset.
+    cube: AggregateCube of the dataset.
+    """
+
+    def __init__(self, version, data, engine, cube):
+        self.version = version
+        self.data = data
+        self.engine = engine
+        self.cube = cube
+        self.loaded_at = time.time()
+
+        self._derived = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.data)
+
+    def derived(self, name, build):
+        """
+        Returns an object derived from this version of the dataset, built with build() on first use.
+        """
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+
+class SnapshotManager:
+    """
+    Current dataset snapshot of the dashboard, reloaded when a new one is published.
+
+    Parameters
+
+    build: Function returning the Snapshot of a loaded dataset, from its Pandas Dataframe and version.
+    snapshot_dir: Folder holding the Arrow snapshot and its manifest (String or Path).
+    interval: Seconds between checks of the snapshot manifest, 0 to disable the watcher (Float).
+    """
+
+    def __init__(self, build, snapshot_dir=SNAPSHOT_DIR, interval=WATCH_INTERVAL):
+        self.build = build
+        self.snapshot_dir = Path(snapshot_dir)
+        self.interval = interval
+
+        self.listeners = []
+        self.reloads = 0
+        self.error = None
+
+        self._reload_lock = threading.Lock()
+        self._watcher_pid = None
+
+        # Read before loading, so that a snapshot published meanwhile is picked up
+        self._fingerprint = self.fingerprint()
+        df, version = load_dataset(self.snapshot_dir)
+        self.current = build(df, version)
+
+    def fingerprint(self):
+        """
+        Returns the modification time and size of the snapshot manifest (written last), or None if missing.
+        """
+        try:
+            stat = snapshot_paths(self.snapshot_dir)[1].stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def subscribe(self, listener):
+        """
+        Registers a function called with the new snapshot after every swap.
+        """
+        self.listeners.append(listener)
+        return listener
+
+    def snapshot(self):
+        """
+        Returns the snapshot of the current request (pinned when it started), or the current one.
+        """
+        if flask.has_request_context():
+            snapshot = flask.g.get('snapshot')
+            if snapshot is not None:
+                return snapshot
+        return self.current
+
+    def reload(self):
+        """
+        Loads the published snapshot and swaps it in if its version changed. Only one reload
+        runs at a time; the current snapshot keeps serving meanwhile.
+
+        Returns
+
+        swapped: Whether a new snapshot was swapped in (Boolean).
+        """
+        with self._reload_lock:
+            self._fingerprint = self.fingerprint()
+            try:
+                df, manifest = read_snapshot(self.snapshot_dir)
+                version = manifest['sha256']
+                if version == self.current.version:
+                    self.error = None
+                    return False
+                snapshot = self.build(df, version)
+            except (ImportError, OSError, ValueError, KeyError) as error:
+                self.error = f'{type(error).__name__}: {error}'
+                logger.warning('Dataset snapshot not reloaded (%s); keeping version %s', self.error,
+                               self.current.version[:12])
+                return False
+
+            self.current = snapshot
+            self.reloads += 1
+            self.error = None
+
+        for listener in self.listeners:
+            listener(snapshot)
+        return True
+
+    def reload_async(self):
+        """
+        Starts a reload in a background thread, unless one is running. Returns whether it was started.
+        """
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name='snapshot-reload', daemon=True).start()
+        return True
+
+    def watch(self):
+        """
+        Starts the thread polling the snapshot manifest, once per process (threads do not survive a fork).
+        """
+        if self.interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        # E.g. a worker forked from a preloaded master after a snapshot was published
+        if self.fingerprint() != self._fingerprint:
+            self.reload_async()
+        threading.Thread(target=self._watch, name='snapshot-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.interval)
+            if self.fingerprint() != self._fingerprint:
+                self.reload()
+
+    def status(self):
+        """
+        Returns the version, size and reload state of the current snapshot as a dictionary.
+        """
+        snapshot = self.current
+        return {'version': snapshot.version,
+                'rows': len(snapshot),
+                'loaded_at': snapshot.loaded_at,
+                'reloads': self.reloads,
+                'reloading': self._reload_lock.locked(),
+                'error': self.error,
+                }
+
+    def before_request(self):
+        """
+        Pins the current snapshot to the request and starts the watcher of the process (Flask before_request hook).
+        """
+        flask.g.snapshot = self.current
+        self.watch()
+
+    def authorize(self, token):
+        """
+        Aborts the request unless it carries the admin token.
+        """
+        expected = f'Bearer {token}'.encode('utf-8')
+        given = flask.request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(given, expected):
+            flask.abort(401)
+
+    def init_app(self, server, admin_token=ADMIN_TOKEN):
+        """
+        Registers the request hook and, with an admin token, the admin endpoints on a Flask
+        server (e.g. app.server of a Dash app). Register it before the hooks that use the snapshot.
+        """
+        server.before_request(self.before_request)
+        if not admin_token:
+            return self
+
+        def snapshot_status():
+            self.authorize(admin_token)
+            return flask.jsonify(self.status())
+
+        def snapshot_reload():
+            self.authorize(admin_token)
+            if flask.request.args.get('wait'):
+                swapped = self.reload()
+                return flask.jsonify({'swapped': swapped, **self.status()})
+            started = self.reload_async()
+            return flask.jsonify({'started': started, **self.status()}), 202
+
+        server.add_url_rule('/admin/snapshot', 'snapshot_status', snapshot_status, methods=['GET'])
+        server.add_url_rule('/admin/reload', 'snapshot_reload', snapshot_reload, methods=['POST'])
+        return self
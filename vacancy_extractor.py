@@ -0,0 +1,199 @@
+### DATA JOBS IN MEXICO: VACANCY EXTRACTOR
+
+"""
+Extraction of the vacancies (Job, Salary, Company, Location) from the OCC results pages.
+
+The notebook parsed every page with BeautifulSoup's pure Python 'html.parser' and,
+for each field of each vacancy card, compiled the class regular expression again and
+searched the card up to three times, once per [tag, class] fallback. The
+'VacancyExtractor' gets the same results with less work:
+
+- the [tag, class] selector sets are compiled once, into the tags to look at and the
+  fields and fallback priorities whose classes they match
+- pages are parsed with lxml (a C parser), or with BeautifulSoup when not installed
+- the cards are found in one pass over the page, and the four fields of a card in one
+  pass over its elements, keeping the first element of the best fallback of each field
+- whether a class attribute matches the selectors is remembered, as the pages repeat
+  the same few class attributes on every card
+
+The matching follows BeautifulSoup's: a card matches a vacancy class if its class
+attribute equals it (or has it as one of its classes), and an element matches a field
+class if the regular expression is found in its class attribute or in one of its
+classes. Cards are returned by vacancy class, then in page order, as in the notebook.
+
+Example
+
+    extractor = VacancyExtractor(vacancy_class, jobname_class, salary_class, company_class, location_class)
+    vacancies = extractor.extract(html)  # [[job, salary, company, location], ...]
+"""
+
+# Import required libraries
+import re
+
+import numpy as np
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional dependency
+    lxml = None
+
+# Settings
+
+# Class attributes remembered per extractor before starting over
+MAX_MATCHES = 4096
+
+# Elements whose text is not part of the text of their parents (as in BeautifulSoup)
+SKIPPED_TAGS = ['script', 'style', 'template']
+
+
+def class_values(classes):
+    """
+    Returns the classes and the normalized class attribute of an element, from its class
+    attribute (String, lxml) or list of classes (BeautifulSoup).
+    """
+    values = classes.split() if isinstance(classes, str) else list(classes)
+    return values, ' '.join(values)
+
+
+def parse_lxml(html):
+    """
+    Returns the root element of a page parsed with lxml, without script and style elements,
+    or None if the page is empty.
+    """
+    try:
+        root = lxml.html.document_fromstring(html)
+    except ValueError:
+        # Strings with an XML encoding declaration must be given as bytes
+        root = lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+    etree.strip_elements(root, *SKIPPED_TAGS, with_tail=False)
+    return root
+
+
+class VacancyExtractor:
+    """
+    Extractor of the vacancies of the OCC results pages, with the selectors compiled once.
+
+    Parameters
+
+    vacancy_class: [tag, class] pairs of the vacancy cards (List).
+    jobname_class, salary_class, company_class, location_class: [tag, class regular expression]
+                                                                pairs of each field, by priority (List).
+    parser: 'lxml' or 'html.parser' (BeautifulSoup), by default lxml when installed (String).
+    """
+
+    def __init__(self, vacancy_class, jobname_class, salary_class, company_class, location_class, parser=None):
+        if parser is None:
+            parser = 'lxml' if lxml is not None else 'html.parser'
+        if parser not in ('lxml', 'html.parser'):
+            raise ValueError(f"Unknown parser '{parser}', expected 'lxml' or 'html.parser'")
+        if parser == 'lxml' and lxml is None:
+            raise ImportError('lxml is required for the lxml parser')
+        self.parser = parser
+
+        self.card_classes = [(tag.lower(), card_class) for tag, card_class in vacancy_class]
+        self.card_tags = sorted({tag for tag, _ in self.card_classes})
+
+        self.fields = (jobname_class, salary_class, company_class, location_class)
+        self.field_classes = {}
+        for field, field_class in enumerate(self.fields):
+            for priority, (tag, class_id) in enumerate(field_class):
+                self.field_classes.setdefault(tag.lower(), []).append((field, priority, re.compile(class_id)))
+        self.field_tags = sorted(self.field_classes)
+
+        self._card_matches = {}
+        self._field_matches = {}
+
+    def card_matches(self, tag, classes):
+        """
+        Returns the positions of the vacancy classes matched by a card.
+        """
+        key = (tag, classes if isinstance(classes, str) else tuple(classes))
+        matches = self._card_matches.get(key)
+        if matches is None:
+            values, attribute = class_values(classes)
+            matches = tuple(position for position, (card_tag, card_class) in enumerate(self.card_classes)
+                            if card_tag == tag and (attribute == card_class or card_class in values))
+            if len(self._card_matches) >= MAX_MATCHES:
+                self._card_matches.clear()
+            self._card_matches[key] = matches
+        return matches
+
+    def field_matches(self, tag, classes):
+        """
+        Returns the (field, priority) of the field classes matched by an element.
+        """
+        key = (tag, classes if isinstance(classes, str) else tuple(classes))
+        matches = self._field_matches.get(key)
+        if matches is None:
+            values, attribute = class_values(classes)
+            matches = tuple((field, priority) for field, priority, pattern in self.field_classes[tag]
+                            if pattern.search(attribute) or any(pattern.search(value) for value in values))
+            if len(self._field_matches) >= MAX_MATCHES:
+                self._field_matches.clear()
+            self._field_matches[key] = matches
+        return matches
+
+    def extract_card(self, elements):
+        """
+        Returns the [job, salary, company, location] of a card from its elements having a
+        field tag, as (element, tag, class attribute) in page order (NaN for missing fields).
+        """
+        best = [None] * len(self.fields)
+        found = 0
+        for element, tag, classes in elements:
+            if not classes:
+                continue
+            for field, priority in self.field_matches(tag, classes):
+                if best[field] is None or priority < best[field][0]:
+                    best[field] = (priority, element)
+                    found += priority == 0
+            if found == len(self.fields):
+                break
+        return [np.nan if match is None else match[1] for match in best]
+
+    def extract(self, html):
+        """
+        Returns the [job, salary, company, location] of every vacancy of a results page.
+
+        Parameters
+
+        html: HTML text of a results page (String).
+
+        Returns
+
+        vacancies: List with a [job, salary, company, location] list per vacancy card, with NaN for missing fields.
+        """
+        cards = [[] for _ in self.card_classes]
+
+        if self.parser == 'lxml':
+            root = parse_lxml(html)
+            if root is None:
+                return []
+            for card in root.iter(*self.card_tags):
+                classes = card.get('class')
+                if classes is None:
+                    continue
+                for position in self.card_matches(card.tag, classes):
+                    elements = ((element, element.tag, element.get('class'))
+                                for element in card.iterdescendants(*self.field_tags))
+                    cards[position].append(self.extract_card(elements))
+
+            return [[value if value is np.nan else ''.join(value.itertext()) for value in vacancy]
+                    for vacancies in cards for vacancy in vacancies]
+
+        soup = BeautifulSoup(html, 'html.parser')
+        for card in soup.find_all(self.card_tags):
+            classes = card.get('class')
+            if not classes:
+                continue
+            for position in self.card_matches(card.name, classes):
+                elements = ((element, element.name, element.get('class'))
+                            for element in card.find_all(self.field_tags))
+                cards[position].append(self.extract_card(elements))
+
+        return [[value if value is np.nan else value.text for value in vacancy]
+                for vacancies in cards for vacancy in vacancies]
@@ -0,0 +1,61 @@
+### DATA JOBS IN MEXICO: WSGI ENTRY POINT
+
+"""
+WSGI entry point of the dashboard for production servers.
+
+The dashboard script cannot be imported by name (it starts with a digit), so it is
+loaded here as the 'dashboard' module and its Flask server exposed as 'server' (and
+'application'). Loading it builds the dataset, the filter indexes and the aggregate
+cube. The dashboard builds its layout (the figure templates, dropdown options and
+clientside data) on the first request only, so that importing it stays fast; this
+entry point warms it up right after loading instead. With a preloading server
+(gunicorn's preload_app, see gunicorn.conf.py) all of it is then built once in the
+master process and shared by the forked workers copy-on-write, and their first
+requests do not wait for it:
+
+    gunicorn -c gunicorn.conf.py
+
+The warm-up can be disabled with DATAJOBS_WARM_UP=0 (e.g. to measure the import alone).
+After a hot reload of the dataset, each worker builds the layout of the new version on
+its first request of it.
+
+Any WSGI server can use 'wsgi:server', e.g. 'waitress-serve --port 8050 wsgi:server'.
+"""
+
+# Import required libraries
+import importlib.util
+import os
+import sys
+from pathlib import Path
+
+# Settings
+
+DASHBOARD = Path(__file__).resolve().parent / '3_DataJobsMX_Nov2023_Dashboard.py'
+
+# Whether to build the layout of the dashboard when loading it, before serving (and forking)
+WARM_UP = os.environ.get('DATAJOBS_WARM_UP', '1') != '0'
+
+
+def load_dashboard(path=DASHBOARD):
+    """
+    Imports the dashboard script as the 'dashboard' module, without running the development server.
+    """
+    if 'dashboard' in sys.modules:
+        return sys.modules['dashboard']
+    sys.path.insert(0, str(Path(path).parent))
+    spec = importlib.util.spec_from_file_location('dashboard', path)
+    dashboard = importlib.util.module_from_spec(spec)
+    sys.modules['dashboard'] = dashboard
+    spec.loader.exec_module(dashboard)
+    return dashboard
+
+
+dashboard = load_dashboard()
+
+# The layout and the figure templates, dropdown options and clientside data it holds are
+# derived from the current dataset version, and reused by the requests of that version
+if WARM_UP:
+    dashboard.serve_layout()
+
+app = dashboard.app
+server = application = dashboard.server